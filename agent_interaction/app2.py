@@ -1,20 +1,113 @@
-from flask import Flask, render_template, jsonify, request, make_response
-from utils.memo import agent_conversation
+from flask import Flask, render_template, jsonify, request, make_response, Response, stream_with_context
+from utils.chat_session import reset_chat_sessions
+from utils.memo import (
+    agent_conversation, agent_conversation_stream, set_emotion_measurement, set_emotion_sampling, set_turn_mode,
+    set_turn_time_budget
+)
 from utils.memory_management import manage_memories
 from utils.emotion_methods import retrieve_current_emotions
+from utils.emotion_decay import EmotionDecayModel, set_emotion_decay
+from utils.emotion_vector import retrieve_emotion_matrix_at, to_emotion_dict
+from utils.emotion_sampling import EmotionSamplingPolicy
 from agents.agent import Agent
 from utils.general_methods import load_scenarios_from_excel
+from utils.llm_connector import preempt_background_llm_calls, scoped_llm_cassette, scoped_llm_telemetry
+from utils.llm_cassette import cassette_path_for
+from utils.token_budget import TokenBudget, set_token_budget
 
 import threading
 import os
+from contextlib import contextmanager
 import sqlite3
 import time
 from datetime import datetime
 import io
+import json
 import matplotlib.pyplot as plt
 
 app = Flask(__name__)
 
+# 턴 시간 예산 (초): 넘기면 감정 측정/요약/승격을 줄여 응답 시간을 일정하게 유지
+if os.environ.get("TURN_TIME_BUDGET"):
+    set_turn_time_budget(float(os.environ["TURN_TIME_BUDGET"]))
+# 턴 처리 방식: "fused"면 발화/감정 평가/기억 요약을 LLM 호출 한 번으로 받음
+if os.environ.get("TURN_MODE"):
+    set_turn_mode(os.environ["TURN_MODE"])
+# "background"면 감정 측정을 기다리지 않고 백그라운드 작업자가 최신 상태만 측정
+emotion_worker = None
+if os.environ.get("EMOTION_MEASUREMENT"):
+    emotion_worker = set_emotion_measurement(os.environ["EMOTION_MEASUREMENT"])
+# 감정이 초기 상태로 절반 돌아가는 시간(초). 설정하면 조회 시점에 감쇠를 계산
+if os.environ.get("EMOTION_HALF_LIFE"):
+    set_emotion_decay(EmotionDecayModel(half_life=float(os.environ["EMOTION_HALF_LIFE"])))
+# 설정하면 감정 변화 신호(감성 변화, 새로운 내용, 건너뛴 횟수)가 있을 때만 감정 측정
+if os.environ.get("EMOTION_SAMPLING"):
+    set_emotion_sampling(EmotionSamplingPolicy())
+# 설정하면 기억/대화 기록 섹션마다 토큰 수를 제한 (기본은 제한 없음)
+if os.environ.get("CONTEXT_TOKEN_BUDGET"):
+    context_tokens = int(os.environ["CONTEXT_TOKEN_BUDGET"])
+    set_token_budget(TokenBudget(short_term=context_tokens, long_term=context_tokens, history=2 * context_tokens))
+
+def use_scenario_cassette(db_path):
+    """
+    LLM_CASSETTE_MODE=record|replay: record the scenario's LLM traffic next to its DB, or replay
+    it (from LLM_CASSETTE_DIR if the recorded run is in another folder) without calling the model.
+    LLM_CASSETTE_ON_MISS: error (default), live or record.
+
+    Returns:
+        context manager: Keeps the cassette active for one scenario run.
+    """
+    mode = os.environ.get("LLM_CASSETTE_MODE")
+    if not mode:
+        return scoped_llm_cassette(None)
+    source_dir = os.environ.get("LLM_CASSETTE_DIR") or os.path.dirname(db_path)
+    return scoped_llm_cassette(cassette_path_for(os.path.join(source_dir, os.path.basename(db_path))), mode,
+                               on_miss=os.environ.get("LLM_CASSETTE_ON_MISS", "error"))
+
+# 끝까지 생성되지 못한 시나리오 DB 옆에 남는 표시 파일
+INCOMPLETE_SUFFIX = ".incomplete"
+
+def scenario_is_complete(db_path):
+    """
+    Returns:
+        bool: Whether the scenario's DB exists and its run finished (a partial run is generated again).
+    """
+    return os.path.exists(db_path) and not os.path.exists(db_path + INCOMPLETE_SUFFIX)
+
+def start_scenario_run(db_path):
+    """
+    Mark the scenario as incomplete until scenario_llm_scope finishes it, and drop the DB
+    of an earlier run that stopped partway.
+    """
+    open(db_path + INCOMPLETE_SUFFIX, "w").close()
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+@contextmanager
+def scenario_llm_scope(db_path):
+    """
+    Record the LLM calls of one scenario run to its DB (llm_calls table) and to its cassette
+    (see use_scenario_cassette). When the run finishes, pending background emotion measurements
+    are finished inside the scope so their calls land in the same DB and cassette, and the run
+    is marked complete. If it stops early (an error, or the SSE client disconnecting) the
+    queued measurements are dropped without waiting and the run stays incomplete. Either way
+    the previous telemetry sink and cassette are restored and the run's chat sessions are dropped.
+    """
+    with scoped_llm_telemetry(db_path), use_scenario_cassette(db_path):
+        try:
+            yield
+        except BaseException:
+            # 연결이 끊긴 스트림(GeneratorExit)은 측정을 기다리지 않고 바로 정리
+            if emotion_worker is not None:
+                emotion_worker.discard(db_path)
+            raise
+        else:
+            if emotion_worker is not None:
+                emotion_worker.wait_idle(timeout=60)
+            os.remove(db_path + INCOMPLETE_SUFFIX)
+        finally:
+            reset_chat_sessions(db_path)
+
 DATABASE_PATH = "test_agents.db"
 
 current_db_path = None
@@ -131,6 +224,8 @@ CURRENT_TIME_STR = datetime.now().strftime("%Y-%m-%d_%H%M%S")
 SCENARIO_FOLDER = f"./results/runs_{CURRENT_TIME_STR}"
 #SCENARIO_FOLDER = f"./results/runs_2024-12-26_231056"
 
+AUTO_CONVERSATION_TURNS = 20
+
 def setup_database(db_path):
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
@@ -268,6 +363,26 @@ def manage_agent_memories():
 def home():
     return render_template('home.html')
 
+def load_scenario_logs(db_path):
+    """
+    Load one (turn, speaker, message) row per turn: the response saved second in each turn.
+    """
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("""
+    WITH ranked_conversations AS (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY turn ORDER BY id ASC) AS row_num
+        FROM conversations
+    )
+    SELECT turn, speaker, message
+    FROM ranked_conversations
+    WHERE row_num = 2
+    ORDER BY turn ASC;
+    """)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
 ##############################################
 # GET /auto_conversation -> 시나리오 목록 + Generate 버튼
 # POST /auto_conversation -> 시나리오 자동대화 실행 + 결과 표시
@@ -285,7 +400,8 @@ def auto_conversation_page():
     """
     if request.method == 'GET':
         # 시나리오 목록 보여주기 (대화 로그 없음)
-        return render_template('auto_conversation.html', scenarios=scenarios, scenario_logs=None, chosen_scenario=None, db_filename=None)
+        return render_template('auto_conversation.html', scenarios=scenarios, scenario_logs=None, chosen_scenario=None, db_filename=None,
+                               agent1_name=agent1.name, agent2_name=agent2.name)
     
     else:
         # POST: 시나리오 선택 후 대화 생성 또는 로드
@@ -305,50 +421,39 @@ def auto_conversation_page():
             scenario_logs = []
             chosen_scenario = scenario_id
             
-            if not os.path.exists(db_path):
-                # DB가 없으면 초기화 및 대화 생성
+            if not scenario_is_complete(db_path):
+                # DB가 없거나 지난 생성이 중간에 끊겼으면 초기화 및 대화 생성
+                preempt_background_llm_calls()  # 대기 중인 리플렉션보다 이번 대화를 먼저
+                start_scenario_run(db_path)
                 setup_database(db_path)  # 테이블 생성 함수 호출
                 populate_scenario(db_path, scenario_id, agent1.name, agent2.name)
+                with scenario_llm_scope(db_path):  # LLM 호출 기록(llm_calls 테이블)과 카세트를 이 실행으로 한정
+                    conversation_turn = 3
+                    message = f"Let's talk together. {scenario_data['description']}"
                 
-                conversation_turn = 3
-                message = f"Let's talk together. {scenario_data['description']}"
-                
-                # 20턴 자동 대화
-                for i in range(20):
-                    sender, receiver = (agent1, agent2) if i % 2 == 0 else (agent2, agent1)
-                    print(f"=== Turn {conversation_turn}: {sender.name} to {receiver.name} ===")
-                    print(f"Message: {message}\n")
-                    response, conversation_turn = agent_conversation(
-                        db_path,
-                        agent1=sender,
-                        agent2=receiver,
-                        message=message,
-                        conversation_turn=conversation_turn
-                    )
-
-                    print(f"{receiver.name}'s Response:\n{response}\n")
-                    print(f"Updated conversation turn: {conversation_turn}\n")
-                    # Retrieve and print current emotions of the receiver as a demonstration of dramatic change
-                    receiver_emotions = retrieve_current_emotions(db_path, receiver.name)
-                    print(f"Current Emotions for {receiver.name}: {receiver_emotions}\n")
-                    print("-"*50)
-                    message = response
+                    # 20턴 자동 대화
+                    for i in range(AUTO_CONVERSATION_TURNS):
+                        sender, receiver = (agent1, agent2) if i % 2 == 0 else (agent2, agent1)
+                        print(f"=== Turn {conversation_turn}: {sender.name} to {receiver.name} ===")
+                        print(f"Message: {message}\n")
+                        response, conversation_turn = agent_conversation(
+                            db_path,
+                            agent1=sender,
+                            agent2=receiver,
+                            message=message,
+                            conversation_turn=conversation_turn
+                        )
+
+                        print(f"{receiver.name}'s Response:\n{response}\n")
+                        print(f"Updated conversation turn: {conversation_turn}\n")
+                        # Retrieve and print current emotions of both agents as a demonstration of dramatic change
+                        for name, emotions in turn_emotions(db_path).items():
+                            print(f"Current Emotions for {name}: {emotions}\n")
+                        print("-"*50)
+                        message = response
 
             # 4) DB에서 대화 기록 조회 (좌/우 표시)
-            conn = sqlite3.connect(db_path)
-            c = conn.cursor()
-            c.execute("""
-            WITH ranked_conversations AS (
-                SELECT *, ROW_NUMBER() OVER (PARTITION BY turn ORDER BY id ASC) AS row_num
-                FROM conversations
-            )
-            SELECT turn, speaker, message
-            FROM ranked_conversations
-            WHERE row_num = 2
-            ORDER BY turn ASC;
-            """)
-            rows = c.fetchall()
-            conn.close()
+            rows = load_scenario_logs(db_path)
 
             # 한 턴당 2행(메시지, 응답)이라고 가정
             # DM 채팅 스타일로, speaker=agent_1 => 왼쪽, speaker=agent_2 => 오른쪽
@@ -370,6 +475,97 @@ def auto_conversation_page():
         except Exception as e:
             return f"오류가 발생했습니다: {str(e)}", 500
 
+##############################################
+# GET /auto_conversation/stream?scenario_id=N
+#   -> 시나리오 자동대화를 실행하면서 각 턴의 발화를 SSE로 생성 즉시 전송
+##############################################
+def turn_emotions(db_path):
+    """
+    Both agents' emotion states after a turn, read with one batched query.
+
+    Returns:
+        dict: agent name -> emotion dict.
+    """
+    names = [agent1.name, agent2.name]
+    return {name: to_emotion_dict(row) for name, row in zip(names, retrieve_emotion_matrix_at(db_path, names))}
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/auto_conversation/stream', methods=['GET'])
+def auto_conversation_stream():
+    """
+    Server-Sent Events version of POST /auto_conversation.
+
+    Events:
+      turn_start {turn, speaker} -> speech {delta} (repeated) -> turn_end {turn, speaker, message, degraded, emotions},
+      then a final end {} (or error {message}). `emotions` maps each agent to its state after the turn.
+      Scenarios with a complete DB are replayed from it; a run the client disconnected from
+      stays incomplete and is generated again on the next request.
+    """
+    global current_scenario_id, current_db_path
+    scenario_id = request.args.get('scenario_id', type=int)
+    scenario_data = scenarios.get(scenario_id)
+    if not scenario_data:
+        return "Unvalid Scenario ID", 400
+
+    db_path = os.path.join(SCENARIO_FOLDER, f"scenario_{scenario_id}.db")
+    current_scenario_id = scenario_id
+    current_db_path = db_path
+
+    def generate():
+        try:
+            if scenario_is_complete(db_path):
+                # 이미 생성된 시나리오는 저장된 대화를 그대로 전송
+                for turn_num, spk, msg in load_scenario_logs(db_path):
+                    yield sse_event("turn_start", {"turn": turn_num, "speaker": spk})
+                    yield sse_event("speech", {"delta": msg})
+                    yield sse_event("turn_end", {"turn": turn_num, "speaker": spk, "message": msg})
+                yield sse_event("end", {})
+                return
+
+            preempt_background_llm_calls()  # 대기 중인 리플렉션보다 이번 대화를 먼저
+            start_scenario_run(db_path)  # 중간에 끊긴 이전 DB는 지우고 처음부터
+            setup_database(db_path)
+            populate_scenario(db_path, scenario_id, agent1.name, agent2.name)
+            with scenario_llm_scope(db_path):
+                conversation_turn = 3
+                message = f"Let's talk together. {scenario_data['description']}"
+
+                for i in range(AUTO_CONVERSATION_TURNS):
+                    sender, receiver = (agent1, agent2) if i % 2 == 0 else (agent2, agent1)
+                    turn_num = conversation_turn
+                    yield sse_event("turn_start", {"turn": turn_num, "speaker": receiver.name})
+
+                    response = ""
+                    degraded = []
+                    for event in agent_conversation_stream(
+                        db_path,
+                        agent1=sender,
+                        agent2=receiver,
+                        message=message,
+                        conversation_turn=conversation_turn
+                    ):
+                        if event["type"] == "speech":
+                            yield sse_event("speech", {"delta": event["delta"]})
+                        else:
+                            response, conversation_turn = event["speech"], event["conversation_turn"]
+                            degraded = event["degraded"]
+
+                    yield sse_event("turn_end", {"turn": turn_num, "speaker": receiver.name, "message": response,
+                                                 "degraded": degraded, "emotions": turn_emotions(db_path)})
+                    message = response
+
+            yield sse_event("end", {})
+        except Exception as e:
+            yield sse_event("error", {"message": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.route('/memory_view', methods=['GET','POST'])
 def memory_view_page():
     """
@@ -593,6 +789,8 @@ def memory_view_page():
 
 @app.route('/manual_chat', methods=['GET'])
 def manual_chat():
+    # 사용자가 직접 대화를 시작하면 아직 보내지 않은 백그라운드 호출(리플렉션)을 취소
+    preempt_background_llm_calls()
     return render_template('manual_chat.html')
 
 @app.route('/memory_view/<agent_name>', methods=['GET'])
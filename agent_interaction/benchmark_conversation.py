@@ -0,0 +1,347 @@
+# benchmark_conversation.py
+"""
+Run agent_conversation against the local fake LLM server and report where the time goes.
+
+For every turn it records the wall time, the time the fake server spent serving that
+turn's LLM requests and the difference (non-LLM overhead: sentiment, DB, memory, parsing).
+
+Usage (from agent_interaction/):
+    python benchmark_conversation.py --turns 10
+    python benchmark_conversation.py --turns 20 --ttft lognormal:0.5,0.6 --servers 2 --error-rate 0.05
+    python benchmark_conversation.py --stream --json results/bench.json
+    python benchmark_conversation.py --prompt-layout session
+    python benchmark_conversation.py --malformed-rate 0.1 --structured
+    python benchmark_conversation.py --aux-model llama3.2:1b --aux-speedup 3
+    python benchmark_conversation.py --turn-mode both --turns 20
+    python benchmark_conversation.py --emotion-measurement background
+    python benchmark_conversation.py --turn-budget 6 --ttft lognormal:0.8,0.8
+    python benchmark_conversation.py --emotion-sampling --sampling-max-skips 3
+"""
+import argparse
+import collections
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from fake_llm_server import start_fake_server
+from agents.agent import Agent
+from utils.memo import (
+    agent_conversation,
+    agent_conversation_stream,
+    set_conversation_prompt_layout,
+    set_emotion_measurement,
+    set_emotion_sampling,
+    set_turn_mode,
+    set_turn_time_budget,
+)
+from utils.deadline import load_degradation_events
+from utils.emotion_methods import init_emotion_db
+from utils.emotion_sampling import EmotionSamplingPolicy
+from utils.llm_concurrency import percentile
+from utils.structured_output import set_structured_output, parse_stats
+from utils.llm_routes import auxiliary_routes
+from utils.token_budget import TokenBudget, set_token_budget, prompt_token_stats
+from utils.llm_telemetry import load_llm_calls, summarize_llm_calls, format_llm_report
+from utils import llm_connector
+
+AGENT1 = Agent(
+    "agent_1",
+    "Often experiences rapid emotional changes, easily startled and quick to anger, "
+    "but has a wealth of experience from past major crises.",
+    "agent_2",
+)
+AGENT2 = Agent(
+    "agent_2",
+    "Highly rational and calm under pressure. Prefers logic and data over emotional pleas.",
+    "agent_1",
+)
+
+###################################
+# Benchmark DB
+###################################
+
+def setup_benchmark_db(db_path):
+    """
+    Create the scenario tables (same schema as app2.setup_database) with a little seed data.
+    """
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.executescript("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            turn INTEGER,
+            speaker TEXT,
+            message TEXT
+        );
+        CREATE TABLE IF NOT EXISTS short_term_memory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_name TEXT NOT NULL,
+            content TEXT NOT NULL,
+            importance REAL NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS long_term_memory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_name TEXT NOT NULL,
+            content TEXT NOT NULL,
+            importance REAL NOT NULL,
+            last_accessed DATETIME DEFAULT CURRENT_TIMESTAMP,
+            reflection_type TEXT
+        );
+        CREATE TABLE IF NOT EXISTS thought_processes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_name TEXT,
+            thought_process TEXT
+        );
+    """)
+    conn.commit()
+    conn.close()
+    init_emotion_db(db_path)
+
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    for agent in (AGENT1.name, AGENT2.name):
+        c.execute("""
+            INSERT INTO emotion_states (agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation)
+            VALUES (?, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2)
+        """, (agent,))
+    c.executemany("INSERT INTO short_term_memory (agent_name, content, importance) VALUES (?, ?, ?)", [
+        (AGENT1.name, "Really worried about the client's reaction to our recent failure.", 0.7),
+        (AGENT2.name, "Has handled tough deadlines successfully before.", 0.8),
+    ])
+    c.executemany("INSERT INTO long_term_memory (agent_name, content, importance, reflection_type) VALUES (?, ?, ?, ?)", [
+        (AGENT1.name, "Previously overcame a massive crisis under time pressure.", 0.9, None),
+        (AGENT2.name, "Strategy reflection: calming down emotional colleagues.", 0.7, "strategy"),
+    ])
+    conn.commit()
+    conn.close()
+
+###################################
+# Benchmark
+###################################
+
+def _busy_seconds(servers):
+    return sum(server.stats()["busy_seconds"] for server in servers)
+
+def _requests(servers):
+    return sum(server.stats()["requests"] for server in servers)
+
+def run_turn(db_path, sender, receiver, message, conversation_turn, stream):
+    """
+    Run one turn and return (speech, next turn, seconds to the first speech piece or None).
+    """
+    if not stream:
+        speech, conversation_turn = agent_conversation(db_path, sender, receiver, message, conversation_turn)
+        return speech, conversation_turn, None
+
+    start = time.monotonic()
+    first_delta = None
+    speech = message
+    for event in agent_conversation_stream(db_path, sender, receiver, message, conversation_turn):
+        if event["type"] == "speech" and first_delta is None:
+            first_delta = time.monotonic() - start
+        elif event["type"] == "done":
+            speech, conversation_turn = event["speech"], event["conversation_turn"]
+    return speech, conversation_turn, first_delta
+
+def run_benchmark(db_path, servers, turns, stream=False):
+    """
+    Run `turns` alternating turns between the two benchmark agents.
+
+    Returns:
+        list[dict]: Per-turn wall time, LLM service time, overhead and request count.
+    """
+    results = []
+    message = "Let's talk together. The client just rejected our proposal."
+    conversation_turn = 1
+    for i in range(turns):
+        sender, receiver = (AGENT1, AGENT2) if i % 2 == 0 else (AGENT2, AGENT1)
+        busy_before = _busy_seconds(servers)
+        requests_before = _requests(servers)
+        start = time.monotonic()
+
+        message, conversation_turn, first_delta = run_turn(
+            db_path, sender, receiver, message, conversation_turn, stream
+        )
+
+        wall = time.monotonic() - start
+        llm = _busy_seconds(servers) - busy_before
+        results.append({
+            "turn": i + 1,
+            "wall": wall,
+            "llm": llm,
+            "overhead": max(0.0, wall - llm),
+            "requests": _requests(servers) - requests_before,
+            "first_speech": first_delta,
+        })
+        print(f"turn {i + 1:3d}: wall {wall:6.2f}s  llm {llm:6.2f}s  overhead {wall - llm:6.2f}s  "
+              f"requests {results[-1]['requests']}")
+    return results
+
+def summarize(results):
+    """
+    Returns:
+        dict: Mean, median and p95 of each per-turn measurement.
+    """
+    summary = {}
+    for field in ("wall", "llm", "overhead", "first_speech"):
+        values = [r[field] for r in results if r[field] is not None]
+        if values:
+            summary[field] = {
+                "mean": statistics.mean(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+            }
+    return summary
+
+def run_mode(args, servers, db_path):
+    """
+    Run the benchmark on a fresh scenario DB and print its report.
+
+    Returns:
+        dict: Per-turn results, summary, parse stats, prompt token stats and degradation counts.
+    """
+    for server in servers:
+        server.reset_stats()
+    parse_stats.reset()
+    setup_benchmark_db(db_path)
+    llm_connector.set_llm_telemetry(db_path)
+    if args.semantic_threshold is not None:
+        llm_connector.set_llm_semantic_cache(db_path + ".semantic.db", threshold=args.semantic_threshold)
+    sampling = None
+    if args.emotion_sampling:
+        sampling = EmotionSamplingPolicy(sentiment_delta=args.sampling_sentiment_delta,
+                                         novelty=args.sampling_novelty, max_skips=args.sampling_max_skips)
+    set_emotion_sampling(sampling)
+
+    results = run_benchmark(db_path, servers, args.turns, stream=args.stream)
+    summary = summarize(results)
+    worker = set_emotion_measurement(args.emotion_measurement)
+    if worker is not None:
+        worker.wait_idle()  # 남은 측정까지 끝난 뒤 집계
+
+    print("\n=== Summary (seconds) ===")
+    for field, values in summary.items():
+        print(f"{field:13s} mean {values['mean']:6.2f}  p50 {values['p50']:6.2f}  p95 {values['p95']:6.2f}")
+    print("requests by kind:", [server.stats()["by_kind"] for server in servers])
+    print("requests by model:", [server.stats()["by_model"] for server in servers])
+    print("concurrency:", llm_connector.get_llm_concurrency_stats())
+    print("hedging:", llm_connector.get_llm_hedging_stats())
+    print("backends:", llm_connector.get_llm_backend_stats())
+    print("parsing:", parse_stats.stats())
+    print("semantic cache:", llm_connector.get_llm_semantic_cache_stats())
+    print("prompt tokens:", prompt_token_stats.stats())
+    degradations = collections.Counter(
+        f"{event['step']}: {event['action']}" for event in load_degradation_events(db_path, limit=None)
+    )
+    print("degradations:", dict(degradations))
+    if worker is not None:
+        print("emotion worker:", worker.stats())
+    if sampling is not None:
+        print("emotion sampling:", sampling.stats())
+
+    llm_connector.flush_llm_telemetry()
+    print()
+    print(format_llm_report(summarize_llm_calls(load_llm_calls(db_path))))
+
+    return {"turns": results, "summary": summary, "parsing": parse_stats.stats(),
+            "prompt_tokens": prompt_token_stats.stats(), "degradations": dict(degradations),
+            "emotion_worker": worker.stats() if worker is not None else None,
+            "emotion_sampling": sampling.stats() if sampling is not None else None}
+
+def print_mode_comparison(runs):
+    """
+    Print LLM round trips and turn latency of each turn mode side by side.
+    """
+    print("\n=== Turn modes ===")
+    print(f"{'mode':10s} {'requests/turn':>14s} {'wall mean':>10s} {'wall p95':>9s} {'llm mean':>9s}")
+    for mode, run in runs.items():
+        requests = statistics.mean(turn["requests"] for turn in run["turns"])
+        wall, llm = run["summary"]["wall"], run["summary"]["llm"]
+        print(f"{mode:10s} {requests:14.2f} {wall['mean']:10.2f} {wall['p95']:9.2f} {llm['mean']:9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent_conversation against a fake LLM server")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--servers", type=int, default=1, help="Number of fake backends to route between")
+    parser.add_argument("--ttft", default="fixed:0.2")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Probability of a reply that breaks the expected format")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stream", action="store_true", help="Use agent_conversation_stream")
+    parser.add_argument("--prompt-layout", choices=["single", "session"], default="single")
+    parser.add_argument("--structured", action="store_true", help="Request JSON schema outputs")
+    parser.add_argument("--context-tokens", type=int, default=None,
+                        help="Token budget per memory/history section (default: no budget)")
+    parser.add_argument("--semantic-threshold", type=float, default=None,
+                        help="Enable the semantic cache for summary/reflection calls (and JSON emotion ratings) at this similarity")
+    parser.add_argument("--aux-model", default=None,
+                        help="Route emotion/summary/reflection/repair calls to this model with tight output limits")
+    parser.add_argument("--aux-speedup", type=float, default=3.0,
+                        help="How much faster the fake server serves --aux-model")
+    parser.add_argument("--turn-mode", choices=["standard", "fused", "both"], default="standard",
+                        help="Separate emotion/speech/summary calls, one fused call per turn, or compare both")
+    parser.add_argument("--emotion-measurement", choices=["inline", "background"], default="inline",
+                        help="Wait for emotion measurements in the turn, or run them on a background worker")
+    parser.add_argument("--emotion-sampling", action="store_true",
+                        help="Measure emotions only on sentiment shifts, novel messages or after --sampling-max-skips")
+    parser.add_argument("--sampling-sentiment-delta", type=float, default=0.3)
+    parser.add_argument("--sampling-novelty", type=float, default=0.5)
+    parser.add_argument("--sampling-max-skips", type=int, default=3)
+    parser.add_argument("--turn-budget", type=float, default=None,
+                        help="Per-turn time budget in seconds; optional steps degrade when it runs short")
+    parser.add_argument("--speech-reserve", type=float, default=8.0,
+                        help="Part of --turn-budget kept for speech generation")
+    parser.add_argument("--db", default=None, help="Scenario DB to create (default: temporary file)")
+    parser.add_argument("--json", default=None, help="Write per-turn results and summary to this file")
+    args = parser.parse_args()
+
+    servers = [
+        start_fake_server(ttft=args.ttft, tokens_per_sec=args.tokens_per_sec,
+                          error_rate=args.error_rate, malformed_rate=args.malformed_rate,
+                          model_speedups={args.aux_model: args.aux_speedup} if args.aux_model else None,
+                          seed=args.seed + i)
+        for i in range(args.servers)
+    ]
+    llm_connector.set_llm_backends([server.base_url for server in servers])
+    set_conversation_prompt_layout(args.prompt_layout)
+    set_structured_output(args.structured)
+    if args.aux_model:
+        llm_connector.set_llm_routes(auxiliary_routes(args.aux_model))
+    set_emotion_measurement(args.emotion_measurement)
+    if args.turn_budget is not None:
+        set_turn_time_budget(args.turn_budget, speech_reserve=args.speech_reserve)
+    if args.context_tokens:
+        set_token_budget(TokenBudget(short_term=args.context_tokens, long_term=args.context_tokens,
+                                     history=2 * args.context_tokens))
+
+    modes = ["standard", "fused"] if args.turn_mode == "both" else [args.turn_mode]
+    runs = {}
+    for mode in modes:
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_"), "scenario_bench.db")
+        if len(modes) > 1:
+            root, ext = os.path.splitext(db_path)
+            db_path = f"{root}_{mode}{ext}"
+            print(f"\n=== Turn mode: {mode} ===")
+        set_turn_mode(mode)
+        runs[mode] = run_mode(args, servers, db_path)
+
+    if len(modes) > 1:
+        print_mode_comparison(runs)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            payload = runs[modes[0]] if len(modes) == 1 else {"modes": runs}
+            json.dump(dict(payload, args=vars(args)), f, indent=2)
+
+    for server in servers:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,508 @@
+# fake_llm_server.py
+"""
+Local stand-in for the OpenAI-compatible model host, for benchmarks and offline tests.
+
+Serves POST /v1/chat/completions (plain and stream=true), GET /v1/models and GET /stats.
+Answers are canned but follow the formats the pipeline parses:
+  - conversation prompts -> "Thought process: ... Speech: ..."
+  - emotion questionnaire -> one number from 1 to 5 per listed emotion (8 by default)
+  - summaries / reflections -> one or two short sentences
+  - requests with a json_schema response_format -> a JSON object built from the schema
+
+Latency = time-to-first-token (sampled from a distribution) + completion tokens / tokens-per-second.
+Errors (HTTP status), hangs and malformed replies can be injected with a given probability.
+Requests for a model listed in --fast-model run that many times faster (a stand-in for a small
+model on the same host); max_tokens and stop sequences are honored.
+
+Usage:
+    python fake_llm_server.py --port 11434 --ttft lognormal:0.4,0.5 --tokens-per-sec 40
+    python fake_llm_server.py --error-rate 0.05 --error-status 503 --hang-rate 0.01
+    python fake_llm_server.py --malformed-rate 0.1
+    python fake_llm_server.py --fast-model llama3.2:1b=3
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+###################################
+# Latency Profiles
+###################################
+
+class LatencyProfile:
+    """
+    Random delay in seconds, described by a spec string:
+      "fixed:S", "uniform:LO,HI", "lognormal:MEDIAN,SIGMA", "pareto:MIN,ALPHA"
+    """
+
+    def __init__(self, spec="fixed:0"):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        samplers = {
+            "fixed": lambda rng, s: s,
+            "uniform": lambda rng, lo, hi: rng.uniform(lo, hi),
+            "lognormal": lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma),
+            "pareto": lambda rng, minimum, alpha: minimum * rng.paretovariate(alpha),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency profile: {spec}")
+        self._sampler = samplers[kind]
+
+    def sample(self, rng):
+        return max(0.0, self._sampler(rng, *self.params))
+
+    def __repr__(self):
+        return f"LatencyProfile({self.kind}:{','.join(str(p) for p in self.params)})"
+
+###################################
+# Canned Outputs
+###################################
+
+SPEECHES = [
+    "I hear you, and I think we can still turn this around if we keep our heads.",
+    "Honestly, that worries me. Let's look at what actually went wrong before we decide anything.",
+    "I'm not going to pretend this is easy, but I trust that we can handle it together.",
+    "That's fair. Give me a moment to think about the next step we should take.",
+    "I'm frustrated too, but blaming each other won't get the work done.",
+]
+
+THOUGHTS = [
+    "My memories remind me that we have recovered from setbacks before, so staying calm is the better choice.",
+    "The other person sounds stressed. Acknowledging that first should make the rest of the talk easier.",
+    "My current emotions lean towards anxiety, but my reflections suggest focusing on a concrete plan.",
+]
+
+REFLECTIONS = {
+    "strategy": "Stay calm, list the concrete problems, and agree on one next step together.",
+    "lesson": "Pressure is easier to handle when problems are shared early instead of hidden.",
+    "summary": "The team is under pressure after a setback and is trying to agree on how to respond.",
+    "prediction": "If the plan is agreed on quickly, the tension will likely ease within a few turns.",
+    "general": "Listening first tends to make difficult conversations more productive.",
+}
+
+SUMMARY = "A short recap of the recent exchange and how the speaker felt about it."
+
+def _message_text(messages, role):
+    return "\n".join(
+        m.get("content") or "" for m in messages
+        if m.get("role") == role and isinstance(m.get("content"), str)
+    )
+
+def classify_request(messages):
+    """
+    Guess which pipeline step sent the request from its prompt.
+
+    Returns:
+        str: "emotion", "conversation", "reflection:<type>", "summary" or "other".
+    """
+    system = _message_text(messages, "system")
+    user = _message_text(messages, "user")
+    if "numbers from 1 to 5" in system or "numbers from 1 to 5" in user:
+        return "emotion"
+    if "Speech:" in user and "Thought process:" in user:
+        return "conversation"
+    match = re.search(r"^Type: (\w+)", user, re.MULTILINE)
+    if match:
+        return f"reflection:{match.group(1)}"
+    if user.startswith("Summarize"):
+        return "summary"
+    return "other"
+
+def _asked_items(messages):
+    # 감정 설문의 번호 목록("1. Joy") 개수, 없으면 8개
+    return len(re.findall(r"^\d+\. \w+", _message_text(messages, "user"), re.MULTILINE)) or 8
+
+def canned_response(kind, rng, items=8):
+    """
+    Args:
+        kind (str): Request kind from classify_request.
+        rng (random.Random): Source of randomness.
+        items (int): Number of scores for an emotion questionnaire.
+
+    Returns:
+        str: A completion in the format the caller of `kind` expects.
+    """
+    if kind == "emotion":
+        return "\n".join(str(rng.randint(1, 5)) for _ in range(items))
+    if kind == "conversation":
+        return f"Thought process:\n{rng.choice(THOUGHTS)}\n\nSpeech:\n{rng.choice(SPEECHES)}"
+    if kind.startswith("reflection:"):
+        return REFLECTIONS.get(kind.split(":", 1)[1], REFLECTIONS["general"])
+    if kind == "summary":
+        return SUMMARY
+    return rng.choice(SPEECHES)
+
+def json_response(schema, kind, rng):
+    """
+    Build a JSON object matching a response_format schema (objects, strings and integers).
+
+    Returns:
+        dict: One value per property, in schema order.
+    """
+    value = {}
+    for key, subschema in (schema.get("properties") or {}).items():
+        if subschema.get("type") == "object":
+            value[key] = json_response(subschema, kind, rng)
+        elif subschema.get("type") == "integer":
+            value[key] = rng.randint(subschema.get("minimum", 1), subschema.get("maximum", 5))
+        elif key == "speech":
+            value[key] = rng.choice(SPEECHES)
+        elif key.startswith("thought"):
+            value[key] = rng.choice(THOUGHTS)
+        elif key.endswith("summary"):
+            value[key] = SUMMARY
+        else:
+            value[key] = canned_response(kind, rng) if kind != "emotion" else rng.choice(SPEECHES)
+    return value
+
+def malform(text, kind, rng):
+    """
+    Break a reply the way small models do: drop a JSON key, forget the "Speech:" header
+    or leave out some emotion scores.
+    """
+    if text.startswith("{"):
+        value = json.loads(text)
+        if value:
+            value.pop(list(value)[-1])
+        return json.dumps(value)
+    if kind == "conversation":
+        return text.replace("Speech:\n", "")
+    if kind == "emotion":
+        lines = text.split("\n")
+        for _ in range(min(2, len(lines) - 1)):
+            lines.pop(rng.randrange(len(lines)))
+        return "\n".join(lines)
+    return text
+
+def count_tokens(text):
+    # 대략적인 토큰 수 (영어 기준 약 4글자 = 1토큰)
+    return max(1, len(text) // 4)
+
+def split_tokens(text):
+    """
+    Split text into stream pieces that join back to the exact text.
+    """
+    return re.findall(r"\S+\s*|\s+", text)
+
+###################################
+# Server
+###################################
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer that holds the fake model's configuration and counters.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, ttft="fixed:0.2", tokens_per_sec=50.0, error_rate=0.0,
+                 error_status=503, hang_rate=0.0, hang_seconds=120.0, malformed_rate=0.0,
+                 model="llama3.1", model_speedups=None, seed=None):
+        """
+        Args:
+            address (tuple): (host, port) to bind, port 0 picks a free port.
+            ttft (str): LatencyProfile spec for the time to first token.
+            tokens_per_sec (float): Decode speed after the first token (0 = instant).
+            error_rate (float): Probability of answering with `error_status`.
+            error_status (int): HTTP status used for injected errors.
+            hang_rate (float): Probability of sleeping `hang_seconds` before answering.
+            hang_seconds (float): Length of an injected hang.
+            malformed_rate (float): Probability of a reply that breaks the expected format.
+            model (str): Model id reported by /v1/models.
+            model_speedups (dict, optional): {model name: factor}; requests for these models get
+                `factor` times shorter TTFT and `factor` times faster decoding.
+            seed (int, optional): Seed for reproducible latencies and outputs.
+        """
+        super().__init__(address, FakeLLMHandler)
+        self.ttft = LatencyProfile(ttft)
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.malformed_rate = malformed_rate
+        self.model = model
+        self.model_speedups = dict(model_speedups or {})
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.model_counters = {}
+        self.requests = 0
+        self.errors = 0
+        self.malformed = 0
+        self.busy_seconds = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def plan(self, messages, max_tokens=None, response_format=None, model=None, stop=None):
+        """
+        Draw everything random about one request up front, under the lock.
+
+        Returns:
+            dict: kind, text, ttft, per-token delay, and injected error/hang.
+        """
+        schema = ((response_format or {}).get("json_schema") or {}).get("schema")
+        with self.lock:
+            kind = classify_request(messages)
+            if schema:
+                text = json.dumps(json_response(schema, kind, self.rng))
+            else:
+                text = canned_response(kind, self.rng, _asked_items(messages))
+            if self.rng.random() < self.malformed_rate:
+                text = malform(text, kind, self.rng)
+                self.malformed += 1
+            if max_tokens:
+                text = text[: max_tokens * 4]
+            for sequence in stop or []:
+                if sequence and sequence in text:
+                    text = text[: text.index(sequence)]
+            speedup = self.model_speedups.get(model, 1.0)
+            ttft = self.ttft.sample(self.rng) / speedup
+            error = self.rng.random() < self.error_rate
+            hang = self.rng.random() < self.hang_rate
+            self.requests += 1
+            self.counters[kind] = self.counters.get(kind, 0) + 1
+            model = model or self.model
+            self.model_counters[model] = self.model_counters.get(model, 0) + 1
+            if error:
+                self.errors += 1
+        per_token = 1.0 / (self.tokens_per_sec * speedup) if self.tokens_per_sec else 0.0
+        return {"kind": kind, "text": text, "ttft": ttft, "per_token": per_token,
+                "error": error, "hang": hang}
+
+    def track(self, delta, seconds=0.0):
+        with self.lock:
+            self.in_flight += delta
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.busy_seconds += seconds
+
+    def stats(self):
+        """
+        Returns:
+            dict: Request counts by kind, injected errors, summed simulated service time
+                  and peak concurrency.
+        """
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "by_kind": dict(self.counters),
+                "by_model": dict(self.model_counters),
+                "errors": self.errors,
+                "malformed": self.malformed,
+                "busy_seconds": self.busy_seconds,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters = {}
+            self.model_counters = {}
+            self.requests = 0
+            self.errors = 0
+            self.malformed = 0
+            self.busy_seconds = 0.0
+            self.max_in_flight = self.in_flight
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # 요청마다 로그를 찍지 않음
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/v1/models":
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": self.server.model, "object": "model", "owned_by": "fake"}],
+            })
+        elif path == "/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        if path != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        messages = body.get("messages") or []
+        stop = body.get("stop")
+        plan = self.server.plan(messages, body.get("max_tokens"), body.get("response_format"),
+                                body.get("model"), [stop] if isinstance(stop, str) else stop)
+        start = time.monotonic()
+        self.server.track(+1)
+        try:
+            if plan["hang"]:
+                time.sleep(self.server.hang_seconds)
+            if plan["error"]:
+                time.sleep(plan["ttft"])
+                self._send_json(self.server.error_status, {
+                    "error": {"message": "Injected error", "type": "server_error"},
+                })
+            elif body.get("stream"):
+                self._stream(body, messages, plan)
+            else:
+                self._complete(body, messages, plan)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 헤지/취소로 연결을 끊은 경우
+        finally:
+            self.server.track(-1, time.monotonic() - start)
+
+    def _usage(self, messages, text):
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages
+                            if isinstance(m.get("content"), str))
+        completion_tokens = count_tokens(text)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _complete(self, body, messages, plan):
+        text = plan["text"]
+        time.sleep(plan["ttft"] + plan["per_token"] * count_tokens(text))
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.server.model),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": self._usage(messages, text),
+        })
+
+    def _stream(self, body, messages, plan):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", self.server.model)
+
+        def chunk(delta, finish_reason=None, usage=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(plan["ttft"])
+        chunk({"role": "assistant", "content": ""})
+        pieces = split_tokens(plan["text"])
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(plan["per_token"] * count_tokens(piece))
+            chunk({"content": piece})
+        usage = self._usage(messages, plan["text"])
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        chunk({}, "stop", usage if include_usage else None)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+###################################
+# Entry Points
+###################################
+
+def start_fake_server(host="127.0.0.1", port=0, **options):
+    """
+    Start a fake LLM server on a background thread.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind, 0 picks a free one.
+        **options: FakeLLMServer options (ttft, tokens_per_sec, error_rate, ...).
+
+    Returns:
+        FakeLLMServer: The running server. Its base_url can be passed to
+        llm_connector.set_llm_backends; call shutdown() to stop it.
+    """
+    server = FakeLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", default="fixed:0.2",
+                        help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA | pareto:MIN,ALPHA")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--model", default="llama3.1")
+    parser.add_argument("--fast-model", action="append", default=[], metavar="NAME=FACTOR",
+                        help="Serve requests for NAME FACTOR times faster (repeatable)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        (args.host, args.port),
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        malformed_rate=args.malformed_rate,
+        model=args.model,
+        model_speedups={name: float(factor) for name, factor in
+                        (item.rsplit("=", 1) for item in args.fast_model)},
+        seed=args.seed,
+    )
+    print(f"Fake LLM server listening on {server.base_url} (ttft={server.ttft}, "
+          f"{args.tokens_per_sec} tok/s, errors={args.error_rate}, hangs={args.hang_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# llm_gateway.py
+"""
+Shared LLM gateway for every runner and web process on this machine.
+
+Exposes an OpenAI-compatible endpoint on localhost and sends each request through
+llm_connector (response cache, micro-batching, adaptive concurrency limit, hedging and
+backend routing). Processes that point at the gateway share one cache and one concurrency
+budget instead of competing for the model server with separate clients.
+
+Endpoints:
+    POST /v1/chat/completions   plain and stream=true (X-LLM-Purpose / X-LLM-Hedge headers optional)
+    GET  /v1/models
+    GET  /metrics               gateway counters plus cache/batching/limiter/backend stats (JSON)
+
+Usage (from agent_interaction/):
+    python llm_gateway.py --backend http://10.12.121.81:11434/v1 --cache llm_cache.db
+    LLM_GATEWAY_URL=http://127.0.0.1:8765/v1 python app2.py
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import llm_connector
+from utils.llm_concurrency import percentile
+
+###################################
+# Gateway Metrics
+###################################
+
+class GatewayMetrics:
+    """
+    Request counters of the gateway, by purpose and by client address.
+    """
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.by_purpose = {}
+        self.by_client = {}
+        self.latencies = deque(maxlen=window)
+
+    def start(self, purpose, client):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.by_purpose[purpose] = self.by_purpose.get(purpose, 0) + 1
+            self.by_client[client] = self.by_client.get(client, 0) + 1
+
+    def finish(self, seconds, failed=False):
+        with self.lock:
+            self.in_flight -= 1
+            self.latencies.append(seconds)
+            if failed:
+                self.errors += 1
+
+    def stats(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            return {
+                "uptime": time.time() - self.started,
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "by_purpose": dict(self.by_purpose),
+                "by_client": dict(self.by_client),
+                "latency_p50": percentile(latencies, 0.5),
+                "latency_p95": percentile(latencies, 0.95),
+            }
+
+###################################
+# Server
+###################################
+
+class LLMGateway(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer that forwards chat completions to llm_connector.
+    Handler threads block on the connector's sync API; the requests themselves all run
+    on the connector's single event loop.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, max_retries=3):
+        """
+        Args:
+            address (tuple): (host, port) to bind, port 0 picks a free port.
+            max_retries (int): Attempts per request before the gateway answers 502.
+        """
+        super().__init__(address, GatewayHandler)
+        self.max_retries = max_retries
+        self.metrics = GatewayMetrics()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def metrics_snapshot(self):
+        return {
+            "gateway": self.metrics.stats(),
+            "cache": llm_connector.get_llm_cache_stats(),
+            "batching": llm_connector.get_llm_batching_stats(),
+            "concurrency": llm_connector.get_llm_concurrency_stats(),
+            "hedging": llm_connector.get_llm_hedging_stats(),
+            "backends": llm_connector.get_llm_backend_stats(),
+        }
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # 요청마다 로그를 찍지 않음 (/metrics 참고)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/v1/models":
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": llm_connector.llm_model, "object": "model", "owned_by": "gateway"}],
+            })
+        elif path == "/metrics":
+            self._send_json(200, self.server.metrics_snapshot())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        if path != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        messages = [{"role": m.get("role", "user"), "content": m.get("content") or ""}
+                    for m in body.get("messages") or []]
+        purpose = self.headers.get("X-LLM-Purpose") or None
+        hedge = self.headers.get("X-LLM-Hedge") == "1"
+
+        metrics = self.server.metrics
+        metrics.start(purpose or "unknown", self.client_address[0])
+        start = time.monotonic()
+        failed = False
+        try:
+            if body.get("stream"):
+                self._stream(body, messages, purpose)
+            else:
+                self._complete(body, messages, purpose, hedge)
+        except (BrokenPipeError, ConnectionResetError):
+            failed = True  # 클라이언트가 연결을 끊은 경우
+        except Exception as e:
+            failed = True
+            self._send_json(502, {"error": {"message": str(e), "type": "upstream_error"}})
+        finally:
+            metrics.finish(time.monotonic() - start, failed)
+
+    def _complete(self, body, messages, purpose, hedge):
+        response = llm_connector.query_llm_dict(
+            messages,
+            max_retries=self.server.max_retries,
+            hedge=hedge,
+            purpose=purpose,
+            response_format=body.get("response_format"),
+        )
+        payload = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", llm_connector.llm_model),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": response["choices"][0]["message"]["content"]},
+                "finish_reason": "stop",
+            }],
+        }
+        if response.get("usage"):
+            usage = dict(response["usage"])
+            usage["total_tokens"] = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+            payload["usage"] = usage
+        self._send_json(200, payload)
+
+    def _stream(self, body, messages, purpose):
+        stream = llm_connector.stream_llm_dict(
+            messages,
+            max_retries=self.server.max_retries,
+            purpose=purpose,
+            response_format=body.get("response_format"),
+        )
+        # 첫 조각을 받은 뒤에 헤더를 보내야 업스트림 실패를 502로 돌려줄 수 있음
+        first = next(stream, None)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", llm_connector.llm_model)
+
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            if first is not None:
+                chunk({"content": first})
+            for piece in stream:
+                chunk({"content": piece})
+            chunk({}, "stop")
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        finally:
+            stream.close()  # 클라이언트가 끊으면 업스트림 요청도 취소
+
+###################################
+# Entry Points
+###################################
+
+def start_gateway(host="127.0.0.1", port=0, max_retries=3):
+    """
+    Start the gateway on a background thread (backends/cache must already be configured
+    through llm_connector).
+
+    Returns:
+        LLMGateway: The running gateway; call shutdown() to stop it.
+    """
+    gateway = LLMGateway((host, port), max_retries)
+    threading.Thread(target=gateway.serve_forever, daemon=True).start()
+    return gateway
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared local LLM gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", action="append", default=None,
+                        help="Model server base URL or GGUF path (repeatable, default: LLM_BASE_URL)")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--cache", default=None, help="SQLite response cache shared by all clients")
+    parser.add_argument("--batch-window-ms", type=float, default=None)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--telemetry", default=None, help="Record every upstream call to this DB or .jsonl file")
+    parser.add_argument("--max-retries", type=int, default=3)
+    args = parser.parse_args()
+
+    # 게이트웨이 자신은 LLM_GATEWAY_URL을 따르지 않고 실제 모델 서버로 보냄
+    llm_connector.llm_gateway_url = None
+    llm_connector.set_llm_backends(args.backend or [llm_connector.LLM_BASE_URL], model=args.model)
+    llm_connector.set_llm_concurrency(initial_limit=min(5, args.max_concurrency), max_limit=args.max_concurrency)
+    if args.cache:
+        llm_connector.set_llm_cache(args.cache)
+    if args.batch_window_ms:
+        llm_connector.set_llm_batching(window_ms=args.batch_window_ms)
+    if args.telemetry:
+        llm_connector.set_llm_telemetry(args.telemetry, run="gateway")
+
+    gateway = LLMGateway((args.host, args.port), args.max_retries)
+    print(f"LLM gateway listening on {gateway.base_url} -> {args.backend or [llm_connector.LLM_BASE_URL]}")
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.server_close()
+        llm_connector.flush_llm_telemetry()
+
+if __name__ == "__main__":
+    main()
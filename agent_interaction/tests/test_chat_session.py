@@ -0,0 +1,44 @@
+import sqlite3
+
+from utils import chat_session
+from utils.chat_session import format_reply, get_chat_session, reset_chat_sessions
+
+def _scenario_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, turn INTEGER, speaker TEXT, message TEXT)")
+    conn.executemany("INSERT INTO conversations (turn, speaker, message) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+def test_replies_keep_the_answer_format(tmp_path):
+    db_path = _scenario_db(str(tmp_path / "scenario_1.db"), [])
+    session = get_chat_session(db_path, "Garen", "Catarina")
+    session.add_exchange("Hello", format_reply("Hi there.", "She seems friendly."))
+    assert session.history_messages() == [
+        {"role": "user", "content": "Catarina: Hello"},
+        {"role": "assistant", "content": "Thought process:\nShe seems friendly.\n\nSpeech:\nHi there."},
+    ]
+    reset_chat_sessions(db_path)
+
+def test_rebuilt_from_db(tmp_path):
+    db_path = _scenario_db(str(tmp_path / "scenario_1.db"),
+                           [(3, "Catarina", "Hello"), (3, "Garen", "Hi there."), (4, "Garen", "Unanswered")])
+    session = get_chat_session(db_path, "Garen", "Catarina")
+    assert session.exchanges == [("Hello", "Speech:\nHi there.")]
+    reset_chat_sessions(db_path)
+
+def test_sessions_are_bounded_and_reset_per_scenario(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_session, "MAX_SESSIONS", 2)
+    paths = [_scenario_db(str(tmp_path / f"scenario_{i}.db"), []) for i in range(3)]
+    first = get_chat_session(paths[0], "Garen", "Catarina")
+    get_chat_session(paths[1], "Garen", "Catarina")
+    assert get_chat_session(paths[0], "Garen", "Catarina") is first  # 최근 사용으로 갱신
+    get_chat_session(paths[2], "Garen", "Catarina")
+    # 가장 오래 쓰지 않은 scenario_1 세션이 제거됨
+    assert [key[0] for key in chat_session._sessions] == [paths[0], paths[2]]
+
+    reset_chat_sessions(paths[0])
+    assert [key[0] for key in chat_session._sessions] == [paths[2]]
+    reset_chat_sessions()
+    assert not chat_session._sessions
@@ -0,0 +1,142 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from fake_llm_server import start_fake_server
+from utils import llm_connector
+from utils.emotion_methods import init_emotion_db
+from utils.deadline import (
+    DeadlineExceeded,
+    TurnDeadline,
+    current_deadline,
+    db_timeout,
+    degrade,
+    load_degradation_events,
+    optional_step,
+    remaining_time,
+    turn_deadline,
+    use_deadline,
+)
+
+def test_optional_step_leaves_reserve(tmp_path):
+    db_path = str(tmp_path / "scenario.db")
+    with turn_deadline(10.0, db_path, "agent_2", 3) as deadline:
+        with optional_step("emotion_before_speech", reserve=8.0, min_seconds=1.0) as allowed:
+            assert allowed
+            step = current_deadline()
+            assert step.hard and 1.5 < step.remaining() <= 2.0
+        assert current_deadline() is deadline and not deadline.hard
+
+        with optional_step("summary", reserve=9.5, min_seconds=1.0) as allowed:
+            assert not allowed
+            degrade("summary", "stored raw speech")
+    assert current_deadline() is None and remaining_time() is None
+
+    events = load_degradation_events(db_path)
+    assert [(e["agent_name"], e["turn"], e["step"], e["action"]) for e in events] == [
+        ("agent_2", 3, "summary", "stored raw speech")
+    ]
+    assert deadline.degradations[0]["step"] == "summary"
+
+def test_no_budget_changes_nothing():
+    with turn_deadline(None) as deadline:
+        assert deadline is None
+        with optional_step("summary", reserve=100.0, min_seconds=100.0) as allowed:
+            assert allowed
+        degrade("summary", "stored raw speech")  # 마감이 없으면 기록하지 않음
+    assert db_timeout() == 5.0
+
+def test_db_timeout_follows_remaining_time_only_in_optional_steps():
+    deadline = TurnDeadline(0, end=time.monotonic() + 2.0)
+    with use_deadline(deadline):
+        with optional_step("summary") as allowed:
+            assert allowed and 1.5 < db_timeout() <= 2.0
+        deadline.end = time.monotonic() + 0.1
+        with optional_step("summary"):
+            assert db_timeout() == 0.5
+
+        # 필수 쓰기(대화, 감정, 기억)는 예산을 다 써도 기본 대기 시간
+        deadline.end = time.monotonic() - 1.0
+        assert db_timeout() == 5.0
+
+def test_deadline_reaches_llm_loop_thread():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def read():
+        return current_deadline()
+
+    try:
+        with turn_deadline(5.0) as deadline:
+            # llm_connector.run_on_llm_loop는 이 전달에 의존함
+            seen = asyncio.run_coroutine_threadsafe(read(), loop).result()
+        assert seen is deadline
+        assert asyncio.run_coroutine_threadsafe(read(), loop).result() is None
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+def _stream_prompt():
+    return "Thought process:\n[...]\n\nSpeech:\n[...]"
+
+def test_hard_deadline_cancels_stream():
+    server = start_fake_server(ttft="fixed:3", tokens_per_sec=0)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    try:
+        start = time.monotonic()
+        with use_deadline(TurnDeadline(0.3, hard=True)):
+            with pytest.raises(DeadlineExceeded):
+                list(llm_connector.stream_llm(_stream_prompt(), purpose="speech"))
+        assert time.monotonic() - start < 2.0, "The stream should stop at the deadline, not at the first token"
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+def test_stream_retry_skipped_past_soft_deadline():
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, error_rate=1.0, error_status=503)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    try:
+        start = time.monotonic()
+        with use_deadline(TurnDeadline(0.5)):
+            with pytest.raises(DeadlineExceeded):
+                list(llm_connector.stream_llm(_stream_prompt(), retry_delay=2, purpose="speech"))
+        assert time.monotonic() - start < 1.5, "A retry after a 2s backoff cannot finish inside the turn"
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+def test_measurement_in_budget_reports_filled(tmp_path):
+    from utils import memo
+
+    db_path = str(tmp_path / "scenario.db")
+    init_emotion_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, turn INTEGER, speaker TEXT, message TEXT);
+        CREATE TABLE short_term_memory (id INTEGER PRIMARY KEY AUTOINCREMENT, agent_name TEXT, timestamp TEXT, content TEXT, importance INTEGER);
+        CREATE TABLE long_term_memory (id INTEGER PRIMARY KEY AUTOINCREMENT, agent_name TEXT, content TEXT, importance INTEGER,
+                                       last_accessed TEXT, reflection_type TEXT);
+    """)
+    conn.close()
+
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=2)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    try:
+        agent = SimpleNamespace(name="agent_2", partner_name="agent_1")
+        with turn_deadline(60.0, db_path, "agent_2", 1) as deadline:
+            filled = memo._measure_emotions_in_budget(db_path, agent, "emotion_before_speech")
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    # 예산 안에서 측정이 끝나면 채워진 것으로 보고, 저하 이벤트는 없음
+    assert filled and deadline.degradations == []
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM emotion_states WHERE agent_name = 'agent_2'").fetchone()[0] == 1
+    conn.close()
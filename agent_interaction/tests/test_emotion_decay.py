@@ -0,0 +1,87 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.emotion_decay import (
+    EmotionDecayModel,
+    last_event_time,
+    retrieve_emotions_at,
+    set_emotion_decay,
+)
+from utils.emotion_methods import empty_emotion_vector, init_emotion_db
+
+def test_relaxes_toward_persona_baseline():
+    model = EmotionDecayModel(baseline={"joy": 0.7}, half_life=60.0, half_lives={"anger": 30.0})
+    state = dict(empty_emotion_vector(), joy=0.1, anger=0.9)
+    relaxed = model.relax(state, 60.0)
+    assert relaxed["joy"] == pytest.approx(0.4)  # 기준 0.7까지 거리의 절반
+    assert relaxed["anger"] == pytest.approx(0.225)  # 기준이 없는 감정은 0, 반감기 30초 두 번
+    assert model.relax(state, 0.0) == state
+    assert EmotionDecayModel(half_life=None).relax(state, 1e6) == state
+
+def test_state_is_evaluated_at_read_time_without_writes(tmp_path):
+    db_path = str(tmp_path / "scenario.db")
+    init_emotion_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO emotion_states (agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation)
+        VALUES ('agent_1', 0.9, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.1)
+    """)
+    conn.commit()
+
+    since = last_event_time(db_path, "agent_1")
+    set_emotion_decay(EmotionDecayModel(baseline=0.5, half_life=120.0), "agent_1")
+    try:
+        at_event = retrieve_emotions_at(db_path, "agent_1", at=since)
+        later = retrieve_emotions_at(db_path, "agent_1", at=since + timedelta(seconds=240))
+    finally:
+        set_emotion_decay(None, "agent_1")
+
+    assert at_event["joy"] == pytest.approx(0.9)
+    assert later["joy"] == pytest.approx(0.6) and later["anticipation"] == pytest.approx(0.4)
+    assert conn.execute("SELECT COUNT(*) FROM emotion_states").fetchone()[0] == 1
+    conn.close()
+
+def _insert_states(db_path, rows):
+    init_emotion_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executemany("""
+        INSERT INTO emotion_states (agent_name, timestamp, joy, trust, fear, surprise, sadness, disgust, anger, anticipation)
+        VALUES (?, ?, ?, 0, 0, 0, 0, 0, 0, 0)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+def test_agent_relaxes_toward_its_initial_state(tmp_path):
+    db_path = str(tmp_path / "scenario.db")
+    _insert_states(db_path, [("calm", "2024-01-01 00:00:00", 0.0),
+                             ("excited", "2024-01-01 00:00:00", 0.0),
+                             ("excited", "2024-01-01 00:01:00", 0.8)])
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    set_emotion_decay(EmotionDecayModel(half_life=60.0))
+    try:
+        calm = retrieve_emotions_at(db_path, "calm", at=start + timedelta(hours=1))
+        excited = retrieve_emotions_at(db_path, "excited", at=start + timedelta(minutes=2))
+    finally:
+        set_emotion_decay(None)
+
+    # 모든 감정이 0인 에이전트는 0.5로 올라가지 않고 그대로 0
+    assert calm == empty_emotion_vector()
+    assert excited["joy"] == pytest.approx(0.2)  # 두 행의 평균 0.4에서 초기 상태 0까지 거리의 절반
+
+def test_past_time_is_rebuilt_from_earlier_rows(tmp_path):
+    db_path = str(tmp_path / "scenario.db")
+    _insert_states(db_path, [("agent_1", "2024-01-01 00:00:00", 0.4),
+                             ("agent_1", "2024-01-01 00:10:00", 1.0)])
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    set_emotion_decay(EmotionDecayModel(baseline=0.0, half_life=60.0), "agent_1")
+    try:
+        # 마지막 이벤트 이전 시점은 그때까지의 행으로 계산 (이후 행을 거꾸로 되돌리지 않음)
+        past = retrieve_emotions_at(db_path, "agent_1", at=start + timedelta(minutes=1))
+        with pytest.raises(ValueError):
+            retrieve_emotions_at(db_path, "agent_1", at=start - timedelta(minutes=1))
+    finally:
+        set_emotion_decay(None, "agent_1")
+
+    assert past["joy"] == pytest.approx(0.2)
@@ -0,0 +1,48 @@
+import sqlite3
+
+import numpy as np
+
+from utils.emotion_methods import init_emotion_db
+from utils.emotion_sampling import EmotionSamplingPolicy, evaluate_sampling
+
+SENTIMENT = {"calm": 0.0, "calm again": 0.05, "furious": -0.8, "new topic": 0.0}
+
+def _embed(text):
+    # "new topic"만 다른 방향 (코사인 거리 1)
+    return np.array([0.0, 1.0] if text == "new topic" else [1.0, 0.0], dtype=np.float32)
+
+def _policy(**kwargs):
+    return EmotionSamplingPolicy(sentiment=SENTIMENT.get, embed=_embed, **kwargs)
+
+def test_measures_only_on_triggers():
+    policy = _policy(sentiment_delta=0.3, novelty=0.5, max_skips=2)
+    decisions = [policy.should_measure("a.db", "agent_1", text)
+                 for text in ["calm", "calm again", "furious", "calm", "new topic", "new topic", "new topic", "new topic"]]
+    # first, 유지, 감성 변화, 감성 변화(되돌아옴), 새로운 내용, 유지, 유지, 건너뛴 횟수
+    assert decisions == [True, False, True, True, True, False, False, True]
+    assert policy.should_measure("b.db", "agent_1", "calm")  # 시나리오 DB별로 따로 추적
+
+    stats = policy.stats()
+    assert stats["measured"] == 6 and stats["carried"] == 3
+    assert stats["by_reason"] == {"first": 2, "sentiment": 2, "novelty": 1, "interval": 1}
+
+def test_drift_against_recorded_trajectory(tmp_path):
+    db_path = str(tmp_path / "scenario_1.db")
+    init_emotion_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, turn INTEGER, speaker TEXT, message TEXT)")
+    conn.executemany("INSERT INTO conversations (turn, speaker, message) VALUES (?, ?, ?)",
+                     [(1, "agent_2", "calm"), (2, "agent_1", "calm again"), (3, "agent_2", "calm"), (4, "agent_1", "furious")])
+    joy = [0.0, 0.2, 0.3, 0.4, 0.9]  # 첫 행은 초기 상태
+    conn.executemany("INSERT INTO emotion_states (agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation) "
+                     "VALUES ('agent_1', ?, 0, 0, 0, 0, 0, 0, 0)", [(value,) for value in joy])
+    conn.commit()
+    conn.close()
+
+    always = evaluate_sampling(db_path, _policy(sentiment_delta=None, novelty=None, max_skips=0))
+    assert always["measured"] == always["points"] == 4 and always["drift_mean"] == 0.0
+
+    sampled = evaluate_sampling(db_path, _policy(sentiment_delta=0.3, novelty=None, max_skips=None))
+    # calm(측정) / calm again, calm(유지: 0.2로 고정) / furious(측정)
+    assert sampled["measured"] == 2
+    assert abs(sampled["drift_max"] - 0.2 / 8) < 1e-9 and sampled["drift_final"] == 0.0
@@ -0,0 +1,72 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from utils.emotion_decay import EmotionDecayModel, retrieve_emotions_at, set_emotion_decay
+from utils.emotion_methods import init_emotion_db, retrieve_current_emotions, update_emotion
+from utils.emotion_vector import (
+    EMOTION_KEYS,
+    blend,
+    decay,
+    emotion_vector,
+    retrieve_current_emotion_matrix,
+    retrieve_emotion_matrix_at,
+    to_emotion_dict,
+    update_emotions_batch,
+)
+
+def test_vector_operations():
+    matrix = np.array([[0.9, 0.2, 1.4, -0.1, 0.5, 0.5, 0.5, 0.5],
+                       [0.8, 0.8, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]], dtype=np.float32)
+    cooled = decay(matrix, 0.2, above=0.7)
+    # adjust_emotions와 같은 규칙: 0.7을 넘는 값만 0.5 쪽으로, 결과는 0~1
+    assert np.allclose(cooled[0], [0.82, 0.2, 1.0, 0.0, 0.5, 0.5, 0.5, 0.5])
+    assert np.allclose(cooled[1, :2], [0.74, 0.74])
+
+    mixed = blend(matrix, np.zeros_like(matrix), np.array([0.0, 0.5], dtype=np.float32))
+    assert np.allclose(mixed[1, :2], [0.4, 0.4]) and mixed[0, 0] == np.float32(0.9)
+
+    emotions = to_emotion_dict(emotion_vector({name: 0.25 for name in EMOTION_KEYS}))
+    assert list(emotions) == list(EMOTION_KEYS) and emotions["anger"] == 0.25
+
+def test_batch_update_matches_per_agent_updates(tmp_path):
+    per_agent_db = str(tmp_path / "per_agent.db")
+    batched_db = str(tmp_path / "batched.db")
+    init_emotion_db(per_agent_db)
+    init_emotion_db(batched_db)
+    updates = [("agent_1", "positive_interaction", 0.6),
+               ("agent_2", "negative_interaction", -0.4),
+               ("agent_3", "something_else", 0.0)]
+
+    for _ in range(3):
+        for name, event, score in updates:
+            update_emotion(per_agent_db, name, event, score)
+        update_emotions_batch(batched_db, updates)
+
+    names = [name for name, _, _ in updates]
+    expected = [[retrieve_current_emotions(per_agent_db, name)[key] for key in EMOTION_KEYS] for name in names]
+    assert np.allclose(retrieve_current_emotion_matrix(batched_db, names), expected, atol=1e-6)
+
+    conn = sqlite3.connect(batched_db)
+    assert conn.execute("SELECT COUNT(*) FROM emotion_states").fetchone()[0] == 9
+    conn.close()
+
+def test_matrix_at_relaxes_only_agents_with_a_decay_model(tmp_path):
+    db_path = str(tmp_path / "decay.db")
+    init_emotion_db(db_path)
+    names = ["agent_1", "agent_2"]
+    update_emotions_batch(db_path, [("agent_1", "positive_interaction", 0.8),
+                                    ("agent_2", "negative_interaction", -0.8)])
+    later = datetime.now(timezone.utc) + timedelta(seconds=600)
+
+    set_emotion_decay(EmotionDecayModel(baseline=0.0, half_life=600.0), agent_name="agent_2")
+    try:
+        matrix = retrieve_emotion_matrix_at(db_path, names, later)
+        expected = [[retrieve_emotions_at(db_path, name, later)[key] for key in EMOTION_KEYS] for name in names]
+    finally:
+        set_emotion_decay(None, agent_name="agent_2")
+
+    assert np.allclose(matrix, expected, atol=1e-6)
+    assert np.allclose(matrix[0], retrieve_current_emotion_matrix(db_path, names)[0])
+    assert matrix[1].max() < retrieve_current_emotion_matrix(db_path, names)[1].max()  # 반감기 한 번만큼 식음
@@ -0,0 +1,90 @@
+import math
+import os
+import random
+import sqlite3
+
+from utils.emotion_methods import empty_emotion_vector, init_emotion_db, retrieve_current_emotions
+
+def _insert(db_path, rng, count, timestamps=None):
+    conn = sqlite3.connect(db_path)
+    for i in range(count):
+        values = (rng.choice(["agent_1", "agent_2"]), *[rng.random() for _ in range(8)])
+        if timestamps is None:
+            conn.execute("""
+                INSERT INTO emotion_states (agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, values)
+        else:
+            conn.execute("""
+                INSERT INTO emotion_states (agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (*values, timestamps[i]))
+    conn.commit()
+    conn.close()
+
+def _scan_average(db_path, agent_name, recent_n=10):
+    # 창 테이블 도입 전의 계산 (최근 N행을 최신순으로 더해 나눔)
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT joy, trust, fear, surprise, sadness, disgust, anger, anticipation
+        FROM emotion_states WHERE agent_name = ? ORDER BY timestamp DESC, id DESC LIMIT ?
+    """, (agent_name, recent_n)).fetchall()
+    conn.close()
+    average = empty_emotion_vector()
+    for row in rows:
+        for i, emotion in enumerate(average.keys()):
+            average[emotion] += row[i]
+    for emotion in average:
+        average[emotion] /= len(rows)
+    return average
+
+def _close(left, right):
+    # 창은 누적 합계를 쓰므로 반올림 오차 안에서 같음
+    return all(math.isclose(left[name], right[name], abs_tol=1e-9) for name in right)
+
+def test_window_matches_scan(tmp_path):
+    db_path = str(tmp_path / "scenario.db")
+    init_emotion_db(db_path)
+    rng = random.Random(7)
+
+    _insert(db_path, rng, 25)  # 창이 생기기 전의 행은 첫 조회에서 채워짐
+    for agent_name in ("agent_1", "agent_2"):
+        assert _close(retrieve_current_emotions(db_path, agent_name), _scan_average(db_path, agent_name))
+
+    _insert(db_path, rng, 40)  # 이후의 행은 트리거가 반영
+    for agent_name in ("agent_1", "agent_2"):
+        assert _close(retrieve_current_emotions(db_path, agent_name), _scan_average(db_path, agent_name))
+        assert retrieve_current_emotions(db_path, agent_name, recent_n=3) == _scan_average(db_path, agent_name, 3)
+
+    conn = sqlite3.connect(db_path)
+    sizes = dict(conn.execute("SELECT agent_name, COUNT(*) FROM emotion_window GROUP BY agent_name").fetchall())
+    conn.close()
+    assert sizes == {"agent_1": 10, "agent_2": 10}
+
+def test_window_evicts_in_read_order(tmp_path):
+    db_path = str(tmp_path / "backfilled.db")
+    init_emotion_db(db_path)
+    rng = random.Random(11)
+    retrieve_current_emotions(db_path, "agent_1")
+
+    # 나중에 들어온 행이 더 이른 시각을 가질 때 (가져온 기록, 시계 보정 등)
+    timestamps = [f"2024-01-01 00:{rng.randrange(60):02d}:00" for _ in range(60)]
+    _insert(db_path, rng, 60, timestamps)
+    for agent_name in ("agent_1", "agent_2"):
+        assert _close(retrieve_current_emotions(db_path, agent_name), _scan_average(db_path, agent_name))
+
+def test_db_recreated_at_the_same_path_gets_a_window(tmp_path):
+    db_path = str(tmp_path / "scenario.db")
+    rng = random.Random(3)
+    for _ in range(2):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        init_emotion_db(db_path)
+        retrieve_current_emotions(db_path, "agent_1")
+        conn = sqlite3.connect(db_path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+        assert {"emotion_window", "emotion_window_totals"} <= tables  # 첫 조회에서 창이 생김
+        _insert(db_path, rng, 30)
+        for agent_name in ("agent_1", "agent_2"):
+            assert _close(retrieve_current_emotions(db_path, agent_name), _scan_average(db_path, agent_name))
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+from fake_llm_server import start_fake_server
+from utils import llm_connector
+from utils.emotion_measure import measure_and_update_emotions
+from utils.emotion_methods import init_emotion_db
+from utils.emotion_worker import EmotionMeasurementWorker
+
+def test_stale_jobs_collapse_and_stay_ordered():
+    started = threading.Event()
+    release = threading.Event()
+    measured = []
+
+    def measure(database_path, agent):
+        measured.append((database_path, agent.name, agent.turn))
+        if len(measured) == 1:
+            started.set()
+            release.wait(5)
+        return [3] * 8
+
+    worker = EmotionMeasurementWorker(measure, workers=2)
+    worker.submit("a.db", SimpleNamespace(name="agent_1", turn=1))
+    assert started.wait(5)
+
+    # 측정 중에 들어온 같은 에이전트의 작업 3개는 마지막 하나로 합쳐지고, 진행 중인 측정이 끝난 뒤 실행
+    for turn in (2, 3, 4):
+        worker.submit("a.db", SimpleNamespace(name="agent_1", turn=turn))
+    worker.submit("a.db", SimpleNamespace(name="agent_2", turn=2))
+    assert worker.pending_age("a.db", "agent_1") is not None
+
+    release.set()
+    assert worker.wait_idle(5)
+
+    agent_1 = [turn for _, name, turn in measured if name == "agent_1"]
+    assert agent_1 == [1, 4]
+    stats = worker.stats()
+    assert stats["submitted"] == 5 and stats["collapsed"] == 2 and stats["measured"] == 3
+    assert stats["pending"] == 0 and stats["lag_p95"] >= stats["lag_p50"] >= 0
+
+def test_failed_measurement_is_counted():
+    def measure(database_path, agent):
+        raise RuntimeError("LLM down")
+
+    worker = EmotionMeasurementWorker(measure, workers=1)
+    worker.submit("a.db", SimpleNamespace(name="agent_1"))
+    assert worker.wait_idle(5)
+    assert worker.stats()["failed"] == 1 and worker.stats()["measured"] == 0
+
+def test_unreadable_scores_count_as_failed():
+    results = iter([None, [3] * 8])
+
+    def measure(database_path, agent):
+        return next(results)  # measure_and_update_emotions는 점수를 읽지 못하면 None
+
+    worker = EmotionMeasurementWorker(measure, workers=1)
+    worker.submit("a.db", SimpleNamespace(name="agent_1"))
+    assert worker.wait_idle(5)
+    worker.submit("a.db", SimpleNamespace(name="agent_1"))
+    assert worker.wait_idle(5)
+    stats = worker.stats()
+    assert stats["failed"] == 1 and stats["measured"] == 1
+    # 실패한 측정은 지연/측정 시간 통계에 넣지 않음
+    assert len(worker.lags) == 1 and len(worker.durations) == 1
+
+def test_real_measurement_counts_as_measured(tmp_path):
+    db_path = str(tmp_path / "scenario_1.db")
+    init_emotion_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, turn INTEGER, speaker TEXT, message TEXT)")
+    conn.close()
+
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=3)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    try:
+        worker = EmotionMeasurementWorker(measure_and_update_emotions, workers=1)
+        worker.submit(db_path, SimpleNamespace(name="agent_1", partner_name="agent_2"))
+        assert worker.wait_idle(30)
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    # 실제 측정 함수가 저장한 상태를 돌려주므로 성공으로 집계되고 지연 통계가 남음
+    stats = worker.stats()
+    assert stats["measured"] == 1 and stats["failed"] == 0
+    assert stats["lag_p50"] is not None and len(worker.durations) == 1
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM emotion_states WHERE agent_name = 'agent_1'").fetchone()[0] == 1
+    conn.close()
+
+def test_job_runs_in_the_submitting_context_without_its_deadline():
+    import contextvars
+
+    from utils.deadline import current_deadline, turn_deadline
+
+    scenario = contextvars.ContextVar("scenario", default=None)
+    seen = []
+
+    def measure(database_path, agent):
+        seen.append((scenario.get(), current_deadline()))
+        return [3] * 8
+
+    worker = EmotionMeasurementWorker(measure, workers=1)
+    token = scenario.set("scenario_1")
+    try:
+        with turn_deadline(5.0):
+            worker.submit("a.db", SimpleNamespace(name="agent_1"))
+    finally:
+        scenario.reset(token)
+    assert worker.wait_idle(5)
+    # 시나리오 범위(텔레메트리, 카세트)는 따라가고 턴 마감은 따라가지 않음
+    assert seen == [("scenario_1", None)]
@@ -0,0 +1,79 @@
+import json
+import re
+import urllib.error
+import urllib.request
+
+from fake_llm_server import start_fake_server, classify_request
+
+def _post(server, body):
+    request = urllib.request.Request(
+        f"{server.base_url}/chat/completions",
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read().decode("utf-8")
+
+def test_classify_request():
+    emotion = [{"role": "system", "content": "You are a helpful assistant who can only reply numbers from 1 to 5."}]
+    assert classify_request(emotion) == "emotion"
+    assert classify_request([{"role": "user", "content": "...\nThought process:\n[..]\n\nSpeech:\n[..]"}]) == "conversation"
+    assert classify_request([{"role": "user", "content": "Memories...\nType: lesson\nSummarize"}]) == "reflection:lesson"
+    assert classify_request([{"role": "user", "content": "Summarize the following memory content"}]) == "summary"
+
+def test_completion_formats():
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=1)
+    try:
+        emotion = json.loads(_post(server, {"messages": [
+            {"role": "system", "content": "You can only reply numbers from 1 to 5."},
+            {"role": "user", "content": "Scenario"},
+        ]}))
+        scores = re.findall(r"\b([1-5])\b", emotion["choices"][0]["message"]["content"])
+        assert len(scores) == 8, "Emotion answers should contain exactly 8 scores"
+        assert emotion["usage"]["completion_tokens"] > 0
+
+        conversation = json.loads(_post(server, {"messages": [
+            {"role": "user", "content": "Thought process:\n[...]\n\nSpeech:\n[...]"},
+        ]}))
+        content = conversation["choices"][0]["message"]["content"]
+        assert content.startswith("Thought process:") and "\nSpeech:\n" in content
+
+        assert server.stats()["by_kind"] == {"emotion": 1, "conversation": 1}
+    finally:
+        server.shutdown()
+
+def test_streaming_joins_to_full_text():
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=2)
+    try:
+        raw = _post(server, {"stream": True, "messages": [
+            {"role": "user", "content": "Thought process:\n[...]\n\nSpeech:\n[...]"},
+        ]})
+        events = [line[len("data: "):] for line in raw.splitlines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event) for event in events[:-1]]
+        text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+        assert text.startswith("Thought process:") and "\nSpeech:\n" in text
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    finally:
+        server.shutdown()
+
+def test_error_injection():
+    server = start_fake_server(ttft="fixed:0", error_rate=1.0, error_status=429)
+    try:
+        _post(server, {"messages": [{"role": "user", "content": "Hi"}]})
+        assert False, "Expected an injected error"
+    except urllib.error.HTTPError as e:
+        assert e.code == 429
+    finally:
+        server.shutdown()
+
+def test_fast_model_and_stop():
+    server = start_fake_server(ttft="fixed:0.2", tokens_per_sec=0, model_speedups={"small": 10.0})
+    try:
+        plan = server.plan([{"role": "user", "content": "Summarize the following memory content"}],
+                           model="small", stop=["exchange"])
+        assert plan["ttft"] < 0.05
+        assert "exchange" not in plan["text"] and plan["text"]
+        assert server.stats()["by_model"] == {"small": 1}
+    finally:
+        server.shutdown()
@@ -0,0 +1,123 @@
+import asyncio
+
+from utils.llm_batching import RequestCoalescer
+
+def test_requests_in_window_share_a_batch():
+    batches = []
+
+    async def send_batch(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    async def run():
+        coalescer = RequestCoalescer(None, send_batch, window_ms=20, max_batch_size=8)
+        first = [coalescer.submit(i) for i in range(3)]
+        results = await asyncio.gather(*first)
+        await asyncio.sleep(0.05)  # 창이 지난 뒤의 요청은 새 배치
+        results.append(await coalescer.submit(3))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(run())
+    assert results == [0, 10, 20, 30]
+    assert batches == [[0, 1, 2], [3]]
+    assert coalescer.stats()["batches"] == 2 and coalescer.stats()["mean_batch_size"] == 2.0
+
+def test_full_batch_flushes_before_window():
+    batches = []
+
+    async def send_batch(items):
+        batches.append(list(items))
+        return items
+
+    async def run():
+        coalescer = RequestCoalescer(None, send_batch, window_ms=10_000, max_batch_size=2)
+        # 창이 10초여도 두 개가 모이면 바로 전송
+        return await asyncio.wait_for(asyncio.gather(*(coalescer.submit(i) for i in range(4))), 1.0)
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
+    assert batches == [[0, 1], [2, 3]]
+
+def test_errors_stay_with_their_request():
+    async def send_one(item):
+        await asyncio.sleep(0)
+        if item == "bad":
+            raise ValueError("bad request")
+        return item.upper()
+
+    async def send_batch(items):
+        return [ValueError("rejected") if item == "bad" else item.upper() for item in items]
+
+    async def run(coalescer):
+        return await asyncio.gather(*(coalescer.submit(item) for item in ["a", "bad", "c"]),
+                                    return_exceptions=True)
+
+    for coalescer in (RequestCoalescer(send_one, window_ms=5), RequestCoalescer(None, send_batch, window_ms=5)):
+        a, bad, c = asyncio.run(run(coalescer))
+        assert (a, c) == ("A", "C")
+        assert isinstance(bad, ValueError)
+
+    async def failing_batch(items):
+        raise ConnectionError("batch endpoint down")
+
+    results = asyncio.run(run(RequestCoalescer(None, failing_batch, window_ms=5)))
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+def test_short_batch_result_fails_every_caller():
+    async def send_batch(items):
+        return items[:1]  # 결과가 요청보다 적음
+
+    async def run():
+        coalescer = RequestCoalescer(None, send_batch, window_ms=5)
+        return await asyncio.wait_for(
+            asyncio.gather(*(coalescer.submit(i) for i in range(3)), return_exceptions=True), 1.0)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+def test_caller_timeout_cancels_the_send():
+    cancelled = []
+
+    async def send(item):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def run(coalescer):
+        calls = [asyncio.wait_for(coalescer.submit(i), 0.05) for i in range(2)]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return coalescer, results
+
+    # 요청별 전송 (턴 마감으로 포기한 요청은 제한기 슬롯을 계속 잡지 않음)
+    coalescer, results = asyncio.run(run(RequestCoalescer(send, window_ms=5)))
+    assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+    assert sorted(cancelled) == [0, 1] and not coalescer._tasks
+
+    # 배치 전송은 모든 호출자가 포기했을 때 취소
+    cancelled.clear()
+
+    async def send_batch(items):
+        await send("batch")
+
+    coalescer, _ = asyncio.run(run(RequestCoalescer(None, send_batch, window_ms=5)))
+    assert cancelled == ["batch"] and not coalescer._tasks
+
+def test_batch_task_is_kept_until_done():
+    release = None
+
+    async def send_batch(items):
+        await release.wait()
+        return items
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        coalescer = RequestCoalescer(None, send_batch, window_ms=1)
+        call = asyncio.ensure_future(coalescer.submit("a"))
+        await asyncio.sleep(0.02)
+        in_flight = len(coalescer._tasks)
+        release.set()
+        return in_flight, await call, len(coalescer._tasks)
+
+    assert asyncio.run(run()) == (1, "a", 0)
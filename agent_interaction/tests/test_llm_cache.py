@@ -0,0 +1,99 @@
+import asyncio
+import os
+import tempfile
+
+from utils.llm_cache import LLMResponseCache, make_cache_key
+
+def _response(text):
+    return {"choices": [{"message": {"content": text}}]}
+
+def test_cache_key_depends_on_request():
+    messages = [("system", "sys"), ("user", "Hello")]
+    key = make_cache_key("llama3.1", 0.7, messages)
+    assert key == make_cache_key("llama3.1", 0.7, list(messages)), "Identical requests should share a key"
+    assert key != make_cache_key("llama3.1", 0.2, messages), "Temperature should change the key"
+    assert key != make_cache_key("llama3.2", 0.7, messages), "Model should change the key"
+    assert key != make_cache_key("llama3.1", 0.7, [("system", "other"), ("user", "Hello")]), "System prompt should change the key"
+
+def test_hit_after_miss():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"))
+        assert cache.get("k") is None
+        cache.put("k", _response("hi"), latency=1.5)
+        assert cache.get("k") == _response("hi")
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["saved_seconds"] == 1.5
+        cache.close()
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"), max_entries=2)
+        cache.put("a", _response("a"), 0.1)
+        cache.put("b", _response("b"), 0.1)
+        cache.get("a")  # b becomes least recently used
+        cache.put("c", _response("c"), 0.1)
+        assert cache.get("b") is None, "Least recently used entry should be evicted"
+        assert cache.get("a") is not None and cache.get("c") is not None
+        cache.close()
+
+def test_ttl_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"), ttl_seconds=-1)
+        cache.put("k", _response("old"), 0.1)
+        assert cache.get("k") is None, "Expired entries should not be served"
+        cache.close()
+
+def test_single_flight():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return _response("shared")
+
+    async def run(cache):
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"))
+        results = asyncio.run(run(cache))
+        assert len(calls) == 1, "Concurrent identical requests should share one call"
+        assert all(r == _response("shared") for r in results)
+        assert cache.stats()["inflight_joins"] == 4
+        cache.close()
+
+def test_cancelled_leader_does_not_cancel_joiners():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return _response(f"call {len(calls)}")
+
+    async def run(cache):
+        leader = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        joiners = [asyncio.ensure_future(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()  # 예: 다른 턴의 마감이나 헤지 패배
+        results = await asyncio.gather(*joiners)
+        return leader, results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMResponseCache(os.path.join(tmp, "cache.db"))
+        leader, results = asyncio.run(run(cache))
+        assert leader.cancelled()
+        # 대기자 중 하나가 새 리더가 되어 한 번만 다시 보냄
+        assert len(calls) == 2
+        assert all(r == _response("call 2") for r in results)
+        assert cache.get("k") == _response("call 2")
+        cache.close()
+
+if __name__ == "__main__":
+    test_cache_key_depends_on_request()
+    test_hit_after_miss()
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_single_flight()
+    test_cancelled_leader_does_not_cancel_joiners()
+    print("All LLM cache tests passed.")
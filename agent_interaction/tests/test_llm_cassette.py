@@ -0,0 +1,128 @@
+import asyncio
+
+from utils.llm_cassette import CassetteMiss, LLMCassette, cassette_path_for
+
+def _response(text):
+    return {"choices": [{"message": {"content": text}}]}
+
+def _record_run(path):
+    cassette = LLMCassette(path, mode="record")
+    answers = iter(["speech 1", "7 3 1 2 4 5 1 2", "speech 2", "3 3 3 3 3 3 3 3"])
+
+    async def compute():
+        return _response(next(answers))
+
+    async def run():
+        for key, purpose in (("k1", "speech"), ("e1", "emotion"), ("k2", "speech"), ("e2", "emotion")):
+            await cassette.aget_or_compute(key, purpose, [("user", key)], {}, compute)
+
+    asyncio.run(run())
+    return cassette
+
+def test_cassette_path_next_to_db():
+    assert cassette_path_for("runs_x/scenario_1.db") == "runs_x/scenario_1.llm.jsonl"
+
+def test_replay_by_hash_then_order(tmp_path):
+    path = str(tmp_path / "scenario_1.llm.jsonl")
+    assert _record_run(path).stats()["recorded"] == 4
+
+    replay = LLMCassette(path, mode="replay", match="auto")
+    assert replay.lookup("k2", "speech")["choices"][0]["message"]["content"] == "speech 2"
+    # 질문 순서가 섞여 키가 달라진 감정 요청은 같은 목적의 녹화 순서로
+    assert replay.lookup("changed", "emotion")["choices"][0]["message"]["content"] == "7 3 1 2 4 5 1 2"
+    assert replay.lookup("changed", "emotion")["choices"][0]["message"]["content"] == "3 3 3 3 3 3 3 3"
+    assert replay.lookup("other", "summary") is None
+    assert replay.stats()["replayed"] == 3 and replay.stats()["unused"] == 1
+
+    hash_only = LLMCassette(path, mode="replay", match="hash")
+    assert hash_only.lookup("changed", "emotion") is None
+
+def test_miss_policies(tmp_path):
+    path = str(tmp_path / "scenario_1.llm.jsonl")
+    _record_run(path)
+
+    async def compute():
+        return _response("live")
+
+    strict = LLMCassette(path, mode="replay", match="hash")
+    try:
+        asyncio.run(strict.aget_or_compute("new", "summary", [], {}, compute))
+        raise AssertionError("Expected CassetteMiss")
+    except CassetteMiss:
+        pass
+
+    extend = LLMCassette(path, mode="replay", match="hash", on_miss="record")
+    assert asyncio.run(extend.aget_or_compute("new", "summary", [], {}, compute)) == _response("live")
+    assert LLMCassette(path, mode="replay", match="hash").lookup("new", "summary") == _response("live")
+
+def test_scoped_cassette_and_key_on_the_served_model(tmp_path):
+    from utils import llm_connector
+    from utils.llm_cache import make_cache_key
+    from utils.llm_routes import ModelRoute
+
+    llm_connector.set_llm_cassette(str(tmp_path / "process.llm.jsonl"))
+    process_cassette = llm_connector.llm_cassette
+    try:
+        try:
+            with llm_connector.scoped_llm_cassette(str(tmp_path / "scenario_1.llm.jsonl")) as cassette:
+                assert llm_connector.current_llm_cassette() is cassette is not process_cassette
+                raise RuntimeError("scenario failed")
+        except RuntimeError:
+            pass
+        # 실패한 실행 뒤에도 이전 카세트가 복원됨
+        assert llm_connector.current_llm_cassette() is process_cassette
+        with llm_connector.scoped_llm_cassette(None) as unchanged:
+            assert unchanged is process_cassette
+    finally:
+        llm_connector.set_llm_cassette(None)
+
+    messages = [("system", "s"), ("user", "Summarize the following memory content")]
+    options = {"model": "small", "response_format": {"type": "json_object"}}
+    request = llm_connector._make_request("messages", messages, messages, purpose="summary", options=options)
+    assert llm_connector._cassette_key(request) == make_cache_key(
+        "small", llm_connector.llm_temperature, messages, request["options"]
+    )
+
+    # 같은 프롬프트라도 목적별 라우트가 다른 모델로 보내면 다른 키
+    llm_connector.set_llm_routes({"summary": ModelRoute("llama3.2:1b")}, probe_interval=None)
+    try:
+        routed = llm_connector._make_request("messages", messages, messages, purpose="summary")
+        default = llm_connector._make_request("messages", messages, messages, purpose="speech")
+    finally:
+        llm_connector.set_llm_routes({})
+    assert llm_connector._cassette_key(routed) == make_cache_key(
+        "llama3.2:1b", llm_connector.llm_temperature, messages, routed["options"]
+    )
+    assert llm_connector._cassette_key(routed) != llm_connector._cassette_key(default)
+
+def test_concurrent_scenarios_record_their_own_cassettes(tmp_path):
+    import threading
+
+    from fake_llm_server import start_fake_server
+    from utils import llm_connector
+
+    server = start_fake_server(ttft="fixed:0.05", tokens_per_sec=0, seed=3)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    both_inside = threading.Barrier(2)
+
+    def run(name):
+        with llm_connector.scoped_llm_cassette(str(tmp_path / f"{name}.llm.jsonl")):
+            both_inside.wait(5)
+            for i in range(3):
+                llm_connector.query_llm(f"Summarize the following memory content: {name} {i}", purpose="summary")
+            both_inside.wait(5)
+
+    try:
+        threads = [threading.Thread(target=run, args=(name,)) for name in ("scenario_1", "scenario_2")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    for name in ("scenario_1", "scenario_2"):
+        replay = LLMCassette(str(tmp_path / f"{name}.llm.jsonl"), mode="replay")
+        assert replay.stats()["entries"] == 3
+        assert all(name in entry["messages"][-1][1] for entry in replay.entries)
@@ -0,0 +1,83 @@
+import asyncio
+
+from utils.llm_concurrency import AdaptiveConcurrencyLimiter, is_overload_error
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def _succeed(limiter, count, latency=0.1):
+    for _ in range(count):
+        limiter.in_flight += 1  # acquire 없이 결과만 반영
+        limiter.release(latency=latency)
+
+def test_additive_increase_after_a_window_of_successes():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=10, target_latency=1.0)
+    _succeed(limiter, 1)
+    assert limiter.limit == 2, "The limit grows only after `limit` successes"
+    _succeed(limiter, 1)
+    assert limiter.limit == 3
+    _succeed(limiter, 3)
+    assert limiter.limit == 4 and limiter.stats()["increases"] == 2
+
+    # 목표 지연을 넘는 성공은 한도를 늘리지 않음
+    slow = AdaptiveConcurrencyLimiter(initial_limit=2, target_latency=1.0)
+    _succeed(slow, 10, latency=2.0)
+    assert slow.limit == 2
+
+def test_multiplicative_decrease_on_timeout_and_429():
+    assert is_overload_error(asyncio.TimeoutError())
+    assert is_overload_error(_StatusError(429)) and is_overload_error(_StatusError(503))
+    assert not is_overload_error(_StatusError(400)) and not is_overload_error(ValueError("parse"))
+
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16, cooldown=0.0)
+
+    async def fail(error):
+        try:
+            async with limiter.slot():
+                raise error
+        except type(error):
+            pass
+
+    asyncio.run(fail(asyncio.TimeoutError()))
+    assert limiter.limit == 8
+    asyncio.run(fail(_StatusError(429)))
+    assert limiter.limit == 4
+    asyncio.run(fail(ValueError("not an overload")))
+    assert limiter.limit == 4 and limiter.stats()["decreases"] == 2
+
+    # 쿨다운 안의 연속 실패는 한 번만 줄임
+    burst = AdaptiveConcurrencyLimiter(initial_limit=16, cooldown=60.0)
+    for _ in range(3):
+        burst.in_flight += 1
+        burst.release(overloaded=True)
+    assert burst.limit == 8
+
+def test_limit_stays_within_bounds():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=3, min_limit=2, max_limit=4, target_latency=1.0, cooldown=0.0)
+    _succeed(limiter, 100)
+    assert limiter.limit == 4
+    for _ in range(5):
+        limiter.in_flight += 1
+        limiter.release(overloaded=True)
+    assert limiter.limit == 2
+
+def test_waiters_start_when_the_limit_allows():
+    async def run():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return limiter, peak
+
+    limiter, peak = asyncio.run(run())
+    assert peak == 2 and limiter.in_flight == 0 and limiter.stats()["queue_depth"] == 0
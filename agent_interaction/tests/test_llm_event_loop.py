@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fake_llm_server import start_fake_server
+from utils import llm_connector
+
+async def _call_sync_wrapper():
+    return llm_connector.query_llm("Hello from the LLM loop", max_retries=1)
+
+def test_sync_wrappers_run_on_the_shared_loop(monkeypatch):
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=1)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    seen = []
+    complete = llm_connector._complete
+
+    async def recording_complete(request, *args):
+        # 요청을 실제로 처리하는 스레드와 루프를 기록
+        seen.append((threading.current_thread().name, asyncio.get_running_loop()))
+        return await complete(request, *args)
+
+    monkeypatch.setattr(llm_connector, "_complete", recording_complete)
+    try:
+        llm_connector.query_llm("Hello from the main thread", max_retries=1)
+        caller = threading.Thread(target=llm_connector.query_llm_dict,
+                                  args=([{"role": "user", "content": "Hello from another thread"}],),
+                                  kwargs={"max_retries": 1})
+        caller.start()
+        caller.join()
+
+        # 공유 루프 안에서 동기 래퍼를 부르면 막히는 대신 바로 오류
+        with pytest.raises(RuntimeError):
+            llm_connector.run_on_llm_loop(_call_sync_wrapper())
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    loop = llm_connector.get_llm_loop()
+    assert seen == [("llm-event-loop", loop), ("llm-event-loop", loop)]
+
+def test_concurrent_async_calls_do_not_block_each_other():
+    server = start_fake_server(ttft="fixed:0.5", tokens_per_sec=0, seed=2)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    llm_connector.set_llm_concurrency(initial_limit=8)  # 앞선 테스트의 실패로 줄어든 한도 대신 새 한도로
+
+    async def run():
+        # 호출자의 루프(asyncio.run)에서 공유 루프로 넘어가도 서로 기다리지 않음
+        return await asyncio.gather(*(
+            llm_connector.query_llm_async(f"Question {i}", max_retries=1) for i in range(4)
+        ))
+
+    try:
+        start = time.monotonic()
+        responses = asyncio.run(run())
+        elapsed = time.monotonic() - start
+        stats = server.stats()
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+        llm_connector.set_llm_concurrency()
+
+    assert all(response["choices"][0]["message"]["content"] for response in responses)
+    assert stats["max_in_flight"] == 4
+    assert elapsed < 1.5  # 순서대로 보냈다면 4 x 0.5초
@@ -0,0 +1,36 @@
+import json
+import urllib.request
+
+from fake_llm_server import start_fake_server
+from llm_gateway import start_gateway
+from utils import llm_connector
+
+def _request(url, body=None, headers=None):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode("utf-8") if body is not None else None,
+        headers=dict({"Content-Type": "application/json"}, **(headers or {})),
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+def test_gateway_shares_cache_and_reports_purpose(tmp_path):
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=3)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    llm_connector.set_llm_cache(str(tmp_path / "cache.db"))
+    gateway = start_gateway()
+    try:
+        body = {"messages": [{"role": "user", "content": "Summarize the following memory content"}]}
+        first = _request(f"{gateway.base_url}/chat/completions", body, {"X-LLM-Purpose": "summary"})
+        second = _request(f"{gateway.base_url}/chat/completions", body, {"X-LLM-Purpose": "summary"})
+        assert first["choices"][0]["message"]["content"] == second["choices"][0]["message"]["content"]
+        assert server.stats()["requests"] == 1, "The second client request should be a cache hit"
+
+        metrics = _request(gateway.base_url.replace("/v1", "/metrics"))
+        assert metrics["gateway"]["by_purpose"] == {"summary": 2}
+        assert metrics["cache"]["hits"] == 1
+    finally:
+        gateway.shutdown()
+        server.shutdown()
+        llm_connector.set_llm_cache(None)
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from utils.llm_hedging import HedgePolicy
+
+def _attempts(latencies, calls, cancelled):
+    """n번째 호출이 latencies[n]초 뒤에 끝나는 attempt 함수"""
+
+    async def attempt(on_sent):
+        index = len(calls)
+        calls.append(asyncio.get_running_loop().time())
+        on_sent()
+        try:
+            latency, error = latencies[index] if isinstance(latencies[index], tuple) else (latencies[index], None)
+            await asyncio.sleep(latency)
+            if error is not None:
+                raise error
+            return f"attempt {index}"
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+
+    return attempt
+
+def _run(policy, latencies):
+    calls, cancelled = [], []
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        result = await policy.run(_attempts(latencies, calls, cancelled))
+        await asyncio.sleep(0)  # 취소가 전달되도록
+        return result, [t - start for t in calls]
+
+    result, offsets = asyncio.run(run())
+    return result, offsets, cancelled
+
+def test_no_hedge_when_first_answer_is_fast():
+    policy = HedgePolicy(initial_delay=0.1, min_delay=0.01)
+    result, offsets, cancelled = _run(policy, [0.01, 0.01])
+    assert result == "attempt 0" and len(offsets) == 1 and cancelled == []
+    assert policy.stats()["hedges_sent"] == 0 and policy.stats()["requests"] == 1
+
+def test_hedge_fires_after_delay_and_loser_is_cancelled():
+    policy = HedgePolicy(initial_delay=0.05, min_delay=0.01)
+    result, offsets, cancelled = _run(policy, [1.0, 0.01])
+    assert result == "attempt 1"
+    assert len(offsets) == 2 and offsets[1] >= 0.05, "The hedge waits for the delay"
+    assert cancelled == [0], "The slower primary is cancelled"
+
+    stats = policy.stats()
+    assert stats["hedges_sent"] == 1 and stats["hedge_wins"] == 1 and stats["hedge_rate"] == 1.0
+
+def test_primary_win_cancels_hedge():
+    policy = HedgePolicy(initial_delay=0.02, min_delay=0.01)
+    result, offsets, cancelled = _run(policy, [0.05, 1.0])
+    assert result == "attempt 0" and len(offsets) == 2 and cancelled == [1]
+    assert policy.stats()["hedges_sent"] == 1 and policy.stats()["hedge_wins"] == 0
+
+def test_hedge_covers_a_failed_primary():
+    # 헤지를 보낸 뒤 첫 요청이 실패해도 두 번째 응답을 기다림
+    policy = HedgePolicy(initial_delay=0.01, min_delay=0.01)
+    result, _, _ = _run(policy, [(0.03, ConnectionError("refused")), 0.05])
+    assert result == "attempt 1"
+
+    # 둘 다 실패하면 첫 요청의 오류
+    with pytest.raises(ConnectionError):
+        _run(HedgePolicy(initial_delay=0.01, min_delay=0.01),
+             [(0.03, ConnectionError("first")), (0.01, ValueError("second"))])
+
+def test_delay_learns_the_latency_percentile():
+    policy = HedgePolicy(quantile=0.9, initial_delay=5.0, min_delay=0.1, max_delay=2.0, min_samples=10)
+    assert policy.delay() == 2.0  # 표본이 모이기 전에는 초기값 (상한 적용)
+    policy._latencies.extend([0.3] * 9 + [1.0])
+    assert 0.3 <= policy.delay() <= 1.0
+    policy._latencies.extend([10.0] * 10)
+    assert policy.delay() == 2.0
+    policy._latencies.clear()
+    policy._latencies.extend([0.01] * 10)
+    assert policy.delay() == 0.1
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from utils.llm_local_backend import _to_llama_format, is_local_model_path
+
+def test_local_model_targets():
+    assert is_local_model_path("models/Llama-3.2-1B-Q4_K_M.GGUF")
+    assert not is_local_model_path("http://127.0.0.1:11434/v1")
+
+def test_response_format_translation():
+    schema = {"type": "object", "properties": {"speech": {"type": "string"}}}
+    response_format = {"type": "json_schema", "json_schema": {"name": "s", "schema": schema}}
+    assert _to_llama_format(response_format) == {"type": "json_object", "schema": schema}
+    assert _to_llama_format(None) is None
+
+# 실제 모델로 확인하려면 LOCAL_GGUF_MODEL=/path/to/model.gguf 설정
+@pytest.mark.skipif(not os.environ.get("LOCAL_GGUF_MODEL"), reason="LOCAL_GGUF_MODEL not set")
+def test_query_llm_dict_in_process():
+    pytest.importorskip("llama_cpp")
+    from utils import llm_connector
+
+    llm_connector.set_llm_backends([os.environ["LOCAL_GGUF_MODEL"]], probe_interval=None,
+                                   local_options={"max_tokens": 16, "seed": 0})
+    response = llm_connector.query_llm_dict([
+        {"role": "system", "content": "You are a helpful assistant who can only reply numbers from 1 to 5."},
+        {"role": "user", "content": "Rate your joy."},
+    ], max_retries=1)
+    assert isinstance(response["choices"][0]["message"]["content"], str)
+    assert response["usage"]["completion_tokens"] > 0
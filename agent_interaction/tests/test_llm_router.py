@@ -0,0 +1,112 @@
+import asyncio
+
+from utils.llm_router import BackendPool, LLMBackend
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+class _ProbeClient:
+    """GET /models에 URL별로 정해 둔 상태를 돌려주는 클라이언트"""
+
+    def __init__(self, status_by_url):
+        self.status_by_url = status_by_url
+
+    async def get(self, url, timeout=None):
+        status = self.status_by_url[url.rsplit("/models", 1)[0]]
+        if status is None:
+            raise ConnectionError("unreachable")
+        return _Response(status)
+
+def _pool(count=3, **kwargs):
+    return BackendPool([LLMBackend(f"http://host{i}:11434/v1") for i in range(count)], **kwargs)
+
+def test_pick_prefers_least_outstanding():
+    pool = _pool()
+    a, b, c = pool.backends
+    a.outstanding, b.outstanding, c.outstanding = 2, 0, 1
+    assert pool.pick() is b
+    assert pool.pick(exclude=(b,)) is c  # 헤지는 같은 백엔드를 피함
+
+    # 같은 부하면 지연 EWMA가 낮은 쪽
+    b.outstanding = 1
+    b.ewma_latency, c.ewma_latency = 2.0, 0.5
+    assert pool.pick() is c
+
+def test_concurrent_calls_spread_across_backends():
+    async def run(pool):
+        async def call():
+            async with pool.use() as backend:
+                await asyncio.sleep(0.01)
+                return backend
+
+        return await asyncio.gather(*(call() for _ in range(6)))
+
+    pool = _pool()
+    used = asyncio.run(run(pool))
+    assert all(used.count(backend) == 2 for backend in pool.backends)
+    assert all(b.outstanding == 0 and b.requests == 2 for b in pool.backends)
+
+def test_consecutive_failures_eject():
+    async def fail(pool, backend):
+        try:
+            async with pool.use(exclude=[b for b in pool.backends if b is not backend]):
+                raise ConnectionError("refused")
+        except ConnectionError:
+            pass
+
+    pool = _pool(failure_threshold=2, eject_seconds=60.0)
+    bad = pool.backends[0]
+    asyncio.run(fail(pool, bad))
+    assert bad.healthy
+    asyncio.run(fail(pool, bad))
+    assert not bad.healthy and bad.ejections == 1
+    assert bad not in pool.available()
+    assert all(pool.pick() is not bad for _ in range(3))
+
+def test_failed_probe_ejects_and_successful_probe_readmits():
+    pool = _pool(count=2, eject_seconds=0.0)
+    good, bad = pool.backends
+    client = _ProbeClient({good.base_url: 200, bad.base_url: None})
+
+    asyncio.run(pool.probe_all(client))
+    assert good.healthy and not bad.healthy and bad.ejections == 1
+
+    # 아직 응답하지 않으면 계속 제외
+    client.status_by_url[bad.base_url] = 503
+    asyncio.run(pool.probe_all(client))
+    assert not bad.healthy and bad.ejections == 1
+
+    bad.ewma_latency = 9.0
+    client.status_by_url[bad.base_url] = 200
+    asyncio.run(pool.probe_all(client))
+    assert bad.healthy and bad.consecutive_failures == 0
+    assert bad.ewma_latency is None, "Re-admitted backends start without their old latency"
+
+def test_probe_waits_for_eject_period():
+    pool = _pool(count=2, eject_seconds=60.0)
+    backend = pool.backends[0]
+    pool.eject(backend, "test")
+    asyncio.run(pool.probe_all(_ProbeClient({b.base_url: 200 for b in pool.backends})))
+    assert not backend.healthy, "A successful probe does not cut the eject period short"
+
+def test_readmitted_after_eject_period_without_health_checks():
+    pool = _pool(count=2, eject_seconds=0.0)
+    backend = pool.backends[0]
+    pool.eject(backend, "test")
+    # 헬스 체크 루프가 없으면 제외 시간이 지난 뒤 라우팅 시점에 재투입
+    assert backend in pool.available() and backend.healthy
+
+def test_slow_backend_is_ejected():
+    pool = _pool(slow_factor=3.0)
+    fast1, fast2, slow = pool.backends
+    pool.record_success(fast1, 0.1)
+    pool.record_success(fast2, 0.2)
+    pool.record_success(slow, 1.0)
+    assert not slow.healthy and fast1.healthy and fast2.healthy
+
+def test_falls_back_to_ejected_backends():
+    pool = _pool(count=2, eject_seconds=60.0)
+    for backend in pool.backends:
+        pool.eject(backend, "test")
+    assert pool.pick() in pool.backends
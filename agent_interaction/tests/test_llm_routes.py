@@ -0,0 +1,33 @@
+from utils.llm_routes import ModelRoute, auxiliary_routes, route_for
+
+def test_route_lookup_and_options():
+    routes = auxiliary_routes("llama3.2:1b")
+    assert route_for(routes, "reflection:lesson") is routes["reflection"]
+    assert route_for(routes, "repair:emotion") is routes["repair"]
+    assert route_for(routes, "speech") is None and route_for({}, "emotion") is None
+
+    options = routes["summary"].options()
+    assert options == {"model": "llama3.2:1b", "max_tokens": 96, "stop": ["\n\n"]}
+    assert ModelRoute().options() == {}
+
+def test_routes_sharing_a_url_keep_their_own_model():
+    from utils import llm_connector
+
+    url = "http://127.0.0.1:11500/v1"
+    routes = {
+        "emotion": ModelRoute("llama3.2:1b", base_url=url),
+        "summary": ModelRoute("qwen2.5:0.5b", base_url=url),
+        "reflection": ModelRoute("llama3.2:1b", max_tokens=160, base_url=url),
+    }
+    llm_connector.set_llm_routes(routes, probe_interval=None)
+    try:
+        pools = {purpose: llm_connector._pool_for(llm_connector._make_request("messages", [], [], purpose=purpose))
+                 for purpose in ("emotion", "summary", "reflection:lesson", "speech")}
+    finally:
+        llm_connector.set_llm_routes({})
+
+    # 같은 URL이라도 모델마다 클라이언트가 따로 있고, 같은 URL과 모델이면 공유
+    assert pools["emotion"].backends[0].client.model_name == "llama3.2:1b"
+    assert pools["summary"].backends[0].client.model_name == "qwen2.5:0.5b"
+    assert pools["reflection:lesson"] is pools["emotion"]
+    assert pools["speech"] is llm_connector.llm_pool
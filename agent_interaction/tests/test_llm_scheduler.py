@@ -0,0 +1,82 @@
+import asyncio
+
+from utils.llm_scheduler import LLMPreempted, PriorityConcurrencyLimiter, priority_for
+
+def test_priority_for_purposes():
+    assert priority_for("speech") == "interactive"
+    assert priority_for("reflection:lesson") == "background"
+    assert priority_for("emotion") == "normal" and priority_for(None) == "normal"
+
+def test_weighted_order_and_reserved_slot():
+    async def run():
+        limiter = PriorityConcurrencyLimiter(initial_limit=2, reserved=1)
+        order = []
+
+        async def call(priority, name, hold):
+            async with limiter.slot(priority=priority):
+                order.append(name)
+                await hold.wait()
+
+        hold_first = asyncio.Event()
+        first = asyncio.create_task(call("background", "bg0", hold_first))
+        await asyncio.sleep(0)
+
+        # 두 번째 슬롯은 interactive 전용이므로 다른 클래스는 대기
+        release = asyncio.Event()
+        release.set()
+        waiting = [asyncio.create_task(call("background", f"bg{i}", release)) for i in range(1, 4)]
+        waiting += [asyncio.create_task(call("normal", f"n{i}", release)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert order == ["bg0"]
+
+        await asyncio.create_task(call("interactive", "speech", release))
+        assert order == ["bg0", "speech"]
+
+        hold_first.set()
+        await asyncio.gather(first, *waiting)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(run())
+    rest = order[2:]
+    # 가중치 3:1 -> 첫 배경 작업보다 normal이 먼저 모두 나감
+    assert rest.index("n2") < rest.index("bg1")
+    assert stats["classes"]["interactive"]["served"] == 1
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+def test_background_preempted_after_queue_bound():
+    async def run():
+        limiter = PriorityConcurrencyLimiter(initial_limit=1, reserved=0, classes=(
+            ("interactive", 8.0, None, False),
+            ("normal", 3.0, None, False),
+            ("background", 1.0, 0.05, True),
+        ))
+        hold = asyncio.Event()
+
+        async def busy():
+            async with limiter.slot(priority="interactive"):
+                await hold.wait()
+
+        task = asyncio.create_task(busy())
+        await asyncio.sleep(0)
+        try:
+            async with limiter.slot(priority="background"):
+                pass
+            raise AssertionError("Expected LLMPreempted")
+        except LLMPreempted:
+            pass
+        hold.set()
+        await task
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["classes"]["background"]["preempted"] == 1
+
+def test_batch_takes_the_highest_priority_of_its_requests():
+    from utils import llm_connector
+
+    def requests(*purposes):
+        return [{"call": {"purpose": purpose}} for purpose in purposes]
+
+    assert llm_connector._batch_priority(requests("reflection:lesson", "reflection:summary")) == "background"
+    assert llm_connector._batch_priority(requests("reflection:lesson", "emotion")) == "normal"
+    assert llm_connector._batch_priority(requests("summary", "speech", "reflection")) == "interactive"
@@ -0,0 +1,98 @@
+import asyncio
+
+import numpy as np
+
+from utils.llm_semantic_cache import SemanticResponseCache, request_namespace, request_text
+
+def _embed(text):
+    # 문자 3-gram 해시 벡터 (테스트용, 모델 없이 결정적)
+    vector = np.zeros(256, dtype=np.float32)
+    for i in range(len(text) - 2):
+        vector[hash(text[i:i + 3]) % 256] += 1.0
+    return vector / np.linalg.norm(vector)
+
+def test_similar_prompt_reuses_answer(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "semantic.db"), threshold=0.9, embed=_embed)
+    calls = []
+
+    async def compute():
+        calls.append(True)
+        return {"choices": [{"message": {"content": f"summary {len(calls)}"}}]}
+
+    base = "Summarize the following memory content: the client rejected the proposal at 10:31."
+    near = "Summarize the following memory content: the client rejected the proposal at 10:42."
+    other = "Rate how much joy agent_1 feels after the team celebrated the launch together."
+    namespace = request_namespace("llama3.1", 0.7, "summary", [("system", "s"), ("user", base)])
+
+    async def run():
+        first, _ = await cache.aget_or_compute(namespace, base, compute)
+        second, similarity = await cache.aget_or_compute(namespace, near, compute)
+        third, _ = await cache.aget_or_compute(namespace, other, compute)
+        return first, second, similarity, third
+
+    first, second, similarity, third = asyncio.run(run())
+    assert second == first and similarity >= 0.9
+    assert third != first and len(calls) == 2
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    cache.close()
+
+def test_namespace_and_purposes(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "semantic.db"), embed=_embed)
+    assert cache.applies("reflection:lesson") and cache.applies("summary")
+    assert not cache.applies("speech") and not cache.applies(None)
+    # 감정 평가는 이름으로 답하는 JSON 요청일 때만 (텍스트 답은 질문 위치로 감정을 매칭)
+    assert not cache.applies("emotion")
+    assert cache.applies("emotion", {"response_format": {"type": "json_schema"}})
+
+    messages = [("system", "s"), ("user", "u")]
+    assert request_namespace("m", 0.7, "summary", messages) != request_namespace("m", 0.7, "emotion", messages)
+    assert request_text(messages) == "user: u"
+    cache.close()
+
+def _emotion_messages(scenario, order):
+    questions = "\n".join(f"{i + 1}. {name}" for i, name in enumerate(order))
+    return [("system", "Reply numbers from 1 to 5."),
+            ("user", f"You can only reply with numbers.\n\n{scenario}\nRate these emotions:\n{questions}")]
+
+def test_question_order_is_part_of_the_namespace(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "semantic.db"), threshold=0.9, embed=_embed)
+    calls = []
+
+    async def compute():
+        calls.append(True)
+        return {"choices": [{"message": {"content": f"answer {len(calls)}"}}]}
+
+    scenario = "Catarina was praised by the team after the launch at 10:31."
+    near = "Catarina was praised by the team after the launch at 10:42."
+    order_a = ["Joy", "Trust", "Fear", "Anger"]
+    order_b = ["Anger", "Fear", "Trust", "Joy"]
+
+    async def ask(text, order):
+        messages = _emotion_messages(text, order)
+        namespace = request_namespace("m", 0.7, "emotion", messages, semantic_text=text)
+        assert request_text(messages, text) == text  # 가변 부분만 임베딩
+        response, _ = await cache.aget_or_compute(namespace, request_text(messages, text), compute)
+        return response["choices"][0]["message"]["content"]
+
+    async def run():
+        return [await ask(scenario, order_a), await ask(scenario, order_b), await ask(near, order_a)]
+
+    # 같은 시나리오라도 질문 순서가 다르면 답을 공유하지 않음; 같은 순서의 비슷한 시나리오는 재사용
+    assert asyncio.run(run()) == ["answer 1", "answer 2", "answer 1"]
+    assert len(calls) == 2
+    cache.close()
+
+def test_entries_survive_restart_and_eviction(tmp_path):
+    path = str(tmp_path / "semantic.db")
+    cache = SemanticResponseCache(path, threshold=0.99, max_entries=2, embed=_embed)
+    for i, text in enumerate(["alpha beta gamma", "delta epsilon zeta", "eta theta iota"]):
+        cache.put("ns", text, _embed(text), {"choices": [{"message": {"content": str(i)}}]})
+    cache.close()
+
+    reopened = SemanticResponseCache(path, threshold=0.99, max_entries=2, embed=_embed)
+    assert reopened.stats()["entries"] == 2
+    response, _, _ = reopened.lookup("ns", "eta theta iota")
+    assert response["choices"][0]["message"]["content"] == "2"
+    reopened.close()
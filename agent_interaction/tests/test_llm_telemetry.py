@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+from utils.llm_telemetry import (
+    CallRecorder, PrefixTracker, new_call_record, load_llm_calls, summarize_llm_calls, format_llm_report
+)
+
+def _call(purpose, latency, prompt_tokens=100, completion_tokens=20, **fields):
+    record = new_call_record(purpose, "llama3.1")
+    record.update(latency=latency, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, **fields)
+    return record
+
+def _record_all(path, records):
+    recorder = CallRecorder(path)
+    for record in records:
+        recorder.record(record)
+    recorder.flush()
+    recorder.close()
+
+def test_sqlite_and_jsonl_round_trip():
+    records = [_call("speech", 2.0), _call("emotion", 0.5, retries=1), _call("emotion", 0.7, cached=True)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("scenario_1.db", "calls.jsonl"):
+            path = os.path.join(tmp, name)
+            _record_all(path, records)
+            loaded = load_llm_calls(path)
+            assert [r["purpose"] for r in loaded] == ["speech", "emotion", "emotion"]
+            assert loaded[0]["run"] is None and loaded[1]["retries"] == 1
+
+def test_summary_per_purpose():
+    records = [_call("speech", 3.0), _call("emotion", 0.5), _call("emotion", 0.5, error="timeout")]
+    summary = summarize_llm_calls(records)[None]
+    assert list(summary["by_purpose"]) == ["speech", "emotion"], "Purposes should be sorted by total latency"
+    emotion = summary["by_purpose"]["emotion"]
+    assert emotion["calls"] == 2 and emotion["errors"] == 1
+    assert abs(emotion["latency_share"] - 0.25) < 1e-9
+    assert summary["total"]["prompt_tokens"] == 300
+    assert "speech" in format_llm_report(summarize_llm_calls(records))
+
+def test_prefix_tracker_counts_shared_leading_messages():
+    tracker = PrefixTracker()
+    head = [("system", "s" * 400), ("system", "p" * 40), ("system", "r" * 400)]
+    assert tracker.shared_prefix_tokens(head + [("user", "first")]) == 0
+    second = head + [("user", "x" * 40), ("assistant", "y" * 40), ("user", "second")]
+    assert tracker.shared_prefix_tokens(second) == 210, "Only the unchanged leading messages are shared"
+    assert tracker.shared_prefix_tokens(second[:-1] + [("user", "third")]) == 230
+    other = [("system", "s" * 400), ("system", "someone else"), ("user", "hi")]
+    assert tracker.shared_prefix_tokens(other) == 0, "Different conversations do not share a prefix"
+
+def test_scoped_telemetry_restores_previous_sink(tmp_path):
+    from fake_llm_server import start_fake_server
+    from utils import llm_connector
+
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=3)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    llm_connector.set_llm_telemetry(str(tmp_path / "process.jsonl"))
+    process_recorder = llm_connector.llm_recorder
+    scenario_db = str(tmp_path / "scenario_1.db")
+    try:
+        try:
+            with llm_connector.scoped_llm_telemetry(scenario_db):
+                llm_connector.query_llm("Summarize the following memory content: scoped", purpose="summary")
+                raise RuntimeError("scenario failed")
+        except RuntimeError:
+            pass
+        # 실패한 실행 뒤에도 이전 기록 대상이 그대로 복원됨
+        assert llm_connector.llm_recorder is process_recorder
+        llm_connector.query_llm("Summarize the following memory content: after", purpose="summary")
+        llm_connector.flush_llm_telemetry()
+    finally:
+        llm_connector.set_llm_telemetry(None)
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    assert [r["run"] for r in load_llm_calls(scenario_db)] == ["scenario_1"]
+    assert [r["run"] for r in load_llm_calls(str(tmp_path / "process.jsonl"))] == ["process"]
+
+def test_concurrent_scopes_keep_their_own_records(tmp_path):
+    import threading
+
+    from fake_llm_server import start_fake_server
+    from utils import llm_connector
+
+    server = start_fake_server(ttft="fixed:0.05", tokens_per_sec=0, seed=3)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    both_inside = threading.Barrier(2)
+
+    def run(name):
+        with llm_connector.scoped_llm_telemetry(str(tmp_path / f"{name}.db")):
+            both_inside.wait(5)  # 두 시나리오가 동시에 범위 안에 있을 때 호출
+            for i in range(3):
+                llm_connector.query_llm(f"Summarize the following memory content: {name} {i}", purpose="summary")
+            both_inside.wait(5)
+
+    try:
+        threads = [threading.Thread(target=run, args=(name,)) for name in ("scenario_1", "scenario_2")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    for name in ("scenario_1", "scenario_2"):
+        assert [r["run"] for r in load_llm_calls(str(tmp_path / f"{name}.db"))] == [name] * 3
@@ -0,0 +1,138 @@
+import json
+
+from fake_llm_server import start_fake_server
+from utils import llm_connector
+from utils.general_methods import SpeechStreamParser, parse_llm_response
+
+def _feed_all(chunks):
+    parser = SpeechStreamParser()
+    return [parser.feed(chunk) for chunk in chunks]
+
+def test_parser_handles_markers_split_across_chunks():
+    text = "Thought process:\nShe sounds worried. Speech is what matters.\n\nSpeech:\n  Let's fix it together."
+    expected = "Let's fix it together."
+    # 모든 위치에서 두 조각으로 나눔 (마커 "Speech:" 중간에서 잘리는 경우 포함)
+    for cut in range(1, len(text)):
+        deltas = _feed_all([text[:cut], text[cut:]])
+        assert "".join(deltas) == expected, cut
+
+    # 한 글자씩 들어와도 같은 결과이고, 발화 이전의 생각은 내보내지 않음
+    deltas = _feed_all(list(text))
+    assert "".join(deltas) == expected
+    assert all(delta == "" for delta in deltas[:text.index("Speech:\n") + len("Speech:")])
+
+def test_parser_matches_full_parse():
+    content = "Thought process:\nCalm down first.\n\nSpeech:\nTake a deep breath."
+    speech, _ = parse_llm_response(content)
+    assert "".join(_feed_all([content[i:i + 3] for i in range(0, len(content), 3)])) == speech
+
+def test_stream_llm_yields_tokens_as_they_arrive():
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=5)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    try:
+        prompt = "Thought process:\n[...]\n\nSpeech:\n[...]"
+        chunks = list(llm_connector.stream_llm(prompt, purpose="speech"))
+        messages = [{"role": "user", "content": prompt}]
+        json_chunks = list(llm_connector.stream_llm_dict(messages, purpose="speech",
+                                                         response_format={"type": "json_object"}))
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    # 한 번에 한 덩어리가 아니라 토큰 단위로 도착 (요청별 옵션이 있는 경우도)
+    assert len(chunks) > 1 and "".join(chunks).startswith("Thought process:")
+    assert len(json_chunks) > 1
+
+def _sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_auto_conversation_stream_route(tmp_path, monkeypatch):
+    import app2
+
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=4)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    monkeypatch.setattr(app2, "SCENARIO_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app2, "AUTO_CONVERSATION_TURNS", 2)
+    try:
+        scenario_id = next(iter(app2.scenarios))
+        response = app2.app.test_client().get(f"/auto_conversation/stream?scenario_id={scenario_id}")
+        assert response.mimetype == "text/event-stream"
+        events = _sse_events(response.get_data(as_text=True))
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    kinds = [kind for kind, _ in events]
+    assert "error" not in kinds, events
+    assert kinds[0] == "turn_start" and kinds[-1] == "end"
+    assert kinds.count("turn_start") == kinds.count("turn_end") == 2
+
+    # 각 턴의 speech 조각을 이으면 turn_end의 최종 발화
+    deltas = []
+    for kind, data in events:
+        if kind == "turn_start":
+            deltas = []
+        elif kind == "speech":
+            deltas.append(data["delta"])
+        elif kind == "turn_end":
+            assert data["message"] and "".join(deltas).strip() == data["message"].strip()
+            # 턴이 끝날 때 두 에이전트의 감정 상태를 한 번의 배치 조회로 함께 보냄
+            assert set(data["emotions"]) == {app2.agent1.name, app2.agent2.name}
+            assert all(len(emotions) == 8 for emotions in data["emotions"].values())
+
+class _RecordingWorker:
+    # scenario_llm_scope가 백그라운드 측정을 기다리는지/버리는지만 기록
+    def __init__(self):
+        self.waited = []
+        self.discarded = []
+
+    def wait_idle(self, timeout=None):
+        self.waited.append(timeout)
+        return True
+
+    def discard(self, database_path):
+        self.discarded.append(database_path)
+        return 0
+
+def test_disconnected_stream_is_incomplete_and_regenerated(tmp_path, monkeypatch):
+    import sqlite3
+
+    import app2
+
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=6)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    worker = _RecordingWorker()
+    monkeypatch.setattr(app2, "SCENARIO_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app2, "AUTO_CONVERSATION_TURNS", 2)
+    monkeypatch.setattr(app2, "emotion_worker", worker)
+    scenario_id = next(iter(app2.scenarios))
+    db_path = str(tmp_path / f"scenario_{scenario_id}.db")
+    url = f"/auto_conversation/stream?scenario_id={scenario_id}"
+    try:
+        # 첫 턴의 발화가 오는 중에 클라이언트가 연결을 끊음
+        response = app2.app.test_client().get(url, buffered=False)
+        chunks = iter(response.response)
+        while "event: speech" not in next(chunks).decode():
+            pass
+        response.close()
+
+        assert worker.waited == [] and worker.discarded == [db_path]
+        assert not app2.scenario_is_complete(db_path)
+
+        # 다음 요청은 중간까지의 DB를 재생하지 않고 처음부터 다시 생성
+        events = _sse_events(app2.app.test_client().get(url).get_data(as_text=True))
+    finally:
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    assert [kind for kind, _ in events].count("turn_end") == 2
+    assert all("degraded" in data for kind, data in events if kind == "turn_end")  # 재생이 아닌 생성
+    assert app2.scenario_is_complete(db_path) and worker.waited == [60]
+    conn = sqlite3.connect(db_path)
+    turns = conn.execute("SELECT turn, speaker FROM conversations WHERE turn >= 3").fetchall()
+    conn.close()
+    assert len(turns) == len(set(turns))
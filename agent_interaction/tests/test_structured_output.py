@@ -0,0 +1,133 @@
+import json
+import random
+import sqlite3
+from types import SimpleNamespace
+
+from fake_llm_server import json_response, malform, start_fake_server
+from utils import llm_connector
+from utils.emotion_methods import init_emotion_db
+from utils.structured_output import (
+    JSONStringFieldStreamer,
+    ParseStats,
+    StructuredOutputError,
+    SPEECH_SCHEMA,
+    emotion_schema,
+    parse_fused_turn,
+    parse_json_lenient,
+    parse_structured_emotions,
+    parse_structured_speech,
+    parse_stats,
+    turn_schema,
+)
+
+def test_lenient_parser_recovers_common_breakage():
+    assert parse_json_lenient('```json\n{"a": 1,}\n```') == {"a": 1}
+    assert parse_json_lenient('Sure! {"speech": "Hi", "n": [1, 2') == {"speech": "Hi", "n": [1, 2]}
+    assert parse_json_lenient('{"speech": "cut off mid') == {"speech": "cut off mid"}
+    try:
+        parse_json_lenient("Speech:\nno JSON here")
+        assert False, "Expected StructuredOutputError"
+    except StructuredOutputError:
+        pass
+
+def test_structured_speech_and_emotions():
+    speech, thought = parse_structured_speech('{"thought_process": " calm ", "speech": " Let us plan. "}')
+    assert (speech, thought) == ("Let us plan.", "calm")
+    try:
+        parse_structured_speech('{"thought_process": "only this"}')
+        assert False, "Missing speech should fail"
+    except StructuredOutputError:
+        pass
+
+    names = ["Joy", "Fear"]
+    assert parse_structured_emotions('{"joy": 2, "Fear": 5}', names) == {"Joy": 2, "Fear": 5}
+    try:
+        parse_structured_emotions('{"Joy": 2, "Fear": 7}', names)
+        assert False, "Out-of-range score should fail"
+    except StructuredOutputError:
+        pass
+
+def test_field_streamer_yields_only_the_speech():
+    reply = json.dumps({"thought_process": "x \"speech\": no", "speech": "Line one\nand é two"})
+    streamer = JSONStringFieldStreamer("speech")
+    pieces = [streamer.feed(reply[i:i + 3]) for i in range(0, len(reply), 3)]
+    assert "".join(pieces) == "Line one\nand é two"
+
+def test_fake_server_schema_replies_and_malformed():
+    rng = random.Random(0)
+    speech = json_response(SPEECH_SCHEMA, "conversation", rng)
+    parse_structured_speech(json.dumps(speech))
+    broken = malform(json.dumps(speech), "conversation", rng)
+    assert "speech" not in json.loads(broken)
+
+    names = ["Joy", "Trust", "Fear"]
+    scores = json_response(emotion_schema(names), "emotion", rng)
+    assert parse_structured_emotions(json.dumps(scores), names) == scores
+    assert len(malform("1\n2\n3\n4\n5\n1\n2\n3", "emotion", rng).split("\n")) == 6
+
+def test_fused_turn_reply_and_partial_fallback():
+    names = ["Joy", "Trust", "Fear"]
+    rng = random.Random(1)
+    reply = json_response(turn_schema(names), "conversation", rng)
+    assert list(reply) == ["thought_process", "speech", "emotions", "memory_summary"]
+    fused = parse_fused_turn(json.dumps(reply), names)
+    assert fused["emotions"] == reply["emotions"] and fused["memory_summary"]
+
+    # 잘린 응답: 발화는 쓰고 빠진 감정 평가/요약만 별도 호출로 채움
+    partial = parse_fused_turn('{"thought_process": "t", "speech": "Fine.", "emotions": {"joy": 9', names)
+    assert partial["speech"] == "Fine." and partial["emotions"] is None and partial["memory_summary"] is None
+
+    streamer = JSONStringFieldStreamer("speech")
+    assert streamer.feed(json.dumps(reply)) == reply["speech"]
+
+def test_parse_stats_rates():
+    stats = ParseStats()
+    for outcome in ("ok", "ok", "repaired", "failed"):
+        stats.record("speech", outcome)
+    speech = stats.stats()["speech"]
+    assert speech["calls"] == 4
+    assert speech["first_pass_failure_rate"] == 0.5
+    assert speech["failure_rate"] == 0.25
+
+def _scenario_db(path):
+    init_emotion_db(path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, turn INTEGER, speaker TEXT, message TEXT);
+        CREATE TABLE short_term_memory (id INTEGER PRIMARY KEY AUTOINCREMENT, agent_name TEXT, timestamp TEXT, content TEXT,
+                                        importance INTEGER, reference_count INTEGER DEFAULT 0);
+        CREATE TABLE long_term_memory (id INTEGER PRIMARY KEY AUTOINCREMENT, agent_name TEXT, content TEXT, importance INTEGER,
+                                       last_accessed TEXT, reflection_type TEXT, reference_count INTEGER DEFAULT 0);
+        CREATE TABLE thought_processes (id INTEGER PRIMARY KEY AUTOINCREMENT, agent_name TEXT, thought_process TEXT);
+    """)
+    conn.close()
+    return path
+
+def test_fused_turn_missing_emotions_is_repaired_by_measurement(tmp_path):
+    from utils import memo
+
+    db_path = _scenario_db(str(tmp_path / "scenario_1.db"))
+    agent1 = SimpleNamespace(name="agent_1", partner_name="agent_2")
+    agent2 = SimpleNamespace(name="agent_2", partner_name="agent_1")
+    content = json.dumps({"thought_process": "Stay calm.", "speech": "We can fix this.",
+                          "memory_summary": "agent_2 offered to fix the problem."})
+
+    server = start_fake_server(ttft="fixed:0", tokens_per_sec=0, seed=6)
+    llm_connector.set_llm_backends([server.base_url], probe_interval=None)
+    memo.set_turn_mode("fused")
+    parse_stats.reset()
+    try:
+        speech, _ = memo._finish_turn(db_path, agent1, agent2, "It broke again.", 1, "", content)
+        turn = parse_stats.stats()["turn"]
+    finally:
+        memo.set_turn_mode("standard")
+        parse_stats.reset()
+        server.shutdown()
+        llm_connector.set_llm_backends([llm_connector.LLM_BASE_URL], probe_interval=None)
+
+    # 빠진 감정 평가를 실제 측정 호출이 채웠으므로 "repaired"
+    assert speech == "We can fix this."
+    assert turn["repaired"] == 1 and turn["failed"] == 0
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM emotion_states WHERE agent_name = 'agent_2'").fetchone()[0] >= 1
+    conn.close()
@@ -0,0 +1,63 @@
+from utils.context_methods import fit_conversation_history
+from utils.token_budget import (
+    PromptTokenStats,
+    TokenBudget,
+    count_tokens,
+    prompt_tokens,
+    set_token_encoding,
+    truncate_to_tokens,
+)
+from utils import token_budget
+
+def test_truncate_respects_limit():
+    text = " ".join(f"word{i}" for i in range(200))
+    short = truncate_to_tokens(text, 20)
+    assert short.endswith("...")
+    assert count_tokens(short) <= 20
+    assert truncate_to_tokens("short text", 20) == "short text"
+
+def test_fit_keeps_most_valuable_items_first():
+    budget = TokenBudget(min_item=5)
+    items = ["a" * 40, "b" * 40, "c" * 400, "d" * 8]
+    kept = budget.fit(items, count_tokens(items[0]) + count_tokens(items[1]) + 8)
+    assert kept[:2] == items[:2]
+    assert len(kept) == 3 and kept[2].startswith("c") and count_tokens(kept[2]) <= 8
+
+    # 남은 예산이 min_item보다 작으면 자르지 않고 버림
+    assert TokenBudget(min_item=50).fit(items, count_tokens(items[0]) + 5) == items[:1]
+
+def test_fit_reflections_and_prompt_stats():
+    reflections = TokenBudget(reflection=10).fit_reflections({"summary": "x " * 200, "lesson": "short"})
+    assert count_tokens(reflections["summary"]) <= 10 and reflections["lesson"] == "short"
+
+    stats = PromptTokenStats()
+    messages = [{"role": "system", "content": "abcd" * 10}, {"role": "user", "content": "abcd" * 5}]
+    for total in (100, 200, prompt_tokens(messages)):
+        stats.record("agent_1", {"total": total})
+    summary = stats.stats()
+    assert summary["turns"] == 3
+    assert summary["total"]["max"] == 200
+
+def test_history_fit_keeps_speaker_message_pairs():
+    history = [("Catarina", "old " * 100), ("Garen", "Hello there."), ("Catarina", "Hi!")]
+    newest = count_tokens("Garen: Hello there.") + count_tokens("Catarina: Hi!")
+
+    kept = fit_conversation_history(history, TokenBudget(history=newest + 10, min_item=5))
+    assert kept[1:] == history[1:]
+    speaker, message = kept[0]
+    assert speaker == "Catarina" and message.startswith("old") and message.endswith("...")
+
+    # 화자 이름 안에서 잘린 줄은 (speaker, message) 쌍을 만들 수 없으므로 버림
+    long_name = [("Catarina " * 50, "lost"), ("Garen", "Hello there."), ("Catarina", "Hi!")]
+    assert fit_conversation_history(long_name, TokenBudget(history=newest + 10, min_item=5)) == history[1:]
+
+def test_budget_and_tokenizer_are_opt_in():
+    # 기본은 예산 없음, 네트워크가 필요 없는 4글자 = 1토큰 추정
+    assert token_budget.context_token_budget is None
+    assert token_budget.token_encoding is None and count_tokens("abcd" * 10) == 10
+
+    set_token_encoding("no_such_encoding")
+    try:
+        assert count_tokens("abcd" * 10) == 10  # 인코딩을 불러오지 못하면 추정치
+    finally:
+        set_token_encoding(None)
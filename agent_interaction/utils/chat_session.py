@@ -0,0 +1,126 @@
+# chat_session.py
+import threading
+from collections import OrderedDict
+
+from .memory_management import db_connection
+
+###################################
+# Per-agent Chat Sessions
+###################################
+
+class ChatSession:
+    """
+    One agent's side of a conversation, kept as an append-only list of chat messages.
+
+    The partner's lines are "user" messages and the agent's own replies "assistant"
+    messages, in the same "Thought process:/Speech:" format the model is asked to answer in.
+
+    Because earlier messages never change, consecutive requests share a long identical
+    prefix that servers with prompt/KV caching can skip re-processing. When the history
+    grows past `max_exchanges`, the oldest half is dropped at once (rather than one
+    exchange per turn) so the prefix only shifts occasionally.
+    """
+
+    def __init__(self, agent_name, partner_name, max_exchanges=8):
+        """
+        Args:
+            agent_name (str): The agent answering in this session.
+            partner_name (str): The agent it talks to.
+            max_exchanges (int): Maximum (message, reply) pairs kept.
+        """
+        self.agent_name = agent_name
+        self.partner_name = partner_name
+        self.max_exchanges = max_exchanges
+        self.exchanges = []
+        self.lock = threading.Lock()
+
+    def history_messages(self):
+        """
+        Returns:
+            list[dict]: Past exchanges as OpenAI-style user/assistant messages, oldest first.
+        """
+        messages = []
+        for incoming, reply in self.exchanges:
+            messages.append({"role": "user", "content": f"{self.partner_name}: {incoming}"})
+            messages.append({"role": "assistant", "content": reply})
+        return messages
+
+    def add_exchange(self, incoming, reply):
+        """
+        Append one finished exchange, trimming the oldest half when the session is full.
+
+        Args:
+            incoming (str): The partner's message.
+            reply (str): The agent's full reply, see format_reply.
+        """
+        self.exchanges.append((incoming, reply))
+        if len(self.exchanges) > self.max_exchanges:
+            del self.exchanges[: len(self.exchanges) // 2]
+
+    def load_from_db(self, database_path):
+        """
+        Rebuild the session from the conversations table (e.g. after a restart).
+        Turns are stored as two rows: the partner's message, then this agent's reply.
+        Thought processes are not stored per turn, so rebuilt replies hold only the speech.
+        """
+        with db_connection(database_path) as conn:
+            rows = conn.execute("""
+                SELECT turn, speaker, message FROM conversations
+                WHERE speaker IN (?, ?)
+                ORDER BY id
+            """, (self.agent_name, self.partner_name)).fetchall()
+
+        turns = {}
+        for turn, speaker, message in rows:
+            turns.setdefault(turn, []).append((speaker, message))
+        for turn in sorted(turns):
+            pair = turns[turn]
+            if len(pair) == 2 and pair[0][0] == self.partner_name and pair[1][0] == self.agent_name:
+                self.add_exchange(pair[0][1], format_reply(pair[1][1]))
+
+def format_reply(speech, thought_process=None):
+    """
+    Returns:
+        str: A reply in the "Thought process:/Speech:" answer format (speech only without a thought process).
+    """
+    if not thought_process:
+        return f"Speech:\n{speech}"
+    return f"Thought process:\n{thought_process}\n\nSpeech:\n{speech}"
+
+# 최근에 쓴 세션만 유지 (가장 오래 쓰지 않은 세션부터 제거)
+MAX_SESSIONS = 64
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def get_chat_session(database_path, agent_name, partner_name, max_exchanges=8):
+    """
+    Return the chat session of `agent_name` talking to `partner_name` in a scenario DB,
+    creating it from the stored conversation on first use. At most MAX_SESSIONS sessions
+    are kept; the least recently used one is dropped (and rebuilt from the DB if needed again).
+
+    Returns:
+        ChatSession: The shared session object.
+    """
+    key = (database_path, agent_name, partner_name)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = ChatSession(agent_name, partner_name, max_exchanges)
+            try:
+                session.load_from_db(database_path)
+            except Exception as e:
+                print(f"Error loading chat session for '{agent_name}': {e}")
+            _sessions[key] = session
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(key)
+    return session
+
+def reset_chat_sessions(database_path=None):
+    """
+    Forget cached sessions, for one scenario DB (e.g. when its run ends) or all of them.
+    """
+    with _sessions_lock:
+        for key in [k for k in _sessions if database_path is None or k[0] == database_path]:
+            del _sessions[key]
@@ -1,5 +1,7 @@
 import sqlite3
 
+from . import token_budget as budgets
+
 
 def generate_context_dict(database_path, agent_name, max_stm=5, max_ltm=5):
     """
@@ -96,7 +98,31 @@ def generate_context(database_path, agent_name, max_stm=5, max_ltm=5):
 
     return context_string
 
-def g_enerate_context(database_path, agent, max_stm=5, max_ltm=5, history_limit=10):
+def fit_conversation_history(conversation_history, budget):
+    """
+    Keep the newest conversation lines that fit the history token budget.
+
+    Args:
+        conversation_history (list of tuples): (speaker, message) pairs, oldest first.
+        budget (TokenBudget): Budget whose `history` limit applies.
+
+    Returns:
+        list of tuples: The kept (speaker, message) pairs, oldest first. The oldest kept
+        message may be truncated; a line cut inside the speaker name is dropped.
+    """
+    # 최신 대사부터 채우고 다시 오래된 순으로
+    recent = list(reversed(conversation_history))
+    lines = budget.fit([f"{speaker}: {message}" for speaker, message in recent], budget.history)
+    kept = []
+    for (speaker, _), line in zip(recent, lines):
+        prefix = f"{speaker}: "
+        if not line.startswith(prefix):
+            break
+        kept.append((speaker, line[len(prefix):]))
+    return kept[::-1]
+
+def g_enerate_context(database_path, agent, max_stm=5, max_ltm=5, history_limit=10, include_history=True,
+                      token_budget=None):
     """
     Generate context as a string by retrieving the agent's short-term and long-term memories,
     as well as recent conversation history.
@@ -107,6 +133,9 @@ def g_enerate_context(database_path, agent, max_stm=5, max_ltm=5, history_limit=
         max_stm (int): Maximum number of short-term memories to include.
         max_ltm (int): Maximum number of long-term memories to include.
         history_limit (int): Maximum number of conversation turns to include.
+        include_history (bool): Append the conversation history (off when the history is sent as chat messages).
+        token_budget (TokenBudget, optional): Per-section token limits; defaults to the budget set with
+            token_budget.set_token_budget. Newest STM, most important LTM and newest history lines are kept first.
 
     Returns:
         str: A string combining short-term memories, long-term memories, and conversation history.
@@ -143,15 +172,26 @@ def g_enerate_context(database_path, agent, max_stm=5, max_ltm=5, history_limit=
     except Exception as e:
         print(f"Error generating context for agent '{agent.name}': {e}")
 
+    # 토큰 예산 적용 (가치가 낮은 항목부터 잘라냄)
+    budget = token_budget or budgets.context_token_budget
+    if budget is not None:
+        short_term_memories = budget.fit(short_term_memories, budget.short_term)
+        long_term_memories = budget.fit(long_term_memories, budget.long_term)
+
+    # Format memories
+    stm_text = "=== Short-Term Memories ===\n" + "\n".join(short_term_memories) if short_term_memories else "=== Short-Term Memories ===\n(No short-term memories)"
+    ltm_text = "\n\n=== Long-Term Memories ===\n" + "\n".join(long_term_memories) if long_term_memories else "\n\n=== Long-Term Memories ===\n(No long-term memories)"
+    if not include_history:
+        return (stm_text + ltm_text).strip()
+
     # Retrieve conversation history
     try:
         conversation_history = retrieve_conversation_history(database_path, agent.name, agent.partner_name, limit=history_limit)
     except Exception as e:
         print(f"Error retrieving conversation history for agent '{agent.name}': {e}")
 
-    # Format memories
-    stm_text = "=== Short-Term Memories ===\n" + "\n".join(short_term_memories) if short_term_memories else "=== Short-Term Memories ===\n(No short-term memories)"
-    ltm_text = "\n\n=== Long-Term Memories ===\n" + "\n".join(long_term_memories) if long_term_memories else "\n\n=== Long-Term Memories ===\n(No long-term memories)"
+    if budget is not None and conversation_history:
+        conversation_history = fit_conversation_history(conversation_history, budget)
     
     # Format conversation history
     history_text = "\n\n" + format_conversation_history(conversation_history) if conversation_history else "\n\n(No conversation history)"
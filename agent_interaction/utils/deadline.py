@@ -0,0 +1,232 @@
+# deadline.py
+import contextvars
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+###################################
+# Deadlines
+###################################
+
+class DeadlineExceeded(RuntimeError):
+    """
+    Raised when a step cannot finish within the remaining turn budget. It is not retried.
+    """
+
+class TurnDeadline:
+    """
+    Time budget of one conversation turn.
+
+    The turn deadline itself is soft: LLM calls are not cut off by it, but retries that
+    would end after it are skipped. Optional steps run under a hard child deadline
+    (see `optional_step`) that ends early enough to leave time for the speech call.
+    """
+
+    def __init__(self, seconds, database_path=None, agent_name=None, turn=None, hard=False, end=None, step=None):
+        """
+        Args:
+            seconds (float): Budget from now.
+            database_path (str, optional): Scenario DB that receives degradation events.
+            agent_name (str, optional): Agent whose turn this is.
+            turn (int, optional): Conversation turn number.
+            hard (bool): LLM calls are cancelled when the deadline passes.
+            end (float, optional): Absolute time.monotonic() deadline (overrides `seconds`).
+            step (str, optional): Optional step this deadline was made for (see `optional_step`).
+        """
+        self.seconds = seconds
+        self.end = end if end is not None else time.monotonic() + seconds
+        self.database_path = database_path
+        self.agent_name = agent_name
+        self.turn = turn
+        self.hard = hard
+        self.step = step
+        self.degradations = []
+
+    def remaining(self):
+        return self.end - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def child(self, reserve, step=None):
+        """
+        Returns:
+            TurnDeadline: A hard deadline `reserve` seconds before this one, sharing its event log.
+        """
+        child = TurnDeadline(0, self.database_path, self.agent_name, self.turn, hard=True, end=self.end - reserve,
+                             step=step)
+        child.degradations = self.degradations
+        return child
+
+    def record(self, step, action):
+        """
+        Record that an optional step was degraded, in memory and in the scenario DB.
+
+        Args:
+            step (str): Step name, e.g. "emotion_measure".
+            action (str): What was done instead, e.g. "reused last emotion vector".
+        """
+        event = {
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "turn": self.turn,
+            "agent_name": self.agent_name,
+            "step": step,
+            "action": action,
+            "remaining": round(self.remaining(), 3),
+        }
+        self.degradations.append(event)
+        from .memory_management import debug_log  # memory_management가 이 모듈을 import하므로 여기서
+        debug_log(f"Turn budget: {step} -> {action} ({event['remaining']:.2f}s left)")
+        if self.database_path:
+            try:
+                save_degradation_event(self.database_path, event)
+            except sqlite3.Error as e:
+                print(f"Error saving degradation event: {e}")
+
+_current_deadline = contextvars.ContextVar("turn_deadline", default=None)
+
+def current_deadline():
+    """
+    Returns:
+        TurnDeadline or None: The deadline of the turn being processed in this context.
+    """
+    return _current_deadline.get()
+
+def remaining_time(default=None):
+    """
+    Returns:
+        float or None: Seconds left in the current deadline, or `default` without one.
+    """
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else default
+
+@contextmanager
+def use_deadline(deadline):
+    """
+    Make a deadline current for the enclosed steps (None leaves the context unchanged).
+    """
+    if deadline is None:
+        yield None
+        return
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+@contextmanager
+def turn_deadline(seconds, database_path=None, agent_name=None, turn=None):
+    """
+    Run a turn under a time budget; with seconds=None no deadline is set.
+
+    Yields:
+        TurnDeadline or None: The active deadline.
+    """
+    deadline = TurnDeadline(seconds, database_path, agent_name, turn) if seconds is not None else None
+    with use_deadline(deadline):
+        yield deadline
+
+@contextmanager
+def without_deadline():
+    """
+    Run the enclosed steps without the current deadline (e.g. work handed off to a
+    background worker that outlives the turn).
+    """
+    token = _current_deadline.set(None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+@contextmanager
+def optional_step(step, reserve=0.0, min_seconds=0.0):
+    """
+    Run an optional step under a hard deadline that leaves `reserve` seconds of the turn.
+
+    Yields:
+        bool: False if the step should be skipped because less than `min_seconds` is left;
+              the caller then applies its fallback and calls `degrade`.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        yield True
+        return
+    child = deadline.child(reserve, step)
+    if child.remaining() < min_seconds:
+        yield False
+        return
+    token = _current_deadline.set(child)
+    try:
+        yield True
+    finally:
+        _current_deadline.reset(token)
+
+def db_timeout(default=5.0, floor=0.5):
+    """
+    Returns:
+        float: SQLite lock wait for a DB step. Inside an optional step it is the time left
+               for the step, between `floor` and `default` seconds; everywhere else (the
+               conversation, memory and emotion writes of the turn) it is `default`,
+               sqlite3's own default, so a spent budget cannot make those writes fail.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None or deadline.step is None:
+        return default
+    return min(default, max(floor, deadline.remaining()))
+
+def degrade(step, action):
+    """
+    Record a degradation in the current deadline (no-op without one).
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.record(step, action)
+
+###################################
+# Degradation Events
+###################################
+
+def init_degradation_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS degradation_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            turn INTEGER,
+            agent_name TEXT,
+            step TEXT,
+            action TEXT,
+            remaining REAL
+        )
+    """)
+
+def save_degradation_event(database_path, event):
+    conn = sqlite3.connect(database_path, timeout=db_timeout())
+    try:
+        init_degradation_table(conn)
+        conn.execute("""
+            INSERT INTO degradation_events (timestamp, turn, agent_name, step, action, remaining)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (event["timestamp"], event["turn"], event["agent_name"], event["step"],
+              event["action"], event["remaining"]))
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_degradation_events(database_path, limit=100):
+    """
+    Returns:
+        list[dict]: The most recent degradation events of a scenario DB, newest first
+                    (all of them with limit=None).
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        init_degradation_table(conn)
+        rows = conn.execute("""
+            SELECT timestamp, turn, agent_name, step, action, remaining
+            FROM degradation_events ORDER BY id DESC LIMIT ?
+        """, (-1 if limit is None else limit,)).fetchall()
+    finally:
+        conn.close()
+    keys = ("timestamp", "turn", "agent_name", "step", "action", "remaining")
+    return [dict(zip(keys, row)) for row in rows]
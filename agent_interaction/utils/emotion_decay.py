@@ -0,0 +1,205 @@
+# emotion_decay.py
+import math
+import sqlite3
+from datetime import datetime, timezone
+
+from .emotion_methods import (
+    EMOTION_WINDOW_SIZE,
+    db_connection,
+    empty_emotion_vector,
+    ensure_emotion_window,
+    retrieve_current_emotions,
+)
+
+###################################
+# Decay Model
+###################################
+
+class EmotionDecayModel:
+    """
+    Exponential relaxation of an emotion state toward a resting baseline (by default the
+    agent's initial state, so an agent that starts at zero stays at zero).
+
+    After `elapsed` seconds without an event, each emotion is
+        baseline + (value - baseline) * 0.5 ** (elapsed / half_life)
+    so it covers half of the remaining distance every half-life. The state is computed
+    when it is read; only real events (sentiment updates, measurements) write rows.
+    """
+
+    def __init__(self, baseline=None, half_life=600.0, half_lives=None):
+        """
+        Args:
+            baseline (float or dict, optional): Resting value, one for all emotions or per emotion
+                (missing emotions rest at 0). None uses the baseline passed to relax.
+            half_life (float or None): Seconds for an emotion to relax halfway; None disables decay.
+            half_lives (dict, optional): Per-emotion half-lives overriding `half_life`.
+        """
+        names = empty_emotion_vector()
+        if baseline is None:
+            self.baseline = None
+        elif isinstance(baseline, dict):
+            self.baseline = {name: float(baseline.get(name, 0.0)) for name in names}
+        else:
+            self.baseline = {name: float(baseline) for name in names}
+        self.half_lives = {name: (half_lives or {}).get(name, half_life) for name in names}
+        for name, value in self.half_lives.items():
+            if value is not None and value <= 0:
+                raise ValueError(f"Half-life of {name} must be positive: {value}")
+
+    def relax(self, emotions, elapsed, baseline=None):
+        """
+        Args:
+            emotions (dict): State at the last event.
+            elapsed (float): Seconds since that event.
+            baseline (dict, optional): Resting state when the model has no baseline of its own
+                (retrieve_emotions_at passes the agent's initial state); missing emotions rest at 0.
+
+        Returns:
+            dict: The state after `elapsed` seconds.
+        """
+        elapsed = max(0.0, elapsed)
+        resting = self.baseline if self.baseline is not None else (baseline or {})
+        relaxed = {}
+        for name, value in emotions.items():
+            half_life = self.half_lives.get(name)
+            if half_life is None or elapsed == 0.0:
+                relaxed[name] = value
+                continue
+            rest = resting.get(name, 0.0)
+            relaxed[name] = rest + (value - rest) * math.pow(0.5, elapsed / half_life)
+        return relaxed
+
+###################################
+# Per-Agent Models
+###################################
+
+# 에이전트 이름 -> 모델 (페르소나별 기준 상태와 반감기)
+_models = {}
+# 따로 지정되지 않은 에이전트의 모델. None이면 감쇠 없음 (기존 동작)
+default_decay_model = None
+
+def set_emotion_decay(model, agent_name=None):
+    """
+    Configure lazy decay for one agent, or for every agent without its own model.
+
+    Args:
+        model (EmotionDecayModel or None): None turns decay off.
+        agent_name (str, optional): Agent (persona) the model belongs to.
+    """
+    global default_decay_model
+    if agent_name is None:
+        default_decay_model = model
+    elif model is None:
+        _models.pop(agent_name, None)
+    else:
+        _models[agent_name] = model
+
+def get_emotion_decay(agent_name):
+    """
+    Returns:
+        EmotionDecayModel or None: The agent's model, else the default.
+    """
+    return _models.get(agent_name, default_decay_model)
+
+###################################
+# Lazy Evaluation
+###################################
+
+def _parse_timestamp(value):
+    # SQLite CURRENT_TIMESTAMP는 UTC "YYYY-MM-DD HH:MM:SS"
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+def last_event_time(database_path, agent_name):
+    """
+    Returns:
+        datetime or None: UTC time of the agent's latest emotion state row.
+    """
+    with db_connection(database_path) as conn:
+        try:
+            ensure_emotion_window(conn)
+            row = conn.execute("""
+                SELECT timestamp FROM emotion_window
+                WHERE agent_name = ?
+                ORDER BY timestamp DESC, state_id DESC
+                LIMIT 1
+            """, (agent_name,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return _parse_timestamp(row[0]) if row and row[0] else None
+
+def _format_timestamp(value):
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def initial_emotions(database_path, agent_name):
+    """
+    Returns:
+        dict or None: The agent's first emotion state row (the persona's initial state).
+    """
+    with db_connection(database_path) as conn:
+        row = conn.execute("""
+            SELECT joy, trust, fear, surprise, sadness, disgust, anger, anticipation
+            FROM emotion_states
+            WHERE agent_name = ?
+            ORDER BY id
+            LIMIT 1
+        """, (agent_name,)).fetchone()
+    return dict(zip(empty_emotion_vector(), row)) if row else None
+
+def _emotions_as_of(database_path, agent_name, at, recent_n=EMOTION_WINDOW_SIZE):
+    # retrieve_current_emotions와 같은 평균을 at 이전의 행으로 다시 계산
+    with db_connection(database_path) as conn:
+        rows = conn.execute("""
+            SELECT joy, trust, fear, surprise, sadness, disgust, anger, anticipation, timestamp
+            FROM emotion_states
+            WHERE agent_name = ? AND timestamp <= ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        """, (agent_name, _format_timestamp(at), recent_n)).fetchall()
+    if not rows:
+        return None, None
+    emotions = empty_emotion_vector()
+    for row in rows:
+        for i, emotion in enumerate(emotions):
+            emotions[emotion] += row[i]
+    for emotion in emotions:
+        emotions[emotion] /= len(rows)
+    return emotions, _parse_timestamp(rows[0][-1])
+
+def retrieve_emotions_at(database_path, agent_name, at=None):
+    """
+    The agent's emotion state at time `at`: the current state (retrieve_current_emotions)
+    relaxed by the agent's decay model for the time since its last event. Without a model
+    this is retrieve_current_emotions.
+
+    The state relaxes toward the model's baseline or, if it has none, toward the agent's
+    initial state. If `at` is before the last event, the state is rebuilt from the rows
+    written up to `at` and relaxed from the last of them.
+
+    Args:
+        database_path (str): Path to the SQLite database file.
+        agent_name (str): Name of the agent.
+        at (datetime, optional): Time to evaluate (naive values are UTC); default now.
+
+    Returns:
+        dict: Emotion state.
+
+    Raises:
+        ValueError: If `at` is before the agent's first emotion state.
+    """
+    emotions = retrieve_current_emotions(database_path, agent_name)
+    model = get_emotion_decay(agent_name)
+    if model is None:
+        return emotions
+    since = last_event_time(database_path, agent_name)
+    if since is None:
+        return emotions
+    if at is None:
+        at = datetime.now(timezone.utc)
+    elif at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    if at < since:
+        emotions, since = _emotions_as_of(database_path, agent_name, at)
+        if emotions is None:
+            raise ValueError(f"No emotion state for '{agent_name}' at or before {at.isoformat()}")
+    baseline = initial_emotions(database_path, agent_name) if model.baseline is None else None
+    return model.relax(emotions, (at - since).total_seconds(), baseline)
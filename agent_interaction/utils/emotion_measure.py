@@ -13,7 +13,19 @@ from .emotion_methods import (
     adjust_emotions,  # 필요시
     # etc...
 )
+from .emotion_decay import retrieve_emotions_at
+from .memory_management import debug_log
 from .context_methods import g_enerate_context
+from . import structured_output
+from .structured_output import (
+    StructuredOutputError,
+    emotion_schema,
+    emotion_repair_messages,
+    parse_json_lenient,
+    parse_stats,
+    response_format_for,
+    schema_instruction,
+)
 ##################################
 # 1. Plutchik 8개 감정 항목 (EmotionBench 스타일의 1~5 척도 질문)
 ##################################
@@ -27,6 +39,8 @@ plutchik_emotions_dic = {
     "7": "Anger",
     "8": "Anticipation"
 }
+# 고정 순서 (Joy..Anticipation), emotion_states 열 순서와 같음
+EMOTION_NAMES = [plutchik_emotions_dic[qid] for qid in sorted(plutchik_emotions_dic, key=int)]
 
 system_prompt = "You are a helpful assistant who can only reply numbers from 1 to 5."
 base_prompt = """You can only reply with numbers from 1 to 5.
@@ -77,7 +91,7 @@ def compose_scenario_text_for_llama(database_path, agent):
     """
     scenario_text =""
     scenario_text += g_enerate_context(database_path, agent)
-    current = retrieve_current_emotions(database_path, agent.name)
+    current = retrieve_emotions_at(database_path, agent.name)
     scenario_text += "\n=== Current Emotion State ===\n"
     scenario_text += (
         f"Joy={current['joy']:.2f}, Trust={current['trust']:.2f}, "
@@ -121,8 +135,18 @@ def call_llama_emotion(database_path, agent):
         }
     ]
 
+    # 구조화 출력 모드: 감정 이름을 키로 하는 JSON (질문 순서 그대로)
+    response_format = None
+    if structured_output.structured_output_enabled:
+        schema = emotion_schema([plutchik_emotions_dic[qid] for qid in questions_order])
+        messages[1]["content"] += "\n\n" + schema_instruction(schema)
+        response_format = response_format_for(schema, "emotion_scores")
+
     # 로컬 Llama 모델 호출
-    response_text = query_llm_dict(messages)["choices"][0]["message"]["content"]
+    # 의미 기반 캐시는 시나리오 부분만 비교 (질문 순서와 지시문은 정확히 일치해야 재사용)
+    response_text = query_llm_dict(
+        messages, purpose="emotion", response_format=response_format, semantic_text=scenario_text
+    )["choices"][0]["message"]["content"]
     return response_text, questions_order
 
 ##################################
@@ -147,6 +171,72 @@ def parse_llama_emotion_response(response_text, questions_order):
     sorted_scores = [score for _, score in zipped_sorted]
     return sorted_scores
 
+def parse_emotion_scores(response_text, questions_order, structured=False):
+    """
+    Read whichever scores can be attributed to an emotion.
+
+    Args:
+        response_text (str): LLM reply.
+        questions_order (list[str]): Question ids in the order they were asked.
+        structured (bool): The reply was requested as JSON keyed by emotion name.
+
+    Returns:
+        dict: {emotion name: score 1-5}. Plain-text replies are all-or-nothing, because
+              without labels a missing number cannot be matched to its emotion.
+    """
+    names = [plutchik_emotions_dic[qid] for qid in questions_order]
+    if structured:
+        try:
+            value = parse_json_lenient(response_text)
+            by_lower = {str(key).lower(): score for key, score in value.items()}
+            return {
+                name: by_lower[name.lower()] for name in names
+                if isinstance(by_lower.get(name.lower()), int) and 1 <= by_lower[name.lower()] <= 5
+            }
+        except StructuredOutputError:
+            pass  # JSON이 아니면 숫자 목록으로 읽어 봄
+
+    scores = parse_llama_emotion_response(response_text, questions_order)
+    if len(scores) < len(questions_order):
+        return {}
+    ordered_names = [plutchik_emotions_dic[qid] for qid in sorted(questions_order, key=int)]
+    return dict(zip(ordered_names, scores))
+
+def read_emotion_scores(response_text, questions_order):
+    """
+    Parse the questionnaire reply into 8 scores. If some cannot be read, one short repair
+    call asks only for those (instead of throwing the whole measurement away).
+
+    Returns:
+        list[int] or None: Scores in Joy..Anticipation order, or None if still incomplete.
+    """
+    structured = structured_output.structured_output_enabled
+    scores = parse_emotion_scores(response_text, questions_order, structured)
+    if len(scores) == len(plutchik_emotions_dic):
+        parse_stats.record("emotion", "ok")
+        return [scores[plutchik_emotions_dic[qid]] for qid in sorted(plutchik_emotions_dic, key=int)]
+
+    names = [plutchik_emotions_dic[qid] for qid in questions_order]
+    missing_order = [qid for qid in questions_order if plutchik_emotions_dic[qid] not in scores]
+    missing = [plutchik_emotions_dic[qid] for qid in missing_order]
+    try:
+        response_format = response_format_for(emotion_schema(missing), "emotion_scores") if structured else None
+        repaired = query_llm_dict(
+            emotion_repair_messages(response_text, names, missing, structured),
+            max_retries=2,
+            purpose="repair:emotion",
+            response_format=response_format,
+        )["choices"][0]["message"]["content"]
+        scores.update(parse_emotion_scores(repaired, missing_order, structured))
+    except Exception as e:
+        debug_log(f"Emotion reply repair failed: {e}")
+
+    if len(scores) != len(plutchik_emotions_dic):
+        parse_stats.record("emotion", "failed")
+        return None
+    parse_stats.record("emotion", "repaired")
+    return [scores[plutchik_emotions_dic[qid]] for qid in sorted(plutchik_emotions_dic, key=int)]
+
 ##################################
 # 5. 최종 측정 & 업데이트
 ##################################
@@ -156,15 +246,28 @@ def measure_and_update_emotions(database_path, agent):
     2) parse_llama_emotion_response -> 8개 감정 스코어
     3) 1~5 -> 0.0~1.0 스케일링
     4) DB에 새로운 감정 상태 저장
+
+    Returns:
+        dict or None: The stored emotion state (0.0~1.0), or None if no 8 scores could be read.
     """
     response_text, questions_order = call_llama_emotion(database_path, agent)
-    scores_1to5 = parse_llama_emotion_response(response_text, questions_order)
+    scores_1to5 = read_emotion_scores(response_text, questions_order)
 
-    if len(scores_1to5) != 8:
-        # 혹은 로깅/에러 처리
+    if scores_1to5 is None:
+        # 수정 요청 후에도 8개를 읽지 못한 경우
         print("Error: LLM did not return 8 scores. Response text:", response_text)
         return None
 
+    return store_emotion_scores(database_path, agent.name, scores_1to5)
+
+def store_emotion_scores(database_path, agent_name, scores_1to5):
+    """
+    Scale 1~5 questionnaire scores (Joy..Anticipation order) to 0.0~1.0 and insert them
+    as the agent's new emotion state. Also used for the self-ratings of a fused turn.
+
+    Returns:
+        dict: The stored emotion state.
+    """
     # 1->0.0, 5->1.0 스케일링
     scaled = [(s - 1) / 4.0 for s in scores_1to5]
 
@@ -179,13 +282,11 @@ def measure_and_update_emotions(database_path, agent):
             )
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            agent.name,  # agent_id 대신 agent_name 사용
+            agent_name,  # agent_id 대신 agent_name 사용
             joy, trust, fear, surprise, sadness, disgust, anger, anticipation
         ))
         conn.commit()
 
-    # adjust_emotions 호출
-"""
     # 최종 감정 상태 반환
     return {
         "joy": joy,
@@ -197,7 +298,7 @@ def measure_and_update_emotions(database_path, agent):
         "anger": anger,
         "anticipation": anticipation
     }
-"""
+
 ##################################
 # TEST
 ##################################
@@ -69,6 +69,178 @@ def init_emotion_db(database_path):
         """)
         conn.commit()
 
+###################################
+# Rolling Emotion Window
+###################################
+
+# retrieve_current_emotions가 평균 내는 최근 상태 수
+EMOTION_WINDOW_SIZE = 10
+
+# 창 합계를 읽는 열 순서
+_EMOTION_COLUMNS = "joy, trust, fear, surprise, sadness, disgust, anger, anticipation"
+
+def emotion_window_ready(conn):
+    """
+    Check the DB itself (not a per-process cache) for the rolling window, so a DB that is
+    deleted and recreated at the same path gets its window again.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DB.
+
+    Returns:
+        bool: Whether the window and its running totals exist.
+    """
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emotion_window_totals'"
+    ).fetchone() is not None
+
+def init_emotion_window(conn, size=EMOTION_WINDOW_SIZE):
+    """
+    Create the per-agent rolling window of the last `size` emotion states, a running sum of
+    each agent's window, and the triggers that keep both current on every insert into
+    emotion_states (from any writer), then fill them from the existing rows.
+
+    The window keeps the same rows the read used to pick (timestamp DESC, id DESC), and
+    an older window without running totals is rebuilt.
+
+    Args:
+        conn (sqlite3.Connection): Connection to a DB that has an emotion_states table.
+        size (int): Window length.
+    """
+    # 동시에 여러 연결이 만들지 않도록 쓰기 잠금 안에서 다시 확인
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not emotion_window_ready(conn):
+            _create_emotion_window(conn, size)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+def _create_emotion_window(conn, size):
+    # 합계 테이블이 없는 이전 형식의 창은 지우고 새로 만듦
+    conn.execute("DROP TRIGGER IF EXISTS emotion_window_insert")
+    conn.execute("DROP TABLE IF EXISTS emotion_window")
+    conn.execute("""
+        CREATE TABLE emotion_window (
+            agent_name TEXT NOT NULL,
+            state_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            joy REAL NOT NULL,
+            trust REAL NOT NULL,
+            fear REAL NOT NULL,
+            surprise REAL NOT NULL,
+            sadness REAL NOT NULL,
+            disgust REAL NOT NULL,
+            anger REAL NOT NULL,
+            anticipation REAL NOT NULL,
+            PRIMARY KEY (agent_name, state_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE emotion_window_totals (
+            agent_name TEXT PRIMARY KEY,
+            state_count INTEGER NOT NULL,
+            joy REAL NOT NULL,
+            trust REAL NOT NULL,
+            fear REAL NOT NULL,
+            surprise REAL NOT NULL,
+            sadness REAL NOT NULL,
+            disgust REAL NOT NULL,
+            anger REAL NOT NULL,
+            anticipation REAL NOT NULL
+        )
+    """)
+    # 창에 들어온 상태는 합계에 더하고, 밀려난 상태는 뺌
+    conn.execute(f"""
+        CREATE TRIGGER emotion_window_add
+        AFTER INSERT ON emotion_window
+        BEGIN
+            INSERT INTO emotion_window_totals (agent_name, state_count, {_EMOTION_COLUMNS})
+            VALUES (NEW.agent_name, 1, NEW.joy, NEW.trust, NEW.fear, NEW.surprise, NEW.sadness, NEW.disgust, NEW.anger, NEW.anticipation)
+            ON CONFLICT (agent_name) DO UPDATE SET
+                state_count = state_count + 1,
+                joy = joy + excluded.joy,
+                trust = trust + excluded.trust,
+                fear = fear + excluded.fear,
+                surprise = surprise + excluded.surprise,
+                sadness = sadness + excluded.sadness,
+                disgust = disgust + excluded.disgust,
+                anger = anger + excluded.anger,
+                anticipation = anticipation + excluded.anticipation;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER emotion_window_remove
+        AFTER DELETE ON emotion_window
+        BEGIN
+            UPDATE emotion_window_totals SET
+                state_count = state_count - 1,
+                joy = joy - OLD.joy,
+                trust = trust - OLD.trust,
+                fear = fear - OLD.fear,
+                surprise = surprise - OLD.surprise,
+                sadness = sadness - OLD.sadness,
+                disgust = disgust - OLD.disgust,
+                anger = anger - OLD.anger,
+                anticipation = anticipation - OLD.anticipation
+            WHERE agent_name = OLD.agent_name;
+        END
+    """)
+    # 조회와 같은 순서(timestamp DESC, id DESC)로 가장 오래된 상태를 밀어냄
+    # (timestamp가 NULL인 행은 ''로 두어 그 순서에서 맨 뒤에 오게 함)
+    conn.execute(f"""
+        CREATE TRIGGER emotion_window_insert
+        AFTER INSERT ON emotion_states
+        BEGIN
+            INSERT INTO emotion_window (agent_name, state_id, timestamp, {_EMOTION_COLUMNS})
+            VALUES (NEW.agent_name, NEW.id, COALESCE(NEW.timestamp, ''), NEW.joy, NEW.trust, NEW.fear, NEW.surprise, NEW.sadness, NEW.disgust, NEW.anger, NEW.anticipation);
+            DELETE FROM emotion_window
+            WHERE agent_name = NEW.agent_name AND (timestamp, state_id) <= (
+                SELECT timestamp, state_id FROM emotion_window WHERE agent_name = NEW.agent_name
+                ORDER BY timestamp DESC, state_id DESC LIMIT 1 OFFSET {size}
+            );
+        END
+    """)
+    # 기존 DB(runs_* 등): 에이전트별 최근 상태로 창을 채움 (합계는 트리거가 채움)
+    conn.execute(f"""
+        INSERT INTO emotion_window (agent_name, state_id, timestamp, {_EMOTION_COLUMNS})
+        SELECT agent_name, id, COALESCE(timestamp, ''), {_EMOTION_COLUMNS}
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY agent_name ORDER BY timestamp DESC, id DESC) AS position
+            FROM emotion_states
+        )
+        WHERE position <= {size}
+    """)
+
+def ensure_emotion_window(conn):
+    """
+    Create the rolling window if the DB behind `conn` does not have it yet.
+
+    Raises:
+        sqlite3.OperationalError: If the DB has no emotion_states table.
+    """
+    if not emotion_window_ready(conn):
+        init_emotion_window(conn)
+
+def read_window_totals(conn, agent_names):
+    """
+    Args:
+        conn (sqlite3.Connection): Connection to a DB with an emotion_states table.
+        agent_names (list[str]): Agents to read.
+
+    Returns:
+        list[tuple]: (agent_name, state_count, joy, ..., anticipation) per agent that has states,
+                     the sums of its current window.
+    """
+    ensure_emotion_window(conn)
+    placeholders = ", ".join("?" * len(agent_names))
+    return conn.execute(f"""
+        SELECT agent_name, state_count, {_EMOTION_COLUMNS}
+        FROM emotion_window_totals
+        WHERE agent_name IN ({placeholders}) AND state_count > 0
+    """, list(agent_names)).fetchall()
+
 ###################################
 # Emotion Vector Utilities
 ###################################
@@ -110,6 +282,10 @@ def clamp_emotion_value(val):
 def retrieve_current_emotions(database_path, agent_name, recent_n=10):
     """
     Retrieve the average of the most recent N emotion states for the specified agent.
+
+    With the default N the average comes from emotion_window_totals, a running sum of the
+    agent's last N states kept by triggers, instead of a scan of emotion_states. It agrees
+    with averaging those rows up to floating-point rounding.
     
     Args:
         database_path (str): Path to the SQLite database file.
@@ -119,13 +295,27 @@ def retrieve_current_emotions(database_path, agent_name, recent_n=10):
     Returns:
         dict: Dictionary with averaged emotions.
     """
+    if recent_n == EMOTION_WINDOW_SIZE:
+        try:
+            with db_connection(database_path) as conn:
+                totals = read_window_totals(conn, [agent_name])
+        except sqlite3.OperationalError:
+            # emotion_states가 아직 없는 DB는 아래의 조회로
+            pass
+        else:
+            if not totals:
+                debug_log(f"No emotion states found for agent '{agent_name}'")
+                return empty_emotion_vector()
+            _, count, *sums = totals[0]
+            return {emotion: total / count for emotion, total in zip(empty_emotion_vector(), sums)}
+
     with db_connection(database_path) as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT joy, trust, fear, surprise, sadness, disgust, anger, anticipation
             FROM emotion_states
             WHERE agent_name = ?
-            ORDER BY timestamp DESC
+            ORDER BY timestamp DESC, id DESC
             LIMIT ?
         """, (agent_name, recent_n))
         rows = cursor.fetchall()
@@ -148,7 +338,14 @@ def retrieve_current_emotions(database_path, agent_name, recent_n=10):
 # Emotion Update Functions
 ###################################
 
-def update_emotion(database_path, agent_name, event, sentiment_score):
+# 상호작용 이벤트가 갱신하는 감정 (그 밖의 이벤트는 'anticipation')
+EVENT_EMOTIONS = {
+    'positive_interaction': 'joy',
+    'negative_interaction': 'sadness',
+    'neutral_interaction': 'trust'
+}
+
+def update_emotion(database_path, agent_name, event, sentiment_score, current_emotions=None):
     """
     Update the emotion state based on an event and its sentiment score.
     
@@ -157,19 +354,17 @@ def update_emotion(database_path, agent_name, event, sentiment_score):
         agent_name (str): Name of the agent.
         event (str): Type of event ('positive_interaction', 'negative_interaction', 'neutral_interaction').
         sentiment_score (float): Sentiment score between -1 and +1.
+        current_emotions (dict, optional): State the event applies to (e.g. the decayed state
+                                           from emotion_decay.retrieve_emotions_at); default
+                                           retrieve_current_emotions.
     """
-    emotion_map = {
-        'positive_interaction': 'joy',
-        'negative_interaction': 'sadness',
-        'neutral_interaction': 'trust'
-    }
-    
     # Map event to emotion
-    emotion = emotion_map.get(event, 'anticipation')  # Default to 'anticipation' if event not found
+    emotion = EVENT_EMOTIONS.get(event, 'anticipation')  # Default to 'anticipation' if event not found
     intensity = clamp_emotion_value((sentiment_score + 1) / 2)  # Scale from -1~1 to 0~1
     
     # Retrieve current emotions
-    current_emotions = retrieve_current_emotions(database_path, agent_name)
+    if current_emotions is None:
+        current_emotions = retrieve_current_emotions(database_path, agent_name)
     updated_emotions = current_emotions.copy()
     updated_emotions[emotion] = intensity  # Update the specific emotion
     
@@ -201,6 +396,9 @@ def adjust_emotions(database_path, agent_name):
       - 감정값이 0.7보다 크면 0.5 쪽으로 조금 감소 (겹치는 부분 만큼 줄임)
       - 0.0 ~ 0.7 사이면 조정하지 않음 (자연스럽게 유지)
 
+    Every call appends an emotion_states row. emotion_decay.retrieve_emotions_at gives a
+    time-based cool-down without writes and is what the conversation loop uses.
+
     Args:
         database_path (str): Path to the SQLite database file.
         agent_name (str): Name of the agent.
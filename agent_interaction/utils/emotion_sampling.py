@@ -0,0 +1,207 @@
+# emotion_sampling.py
+import sqlite3
+import threading
+from collections import Counter
+
+import numpy as np
+
+from .emotion_methods import analyze_sentiment, db_connection
+from .llm_semantic_cache import default_embed
+
+###################################
+# Measurement Policy
+###################################
+
+class EmotionSamplingPolicy:
+    """
+    Decide per measurement opportunity whether the LLM emotion questionnaire is worth running.
+
+    An agent is measured when something emotionally significant may have happened since its
+    last measurement:
+      - "sentiment": the TextBlob polarity moved by at least `sentiment_delta`,
+      - "novelty":   the text's embedding is at least `novelty` (cosine distance) away from
+                     the text of the last measurement,
+      - "interval":  `max_skips` opportunities in a row were skipped.
+    The first opportunity of an agent is always measured. Otherwise the previous state is
+    carried forward: no questionnaire call and no new emotion_states row.
+    """
+
+    def __init__(self, sentiment_delta=0.3, novelty=0.5, max_skips=3, sentiment=None, embed=None):
+        """
+        Args:
+            sentiment_delta (float or None): Polarity change (-1..1 scale) that triggers a measurement.
+            novelty (float or None): Cosine distance that triggers a measurement; None skips embedding.
+            max_skips (int or None): Consecutive skipped opportunities after which the agent is measured anyway.
+            sentiment (Callable[[str], float], optional): Polarity function (default analyze_sentiment).
+            embed (Callable[[str], numpy.ndarray], optional): Unit embedding function (default default_embed).
+        """
+        self.sentiment_delta = sentiment_delta
+        self.novelty = novelty
+        self.max_skips = max_skips
+        self.sentiment = sentiment or analyze_sentiment
+        self.embed = embed or default_embed
+        self._lock = threading.Lock()
+        self._last = {}  # (database_path, agent_name) -> {"sentiment", "embedding", "skips"}
+        self.reasons = Counter()
+
+    def should_measure(self, database_path, agent_name, text, sentiment=None):
+        """
+        Args:
+            database_path (str): Scenario DB (agents of different scenarios are tracked apart).
+            agent_name (str): Agent about to be measured.
+            text (str): Message that prompted the measurement (what the agent heard or said).
+            sentiment (float, optional): Its polarity if already computed.
+
+        Returns:
+            bool: True if the agent should be measured now.
+        """
+        if sentiment is None and self.sentiment_delta is not None:
+            sentiment = self.sentiment(text)
+        embedding = self.embed(text) if self.novelty is not None else None
+
+        key = (database_path, agent_name)
+        with self._lock:
+            last = self._last.get(key)
+            if last is None:
+                reason = "first"
+            elif (self.sentiment_delta is not None
+                  and abs(sentiment - last["sentiment"]) >= self.sentiment_delta):
+                reason = "sentiment"
+            elif (embedding is not None
+                  and 1.0 - float(np.dot(embedding, last["embedding"])) >= self.novelty):
+                reason = "novelty"
+            elif self.max_skips is not None and last["skips"] >= self.max_skips:
+                reason = "interval"
+            else:
+                reason = None
+
+            if reason is None:
+                last["skips"] += 1
+                self.reasons["carried"] += 1
+                return False
+            # 비교 기준은 마지막으로 측정한 시점의 텍스트
+            self._last[key] = {"sentiment": sentiment, "embedding": embedding, "skips": 0}
+            self.reasons[reason] += 1
+            return True
+
+    def stats(self):
+        """
+        Returns:
+            dict: Opportunities, measurements, carried-forward states and measurements by trigger.
+        """
+        with self._lock:
+            carried = self.reasons["carried"]
+            measured = sum(self.reasons.values()) - carried
+            return {
+                "opportunities": measured + carried,
+                "measured": measured,
+                "carried": carried,
+                "measured_ratio": measured / (measured + carried) if measured + carried else None,
+                "by_reason": {reason: count for reason, count in self.reasons.items() if reason != "carried"},
+            }
+
+###################################
+# Offline Drift Evaluation
+###################################
+
+def load_emotion_trajectories(database_path):
+    """
+    Replay material from a recorded run in which every opportunity was measured.
+
+    Recorded runs do not link emotion rows to messages, so each agent's rows (after its
+    initial all-zero row) are spread over the messages the agent heard or said, in order.
+
+    Returns:
+        dict: {agent_name: [(text, emotion vector)]}.
+    """
+    with db_connection(database_path) as conn:
+        states = conn.execute("""
+            SELECT agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation
+            FROM emotion_states ORDER BY id
+        """).fetchall()
+        messages = conn.execute("SELECT speaker, message FROM conversations ORDER BY id").fetchall()
+
+    trajectories = {}
+    for agent_name in dict.fromkeys(row[0] for row in states):
+        rows = [list(row[1:]) for row in states if row[0] == agent_name][1:]
+        # 에이전트가 한 말과 그 직전에 들은 말
+        texts = [
+            message for i, (speaker, message) in enumerate(messages)
+            if speaker == agent_name or (i + 1 < len(messages) and messages[i + 1][0] == agent_name)
+        ]
+        if not rows or not texts:
+            continue
+        trajectories[agent_name] = [
+            (texts[min(k * len(texts) // len(rows), len(texts) - 1)], row) for k, row in enumerate(rows)
+        ]
+    return trajectories
+
+def evaluate_sampling(database_path, policy):
+    """
+    Compare the sampled trajectory (previous state carried forward when the policy skips)
+    with the always-measure trajectory recorded in a scenario DB.
+
+    Args:
+        database_path (str): Recorded scenario DB (e.g. runs_xxx/scenario_1.db).
+        policy (EmotionSamplingPolicy): A fresh policy.
+
+    Returns:
+        dict: Points, measurements and drift (mean absolute difference per emotion, 0~1)
+              averaged over all points, its maximum, and at each agent's last point.
+    """
+    points = measured = 0
+    drifts, final = [], []
+    for agent_name, trajectory in load_emotion_trajectories(database_path).items():
+        carried = None
+        for text, reference in trajectory:
+            points += 1
+            # 첫 기회는 정책이 항상 측정함
+            if policy.should_measure(database_path, agent_name, text):
+                carried = reference
+                measured += 1
+            drifts.append(sum(abs(a - b) for a, b in zip(carried, reference)) / len(reference))
+        final.append(drifts[-1])
+    return {
+        "path": database_path,
+        "points": points,
+        "measured": measured,
+        "measured_ratio": measured / points if points else None,
+        "drift_mean": sum(drifts) / len(drifts) if drifts else None,
+        "drift_max": max(drifts) if drifts else None,
+        "drift_final": sum(final) / len(final) if final else None,
+    }
+
+if __name__ == "__main__":
+    # 사용법: python -m utils.emotion_sampling ../runs_*/scenario_*.db
+    #         [--sentiment-delta 0.3] [--novelty 0.5] [--max-skips 3]  (음수면 해당 조건을 끔)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure how far sampled emotion trajectories drift")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--sentiment-delta", type=float, default=0.3)
+    parser.add_argument("--novelty", type=float, default=0.5)
+    parser.add_argument("--max-skips", type=int, default=3)
+    args = parser.parse_args()
+
+    def fmt(value, spec=".3f"):
+        return "-" if value is None else format(value, spec)
+
+    print(f"{'scenario':45s} {'points':>6s} {'measured':>8s} {'ratio':>6s} {'drift':>7s} {'max':>7s} {'final':>7s}")
+    total_points = total_measured = 0
+    for path in args.paths:
+        policy = EmotionSamplingPolicy(
+            sentiment_delta=args.sentiment_delta if args.sentiment_delta >= 0 else None,
+            novelty=args.novelty if args.novelty >= 0 else None,
+            max_skips=args.max_skips if args.max_skips >= 0 else None,
+        )
+        try:
+            result = evaluate_sampling(path, policy)
+        except sqlite3.OperationalError as e:
+            print(f"{path:45s} skipped: {e}")
+            continue
+        total_points += result["points"]
+        total_measured += result["measured"]
+        print(f"{path:45s} {result['points']:6d} {result['measured']:8d} {fmt(result['measured_ratio'], '.0%'):>6s} "
+              f"{fmt(result['drift_mean']):>7s} {fmt(result['drift_max']):>7s} {fmt(result['drift_final']):>7s}")
+    if total_points:
+        print(f"\nMeasured {total_measured} of {total_points} opportunities ({total_measured / total_points:.0%}).")
@@ -0,0 +1,245 @@
+# emotion_vector.py
+import sqlite3
+
+import numpy as np
+
+from .emotion_methods import (
+    EVENT_EMOTIONS,
+    db_connection,
+    empty_emotion_vector,
+    read_window_totals,
+    retrieve_current_emotions,
+)
+from .emotion_decay import get_emotion_decay, retrieve_emotions_at
+
+###################################
+# Fixed-Order Emotion Vectors
+###################################
+
+# emotion_states 열 순서 (joy..anticipation)
+EMOTION_KEYS = tuple(empty_emotion_vector())
+EMOTION_INDEX = {name: i for i, name in enumerate(EMOTION_KEYS)}
+
+def emotion_vector(emotions=None):
+    """
+    Args:
+        emotions (dict, optional): Emotion dict as returned by retrieve_current_emotions.
+
+    Returns:
+        numpy.ndarray: float32 vector of shape (8,) in EMOTION_KEYS order (zeros if omitted).
+    """
+    if emotions is None:
+        return np.zeros(len(EMOTION_KEYS), dtype=np.float32)
+    return np.array([emotions[name] for name in EMOTION_KEYS], dtype=np.float32)
+
+def emotion_matrix(emotions_list):
+    """
+    Returns:
+        numpy.ndarray: float32 matrix of shape (agents, 8), one row per emotion dict.
+    """
+    matrix = np.zeros((len(emotions_list), len(EMOTION_KEYS)), dtype=np.float32)
+    for row, emotions in enumerate(emotions_list):
+        matrix[row] = [emotions[name] for name in EMOTION_KEYS]
+    return matrix
+
+def to_emotion_dict(vector):
+    """
+    Returns:
+        dict: The emotion dict form of one vector (what prompts and the UI expect).
+    """
+    return dict(zip(EMOTION_KEYS, np.asarray(vector, dtype=np.float32).tolist()))
+
+###################################
+# Vectorized Operations
+###################################
+
+def clamp(matrix):
+    """
+    Vectorized clamp_emotion_value: every value into 0.0 ~ 1.0.
+    """
+    return np.clip(np.asarray(matrix, dtype=np.float32), 0.0, 1.0)
+
+def decay(matrix, alpha, target=0.5, above=None):
+    """
+    Move values a fraction `alpha` of the way toward `target`.
+
+    Args:
+        matrix (numpy.ndarray): Emotion vector or (agents, 8) matrix.
+        alpha (float or numpy.ndarray): Step size; an (agents,) array gives each agent its own.
+        target (float or numpy.ndarray): Resting value, a scalar or an (8,)/(agents, 8) baseline.
+        above (float, optional): Only values above this threshold move (adjust_emotions uses 0.7).
+
+    Returns:
+        numpy.ndarray: Clamped float32 result.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    alpha = np.asarray(alpha, dtype=np.float32)
+    if alpha.ndim == 1 and matrix.ndim == 2:
+        alpha = alpha[:, None]
+    moved = matrix - (matrix - np.asarray(target, dtype=np.float32)) * alpha
+    if above is not None:
+        moved = np.where(matrix > above, moved, matrix)
+    return clamp(moved)
+
+def blend(current, observed, weight):
+    """
+    Mix an observed state into the current one: (1 - weight) * current + weight * observed.
+
+    Args:
+        weight (float or numpy.ndarray): Share of the observation; an (agents,) array gives each agent its own.
+
+    Returns:
+        numpy.ndarray: Clamped float32 result.
+    """
+    current = np.asarray(current, dtype=np.float32)
+    weight = np.asarray(weight, dtype=np.float32)
+    if weight.ndim == 1 and current.ndim == 2:
+        weight = weight[:, None]
+    return clamp(current + (np.asarray(observed, dtype=np.float32) - current) * weight)
+
+###################################
+# Batched Retrieval / Persistence
+###################################
+
+def retrieve_current_emotion_matrix(database_path, agent_names):
+    """
+    Batched retrieve_current_emotions: each agent's rolling window average, read from the
+    window's running totals with one query for all agents.
+
+    Args:
+        database_path (str): Path to the SQLite database file.
+        agent_names (list[str]): Distinct agent names.
+
+    Returns:
+        numpy.ndarray: float32 matrix of shape (agents, 8); agents without states get zeros.
+    """
+    positions = {name: i for i, name in enumerate(agent_names)}
+    try:
+        with db_connection(database_path) as conn:
+            totals = read_window_totals(conn, agent_names)
+    except sqlite3.OperationalError:
+        # 창을 만들 수 없는 DB는 에이전트별 조회로
+        return emotion_matrix([retrieve_current_emotions(database_path, name) for name in agent_names])
+
+    matrix = np.zeros((len(agent_names), len(EMOTION_KEYS)), dtype=np.float64)
+    for name, count, *sums in totals:
+        matrix[positions[name]] = np.array(sums, dtype=np.float64) / count
+    return matrix.astype(np.float32)
+
+def retrieve_emotion_matrix_at(database_path, agent_names, at=None):
+    """
+    Batched retrieve_emotions_at: agents without a decay model are read together with
+    retrieve_current_emotion_matrix, agents with one are relaxed per agent.
+
+    Args:
+        database_path (str): Path to the SQLite database file.
+        agent_names (list[str]): Distinct agent names.
+        at (datetime, optional): Time to evaluate; default now.
+
+    Returns:
+        numpy.ndarray: float32 matrix of shape (agents, 8).
+    """
+    matrix = retrieve_current_emotion_matrix(database_path, agent_names)
+    for row, name in enumerate(agent_names):
+        if get_emotion_decay(name) is not None:
+            matrix[row] = emotion_vector(retrieve_emotions_at(database_path, name, at))
+    return matrix
+
+def store_emotion_matrix(database_path, agent_names, matrix):
+    """
+    Insert one new emotion state per agent with a single executemany and commit.
+
+    Args:
+        database_path (str): Path to the SQLite database file.
+        agent_names (list[str]): Agent of each matrix row.
+        matrix (numpy.ndarray): (agents, 8) states in EMOTION_KEYS order.
+    """
+    rows = np.asarray(matrix, dtype=np.float32).tolist()
+    with db_connection(database_path) as conn:
+        conn.executemany("""
+            INSERT INTO emotion_states (agent_name, joy, trust, fear, surprise, sadness, disgust, anger, anticipation)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(name, *row) for name, row in zip(agent_names, rows)])
+        conn.commit()
+
+###################################
+# Batched Emotion Updates
+###################################
+
+def update_emotions_batch(database_path, updates):
+    """
+    Batched update_emotion: each agent's event emotion is set from its sentiment score,
+    the other emotions keep their current average.
+
+    Args:
+        database_path (str): Path to the SQLite database file.
+        updates (list[tuple[str, str, float]]): (agent_name, event, sentiment_score), one per distinct agent.
+
+    Returns:
+        numpy.ndarray: The stored (agents, 8) states.
+    """
+    if not updates:
+        return np.zeros((0, len(EMOTION_KEYS)), dtype=np.float32)
+    names = [name for name, _, _ in updates]
+    columns = np.array([EMOTION_INDEX[EVENT_EMOTIONS.get(event, 'anticipation')] for _, event, _ in updates])
+    scores = np.array([score for _, _, score in updates], dtype=np.float32)
+
+    matrix = retrieve_current_emotion_matrix(database_path, names)
+    matrix[np.arange(len(names)), columns] = clamp((scores + 1) / 2)  # -1~1 -> 0~1
+    store_emotion_matrix(database_path, names, matrix)
+    return matrix
+
+def adjust_emotions_batch(database_path, agent_names, alpha=0.2, threshold=0.7):
+    """
+    Batched adjust_emotions: values above `threshold` cool down toward 0.5 by `alpha`.
+
+    Returns:
+        numpy.ndarray: The stored (agents, 8) states.
+    """
+    matrix = decay(retrieve_current_emotion_matrix(database_path, agent_names), alpha, 0.5, above=threshold)
+    store_emotion_matrix(database_path, agent_names, matrix)
+    return matrix
+
+def store_emotion_scores_batch(database_path, agent_names, scores_1to5):
+    """
+    Batched store_emotion_scores: 1~5 questionnaire scores (agents, 8) scaled to 0.0~1.0.
+
+    Returns:
+        numpy.ndarray: The stored (agents, 8) states.
+    """
+    matrix = clamp((np.asarray(scores_1to5, dtype=np.float32) - 1) / 4.0)
+    store_emotion_matrix(database_path, agent_names, matrix)
+    return matrix
+
+###################################
+# Testing and Example Usage
+###################################
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+    import time
+
+    from .emotion_methods import init_emotion_db, update_emotion
+
+    # 에이전트 수백 명의 한 턴: 에이전트별 update_emotion vs 한 번의 배치
+    agent_names = [f"agent_{i}" for i in range(300)]
+    events = ["positive_interaction", "negative_interaction", "neutral_interaction"]
+    updates = [(name, random.choice(events), random.uniform(-1, 1)) for name in agent_names]
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "emotion_vector_demo.db")
+        init_emotion_db(database_path)
+
+        start = time.perf_counter()
+        for name, event, score in updates:
+            update_emotion(database_path, name, event, score)
+        per_agent = time.perf_counter() - start
+
+        start = time.perf_counter()
+        update_emotions_batch(database_path, updates)
+        adjust_emotions_batch(database_path, agent_names)
+        batched = time.perf_counter() - start
+
+    print(f"{len(agent_names)} agents: per-agent update {per_agent:.3f}s, batched update + adjust {batched:.3f}s")
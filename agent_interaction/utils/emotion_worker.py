@@ -0,0 +1,179 @@
+# emotion_worker.py
+import contextvars
+import threading
+import time
+from collections import deque
+
+from .deadline import without_deadline
+from .llm_concurrency import percentile
+
+###################################
+# Background Emotion Measurement
+###################################
+
+class EmotionMeasurementWorker:
+    """
+    Run emotion measurements off the turn's critical path.
+
+    Turns submit a job per agent and go on with the most recently committed emotion vector.
+    Jobs for the same agent collapse: while one is waiting, a newer submission replaces it,
+    because the measurement reads the agent's memories and emotions when it runs and would
+    measure the newest state anyway. At most one job per agent runs at a time, so the
+    agent's measurements reach emotion_states in submission order.
+
+    A job runs in the context it was submitted from (so the scenario's telemetry and
+    cassette scopes apply), but without the submitting turn's deadline.
+    """
+
+    def __init__(self, measure, workers=2, history=500):
+        """
+        Args:
+            measure (Callable[[str, Agent], Any]): Measurement function, e.g. measure_and_update_emotions.
+                A None result (no scores could be read) counts as a failed measurement.
+            workers (int): Threads; jobs of different agents/scenarios run in parallel.
+            history (int): Number of recent jobs kept for the lag/duration percentiles.
+        """
+        self.measure = measure
+        self._cond = threading.Condition()
+        self._pending = {}  # (database_path, agent_name) -> (agent, submitted_at, context)
+        self._order = deque()  # 제출 순서의 키 (대기 중인 키만 한 번씩)
+        self._running = set()
+
+        self.submitted = 0
+        self.collapsed = 0
+        self.measured = 0
+        self.failed = 0
+        self.lags = deque(maxlen=history)  # 제출 -> 기록까지 (측정 결과가 얼마나 늦게 반영되는지)
+        self.durations = deque(maxlen=history)  # 측정 시간 (턴에서 빠진 대기 시간)
+        self.measure_seconds = 0.0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"emotion-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, database_path, agent):
+        """
+        Queue a measurement of `agent`, replacing one that has not started yet.
+        """
+        key = (database_path, agent.name)
+        context = contextvars.copy_context()
+        with self._cond:
+            self.submitted += 1
+            if key in self._pending:
+                # 지연은 처음 밀린 시점부터 잼
+                self.collapsed += 1
+                self._pending[key] = (agent, self._pending[key][1], context)
+            else:
+                self._order.append(key)
+                self._pending[key] = (agent, time.monotonic(), context)
+            self._cond.notify()
+
+    def _next_job(self):
+        # 같은 에이전트의 측정이 진행 중이면 그 다음 키로
+        for key in self._order:
+            if key not in self._running:
+                self._order.remove(key)
+                agent, submitted_at, context = self._pending.pop(key)
+                self._running.add(key)
+                return key, agent, submitted_at, context
+        return None
+
+    def _measure_detached(self, database_path, agent):
+        # 제출한 턴이 끝나도 측정은 계속되므로 턴 마감은 적용하지 않음
+        with without_deadline():
+            return self.measure(database_path, agent)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+            key, agent, submitted_at, context = job
+            start = time.monotonic()
+            try:
+                # None은 LLM 답에서 감정 점수를 읽지 못했다는 뜻 (emotion_states에 기록되지 않음)
+                failed = context.run(self._measure_detached, key[0], agent) is None
+                if failed:
+                    print(f"Background emotion measurement for {agent.name} returned no scores")
+            except Exception as e:
+                print(f"Background emotion measurement for {agent.name} failed: {e}")
+                failed = True
+            end = time.monotonic()
+            with self._cond:
+                self._running.discard(key)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.measured += 1
+                    self.lags.append(end - submitted_at)
+                    self.durations.append(end - start)
+                    self.measure_seconds += end - start
+                self._cond.notify_all()
+
+    def pending_age(self, database_path, agent_name):
+        """
+        Returns:
+            float or None: Seconds the agent's waiting job has been queued (how stale the
+                           committed vector may be), or None if nothing is waiting.
+        """
+        with self._cond:
+            job = self._pending.get((database_path, agent_name))
+            return time.monotonic() - job[1] if job else None
+
+    def discard(self, database_path):
+        """
+        Drop the queued jobs of one DB (e.g. a scenario run that was abandoned); jobs already
+        running finish.
+
+        Returns:
+            int: Number of dropped jobs.
+        """
+        with self._cond:
+            keys = [key for key in self._order if key[0] == database_path]
+            for key in keys:
+                self._order.remove(key)
+                del self._pending[key]
+            self._cond.notify_all()
+            return len(keys)
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until every submitted job has been measured (e.g. before a report or shutdown).
+
+        Returns:
+            bool: False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stats(self):
+        """
+        Returns:
+            dict: Job counts, collapsed submissions, staleness lag and measurement time percentiles,
+                  and the total measurement time taken off the turns.
+        """
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "collapsed": self.collapsed,
+                "measured": self.measured,
+                "failed": self.failed,
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "lag_p50": percentile(self.lags, 0.5),
+                "lag_p95": percentile(self.lags, 0.95),
+                "lag_max": max(self.lags) if self.lags else None,
+                "measure_p50": percentile(self.durations, 0.5),
+                "measure_seconds": self.measure_seconds,
+            }
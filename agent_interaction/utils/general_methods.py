@@ -161,6 +161,49 @@ def parse_llm_response(content):
 
     return speech, thought_process
 
+class SpeechStreamParser:
+    """
+    Incrementally extract the `Speech:` section from a streamed LLM response.
+
+    Feed chunks as they arrive; each call returns the newly available speech text.
+    The final speech should still be taken from parse_llm_response on the full content.
+    """
+
+    MARKER = "Speech:"
+
+    def __init__(self):
+        self.buffer = ""
+        self.speech_started = False
+        self.speech_emitted = False
+
+    def feed(self, chunk):
+        """
+        Args:
+            chunk (str): Next piece of the LLM response.
+
+        Returns:
+            str: Speech text that became available with this chunk ("" if none).
+        """
+        self.buffer += chunk
+        if not self.speech_started:
+            idx = self.buffer.find(self.MARKER)
+            if idx == -1:
+                # 마커가 청크 경계에 걸칠 수 있으므로 끝부분만 남겨둠
+                self.buffer = self.buffer[-(len(self.MARKER) - 1):]
+                return ""
+            self.speech_started = True
+            self.buffer = self.buffer[idx + len(self.MARKER):]
+
+        # parse_llm_response와 같이 앞쪽 공백은 버리고, 공백뿐인 조각은 다음 조각과 함께 내보냄
+        if not self.speech_emitted:
+            self.buffer = self.buffer.lstrip()
+        if not self.buffer.strip():
+            return ""
+        self.speech_emitted = True
+
+        delta, self.buffer = self.buffer, ""
+        return delta
+
 # 에이전트 대화 처리 (수정됨)
 def agent_conversation(database_path, agent1, agent2, message, conversation_turn, context=None):
     """
@@ -195,7 +238,7 @@ def agent_conversation(database_path, agent1, agent2, message, conversation_turn
 
     try:
         # Send the prompt to the LLM
-        llm_response = query_llm(prompt)
+        llm_response = query_llm(prompt, purpose="speech")
 
         if not isinstance(llm_response, dict) or "choices" not in llm_response:
             raise ValueError("Invalid LLM response format.")
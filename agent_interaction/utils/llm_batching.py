@@ -0,0 +1,138 @@
+# llm_batching.py
+import asyncio
+
+###################################
+# Micro-batching Request Coalescer
+###################################
+
+class RequestCoalescer:
+    """
+    Gather LLM requests that arrive within a short window and dispatch them together.
+
+    A batch is flushed when `max_batch_size` requests are waiting or `window_ms` has
+    passed since the first one arrived. If a `send_batch` function is given (e.g. for a
+    server with a batch endpoint) the whole batch goes out in one call. Otherwise every
+    request is sent at once over the shared connection pool, so the server sees them
+    together and can schedule them in one decoding batch. Each caller gets its own
+    result or exception back through its future.
+
+    A caller that gives up (cancellation, a turn deadline) cancels its own send; a batch
+    sent with `send_batch` is cancelled once all of its callers have given up.
+
+    Must be used from a single event loop (the shared LLM loop).
+    """
+
+    def __init__(self, send_one, send_batch=None, window_ms=10, max_batch_size=8):
+        """
+        Args:
+            send_one (callable): async fn(item) -> result, used when no batch sender is set.
+            send_batch (callable, optional): async fn(list[item]) -> list[result], in order.
+            window_ms (float): How long to wait for more requests after the first one.
+            max_batch_size (int): Flush immediately once this many requests are waiting.
+        """
+        self.send_one = send_one
+        self.send_batch = send_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+
+        self.batches_sent = 0
+        self.requests_sent = 0
+
+        self._pending = []
+        self._flush_handle = None
+        # 보내는 중인 배치 작업 (가비지 컬렉션으로 중간에 사라지지 않도록 참조를 유지)
+        self._tasks = set()
+
+    async def submit(self, item):
+        """
+        Queue one request and wait for its result.
+
+        Args:
+            item (Any): Request passed to send_one/send_batch.
+
+        Returns:
+            Any: The result for this request.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        # 대기 중에 취소된 요청은 보내지 않음
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            self.batches_sent += 1
+            self.requests_sent += len(batch)
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            if self.send_batch is not None:
+                futures = [future for _, future in batch]
+                for future in futures:
+                    future.add_done_callback(lambda _, futures=futures, task=task: self._cancel_abandoned(futures, task))
+
+    @staticmethod
+    def _cancel_abandoned(futures, task):
+        # 배치의 모든 호출자가 포기했으면 배치 전송도 취소
+        if all(future.cancelled() for future in futures):
+            task.cancel()
+
+    async def _send_each(self, batch):
+        tasks = []
+        for item, future in batch:
+            task = asyncio.ensure_future(self.send_one(item))
+            # 호출자가 취소되면(턴 마감 등) 그 요청의 전송도 취소해 제한기 슬롯을 돌려줌
+            future.add_done_callback(lambda done, task=task: task.cancel() if done.cancelled() else None)
+            tasks.append(task)
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _dispatch(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            if self.send_batch is not None:
+                try:
+                    results = await self.send_batch(items)
+                except Exception as e:
+                    results = [e] * len(items)
+                if len(results) != len(items):
+                    error = RuntimeError(f"Batch sender returned {len(results)} results for {len(items)} requests")
+                    results = [error] * len(items)
+            else:
+                results = await self._send_each(batch)
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            # 전송이 취소되는 등 결과를 받지 못한 호출자가 계속 기다리지 않도록
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("LLM batch was not delivered"))
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of batches, requests and the mean batch size so far.
+        """
+        return {
+            "batches": self.batches_sent,
+            "requests": self.requests_sent,
+            "mean_batch_size": self.requests_sent / self.batches_sent if self.batches_sent else 0.0,
+            "waiting": len(self._pending),
+        }
@@ -0,0 +1,226 @@
+# llm_cache.py
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+###################################
+# Cache Key
+###################################
+
+def make_cache_key(model, temperature, messages, options=None):
+    """
+    Build a content-addressed key for an LLM request.
+
+    Args:
+        model (str): Model name the request is sent to.
+        temperature (float): Sampling temperature.
+        messages (list[tuple]): (role, content) pairs, system prompt included.
+        options (dict, optional): Extra request parameters that change the answer (e.g. response_format).
+
+    Returns:
+        str: SHA-256 hex digest of the canonical request.
+    """
+    system = [content for role, content in messages if role == "system"]
+    others = [[role, content] for role, content in messages if role != "system"]
+    request = {"model": model, "temperature": temperature, "system": system, "messages": others}
+    if options:
+        request["options"] = options
+    canonical = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+###################################
+# Persistent Response Cache
+###################################
+
+class _LeaderCancelled(Exception):
+    """
+    Set on a single-flight future whose leader was cancelled; joiners retry instead of failing.
+    """
+
+class LLMResponseCache:
+    """
+    SQLite-backed LLM response cache with TTL, LRU eviction and single-flight requests.
+
+    Entries are evicted least-recently-used first once `max_entries` or `max_bytes`
+    is exceeded. Identical requests that arrive while one is already in flight wait
+    for that call instead of sending their own.
+    """
+
+    def __init__(self, path, max_entries=10000, max_bytes=256 * 1024 * 1024, ttl_seconds=None):
+        """
+        Args:
+            path (str): Path to the SQLite cache file.
+            max_entries (int): Maximum number of cached responses.
+            max_bytes (int): Maximum total size of cached responses in bytes.
+            ttl_seconds (float, optional): Entry lifetime. None keeps entries until evicted.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.inflight_joins = 0
+        self.saved_seconds = 0.0
+
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_lru ON llm_cache(last_accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+
+        Returns:
+            dict or None: The cached response, or None on a miss or expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, latency, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            self.saved_seconds += latency
+        return json.loads(response)
+
+    def put(self, key, response, latency):
+        """
+        Store a response and evict old entries if the cache is over its limits.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+            response (dict): OpenAI-style response to store.
+            latency (float): Seconds the live call took, credited on later hits.
+        """
+        payload = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO llm_cache (key, response, size, latency, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, payload, len(payload.encode("utf-8")), latency, now, now))
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        count, total_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        # 가장 오래 사용되지 않은 항목부터 한도 안에 들어올 때까지 삭제
+        rows = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_accessed ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total_size -= size
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return a cached response or run `compute` once for all concurrent callers with this key.
+
+        SQLite reads and writes run in a worker thread so the shared LLM event loop is not
+        blocked. If the caller that runs `compute` is cancelled (turn deadline, lost hedge),
+        the callers waiting on it are not: they look the key up again and one of them
+        becomes the new leader.
+
+        Args:
+            key (str): Cache key from make_cache_key.
+            compute (callable): Zero-argument function returning an awaitable response dict.
+
+        Returns:
+            dict: The cached or freshly computed response.
+        """
+        while True:
+            cached = await asyncio.to_thread(self.get, key)
+            if cached is not None:
+                return cached
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.inflight_joins += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                continue  # 리더만 취소됨: 다시 조회하고 필요하면 새 리더가 됨
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        start = time.monotonic()
+        try:
+            response = await compute()
+        except (Exception, asyncio.CancelledError) as e:
+            del self._inflight[key]
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            future.exception()  # 대기자가 없어도 "never retrieved" 경고가 나지 않도록
+            raise
+
+        future.set_result(response)
+        try:
+            # 저장이 끝날 때까지 진행 중 항목을 남겨 두어 그 사이 같은 요청이 다시 보내지지 않게 함
+            await asyncio.to_thread(self.put, key, response, time.monotonic() - start)
+        finally:
+            del self._inflight[key]
+        return response
+
+    def stats(self):
+        """
+        Return hit/miss counters and the LLM time saved by cache hits.
+
+        Returns:
+            dict: Counters including entry count and total size on disk.
+        """
+        with self._lock:
+            entries, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight_joins": self.inflight_joins,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": entries,
+            "bytes": total_size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
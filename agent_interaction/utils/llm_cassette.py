@@ -0,0 +1,201 @@
+# llm_cassette.py
+import json
+import os
+import threading
+from collections import defaultdict
+
+###################################
+# Cassette Files
+###################################
+
+def cassette_path_for(database_path):
+    """
+    Returns:
+        str: Cassette file that belongs to a scenario DB ("runs_x/scenario_1.db" -> "runs_x/scenario_1.llm.jsonl").
+    """
+    return os.path.splitext(database_path)[0] + ".llm.jsonl"
+
+class CassetteMiss(LookupError):
+    """
+    Raised in replay mode when a request has no recorded response and the miss policy is "error".
+    """
+
+###################################
+# Record / Replay
+###################################
+
+class LLMCassette:
+    """
+    Record every LLM request/response pair of a run to a JSONL file, or replay a recorded run.
+
+    Replay matching:
+      - "hash":  the recorded response of the identical request (same key as the response cache).
+      - "order": the next recorded response of the same purpose, in recording order.
+      - "auto":  hash first, then order. Requests that are not byte-identical between runs
+                 (shuffled emotion questionnaires, timestamps in the context) still replay.
+
+    Miss policy in replay mode: "error" raises CassetteMiss, "live" calls the backend,
+    "record" calls the backend and appends the new pair to the cassette.
+    """
+
+    MODES = ("record", "replay")
+    MATCHES = ("hash", "order", "auto")
+    MISS_POLICIES = ("error", "live", "record")
+
+    def __init__(self, path, mode="record", match="auto", on_miss="error"):
+        """
+        Args:
+            path (str): Cassette file (JSON lines).
+            mode (str): "record" (start a new cassette) or "replay".
+            match (str): "hash", "order" or "auto".
+            on_miss (str): "error", "live" or "record".
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if match not in self.MATCHES:
+            raise ValueError(f"Unknown cassette match: {match}")
+        if on_miss not in self.MISS_POLICIES:
+            raise ValueError(f"Unknown cassette miss policy: {on_miss}")
+        self.path = path
+        self.mode = mode
+        self.match = match
+        self.on_miss = on_miss
+        self._lock = threading.Lock()
+
+        self.entries = []
+        self._by_key = defaultdict(list)  # key -> entry indexes
+        self._by_purpose = defaultdict(list)  # purpose -> entry indexes
+        self._next_by_purpose = defaultdict(int)
+        self._used = set()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            open(path, "w", encoding="utf-8").close()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry):
+        index = len(self.entries)
+        self.entries.append(entry)
+        self._by_key[entry["key"]].append(index)
+        self._by_purpose[entry.get("purpose") or ""].append(index)
+
+    def _take(self, index):
+        self._used.add(index)
+        self.replayed += 1
+        return self.entries[index]["response"]
+
+    def _match_hash(self, key):
+        indexes = self._by_key.get(key)
+        if not indexes:
+            return None
+        # 같은 요청이 여러 번 녹화됐으면 녹화 순서대로, 다 쓰면 마지막 응답을 재사용
+        for index in indexes:
+            if index not in self._used:
+                return index
+        return indexes[-1]
+
+    def _match_order(self, purpose):
+        indexes = self._by_purpose.get(purpose or "", [])
+        position = self._next_by_purpose[purpose or ""]
+        while position < len(indexes) and indexes[position] in self._used:
+            position += 1
+        self._next_by_purpose[purpose or ""] = position + 1
+        return indexes[position] if position < len(indexes) else None
+
+    def lookup(self, key, purpose):
+        """
+        Returns:
+            dict or None: The recorded response for a request, or None on a miss.
+        """
+        with self._lock:
+            index = None
+            if self.match in ("hash", "auto"):
+                index = self._match_hash(key)
+            if index is None and self.match in ("order", "auto"):
+                index = self._match_order(purpose)
+            if index is None:
+                self.misses += 1
+                return None
+            return self._take(index)
+
+    def miss(self, purpose):
+        """
+        Apply the miss policy.
+
+        Returns:
+            bool: True if the live response should be appended to the cassette.
+
+        Raises:
+            CassetteMiss: With the "error" policy.
+        """
+        if self.on_miss == "error":
+            raise CassetteMiss(f"No recorded LLM response for a {purpose or 'untagged'} request in {self.path}")
+        return self.on_miss == "record"
+
+    def record(self, key, purpose, messages, options, response):
+        """
+        Append one request/response pair to the cassette.
+        """
+        entry = {
+            "key": key,
+            "purpose": purpose,
+            "messages": [list(message) for message in messages],
+            "options": options or {},
+            "response": response,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index(entry)
+            self._used.add(len(self.entries) - 1)
+            self.recorded += 1
+
+    async def aget_or_compute(self, key, purpose, messages, options, compute):
+        """
+        Replay a recorded response, or compute it live and record it.
+
+        Args:
+            key (str): Request key (llm_cache.make_cache_key).
+            purpose (str): Call purpose, used for order matching.
+            messages (list[tuple]): Request messages, stored for inspection.
+            options (dict): Per-call model parameters, stored for inspection.
+            compute (Callable[[], Awaitable[dict]]): Sends the request.
+
+        Returns:
+            dict: The response.
+        """
+        if self.mode == "replay":
+            response = self.lookup(key, purpose)
+            if response is not None:
+                return response
+            if not self.miss(purpose):
+                return await compute()
+        response = await compute()
+        self.record(key, purpose, messages, options, response)
+        return response
+
+    def stats(self):
+        """
+        Returns:
+            dict: Mode, entries on file, recorded/replayed pairs and misses.
+        """
+        with self._lock:
+            return {
+                "path": self.path,
+                "mode": self.mode,
+                "entries": len(self.entries),
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "misses": self.misses,
+                "unused": len(self.entries) - len(self._used),
+            }
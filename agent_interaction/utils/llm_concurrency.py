@@ -0,0 +1,252 @@
+# llm_concurrency.py
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+###################################
+# Error Classification
+###################################
+
+def is_overload_error(exc):
+    """
+    Decide whether an exception means the model server is overloaded (timeout, 429 or 5xx).
+
+    Works for openai/httpx errors (status_code attribute) and requests errors
+    (response.status_code) without importing either library.
+
+    Args:
+        exc (BaseException): The exception raised by an LLM call.
+
+    Returns:
+        bool: True if the limiter should back off.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(exc).__name__:
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or (isinstance(status, int) and 500 <= status < 600)
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (Iterable[float]): Samples.
+        q (float): Percentile between 0 and 1.
+
+    Returns:
+        float or None: The percentile, or None if there are no samples.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+###################################
+# Adaptive (AIMD) Concurrency Limiter
+###################################
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit for LLM calls that adapts with additive-increase/multiplicative-decrease.
+
+    After every `limit` successful calls the limit grows by one if recent p95 latency is
+    under the target. A timeout, 429 or 5xx cuts the limit by `decrease_factor`, at most
+    once per `cooldown` seconds so one burst of failures is not counted several times.
+    Without an explicit `target_latency` the target is `tolerance` times the best p95
+    seen so far, which tracks how fast the server is when it is not queueing.
+
+    Must be used from a single event loop (the shared LLM loop).
+    """
+
+    def __init__(self, initial_limit=5, min_limit=1, max_limit=64, target_latency=None,
+                 tolerance=2.0, decrease_factor=0.5, cooldown=5.0, window=50):
+        """
+        Args:
+            initial_limit (int): Starting number of concurrent calls.
+            min_limit (int): Lower bound for the limit.
+            max_limit (int): Upper bound for the limit.
+            target_latency (float, optional): p95 latency target in seconds.
+            tolerance (float): Multiple of the best observed p95 used when no target is set.
+            decrease_factor (float): Factor applied to the limit on overload.
+            cooldown (float): Minimum seconds between two decreases.
+            window (int): Number of recent latencies kept for the p95.
+        """
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.tolerance = tolerance
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.acquired = 0
+
+        self._latencies = deque(maxlen=window)
+        self._best_p95 = None
+        self._successes_since_adjust = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+
+    ###################################
+    # Slot acquisition
+    ###################################
+
+    async def acquire(self, priority=None):
+        """
+        Wait for a free slot.
+
+        Args:
+            priority (str, optional): Priority class of the call; ignored by this FIFO limiter
+                (see llm_scheduler.PriorityConcurrencyLimiter).
+
+        Returns:
+            float: Seconds spent waiting in the queue.
+        """
+        start = time.monotonic()
+        if not self._can_start(priority):
+            future = asyncio.get_running_loop().create_future()
+            self._enqueue(future, priority)
+            self._wake_next()  # 취소된 대기자만 남아 있던 경우 바로 슬롯을 받음
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 슬롯을 받은 직후 취소된 경우 슬롯을 반납
+                    self.in_flight -= 1
+                    self._wake_next()
+                else:
+                    self._discard(future)
+                raise
+        else:
+            self.in_flight += 1
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self, latency=None, overloaded=False):
+        """
+        Give a slot back and feed the outcome into the AIMD controller.
+
+        Args:
+            latency (float, optional): Call latency for a successful call.
+            overloaded (bool): True if the call failed because the server was overloaded.
+        """
+        self.in_flight -= 1
+        if overloaded:
+            self._on_overload()
+        elif latency is not None:
+            self._on_success(latency)
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, on_wait=None, priority=None):
+        """
+        Async context manager around one LLM call: acquire, time the call, release.
+
+        Args:
+            on_wait (callable, optional): Called with the queue wait in seconds once a slot is granted.
+            priority (str, optional): Priority class of the call, see acquire().
+        """
+        waited = await self.acquire(priority)
+        if on_wait is not None:
+            on_wait(waited)
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.release(overloaded=isinstance(e, Exception) and is_overload_error(e))
+            raise
+        else:
+            self.release(latency=time.monotonic() - start)
+
+    ###################################
+    # Queue discipline
+    ###################################
+
+    def _can_start(self, priority):
+        return self.in_flight < self.limit and not self._waiters
+
+    def _enqueue(self, future, priority=None):
+        self._waiters.append(future)
+
+    def _discard(self, future):
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def _next_waiter(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                return future
+        return None
+
+    def queue_depth(self):
+        return sum(1 for future in self._waiters if not future.done())
+
+    def _wake_next(self):
+        while self.in_flight < self.limit:
+            future = self._next_waiter()
+            if future is None:
+                return
+            self.in_flight += 1
+            future.set_result(None)
+
+    ###################################
+    # AIMD
+    ###################################
+
+    def _on_success(self, latency):
+        self._latencies.append(latency)
+        self._successes_since_adjust += 1
+        if self._successes_since_adjust < self.limit:
+            return
+        self._successes_since_adjust = 0
+
+        p95 = percentile(self._latencies, 0.95)
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+        target = self.target_latency if self.target_latency is not None else self._best_p95 * self.tolerance
+        if p95 <= target and self.limit < self.max_limit:
+            self.limit += 1
+            self.increases += 1
+
+    def _on_overload(self):
+        now = time.monotonic()
+        self._successes_since_adjust = 0
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self.decreases += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Current limit, in-flight calls, queue depth, wait times and recent p95 latency.
+        """
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth(),
+            "mean_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+            "p95_latency": percentile(self._latencies, 0.95),
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
@@ -3,22 +3,22 @@ import threading
 import time
 import json
 
-# 최대 동시 요청 제한 설정
-llm_request_lock = threading.Semaphore(5)
-
 def query_llm_old(prompt, max_retries=5,retry_delay=2):
-    with llm_request_lock:
-        url = "http://127.0.0.1:1234/v1/chat/completions"
-        data = {
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
+    url = "http://127.0.0.1:1234/v1/chat/completions"
+    data = {
+        "messages": [
+            {"role": "user", "content": prompt}
+        ]
+    }
 
+    async def _query_old_async():
+        loop = asyncio.get_running_loop()
         for attempt in range(max_retries):
             try:
-                response = requests.post(url, json=data, timeout=10)
-                response.raise_for_status()
+                # 동시 요청 수는 다른 LLM 호출과 같은 적응형 제한기로 관리
+                async with llm_limiter.slot():
+                    response = await loop.run_in_executor(None, lambda: requests.post(url, json=data, timeout=10))
+                    response.raise_for_status()
 
                 # Debug raw response
                 #print("DEBUG: Raw response text:", response.text)
@@ -35,65 +35,832 @@ def query_llm_old(prompt, max_retries=5,retry_delay=2):
 
             except requests.exceptions.RequestException as e:
                 if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(backoff_delay(attempt, retry_delay))
                 else:
                     raise RuntimeError(f"Error: Unable to connect to LLM after {max_retries} attempts - {e}")
             except ValueError as ve:
                 if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(backoff_delay(attempt, retry_delay))
                 else:
                     raise RuntimeError(f"Error: LLM returned invalid response - {ve}")
 
+    return run_on_llm_loop(_query_old_async())
+
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 import asyncio
+import contextvars
+import os
+import queue
+import random
+import httpx
+from contextlib import contextmanager
 from .prompt_templates import system_prompt
-from langchain_core.output_parsers import StrOutputParser
+from .llm_cache import LLMResponseCache, make_cache_key
+from .llm_cassette import LLMCassette
+from .llm_semantic_cache import SemanticResponseCache, request_namespace, request_text
+from .llm_batching import RequestCoalescer
+from .llm_scheduler import LLMPreempted, PriorityConcurrencyLimiter, priority_for
+from .deadline import DeadlineExceeded, current_deadline
+from .llm_router import BackendPool, LLMBackend
+from .llm_hedging import HedgePolicy
+from .llm_local_backend import LocalLlamaChat, is_local_model_path
+from .llm_routes import route_for
+from .llm_telemetry import CallRecorder, PrefixTracker, new_call_record, usage_from_message
 
-# LangChain ChatOpenAI 설정
-llm = ChatOpenAI(
-    base_url="http://10.12.121.81:11434/v1",
-    api_key="ollama",
-    model="llama3.1",
-    temperature=0.7,
-    streaming=False,  # 스트리밍 비활성화
-)
+# 모든 요청이 공유하는 HTTP 커넥션 풀 (keep-alive 연결 재사용)
+http_limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+http_client = httpx.Client(limits=http_limits)
+http_async_client = httpx.AsyncClient(limits=http_limits)
 
+LLM_BASE_URL = "http://10.12.121.81:11434/v1"
+llm_model = "llama3.1"
+llm_temperature = 0.7
 
-# query_llm 함수 구현
-def query_llm(prompt, max_retries=5, retry_delay=2):
+def make_chat_client(base_url, model=None, temperature=None, api_key="ollama"):
     """
-    LangChain 기반 LLM 요청 함수. JSON 응답을 그대로 반환.
+    Create a ChatOpenAI client for one OpenAI-compatible backend on the shared HTTP pools.
+    """
+    return ChatOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        model=model or llm_model,
+        temperature=llm_temperature if temperature is None else temperature,
+        streaming=False,  # 스트리밍 비활성화
+        stream_usage=True,  # 스트리밍 응답에도 토큰 사용량을 포함 (텔레메트리용)
+        max_retries=0,  # 재시도는 아래에서 직접 처리 (429/5xx가 동시성 제한기에 보이도록)
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+def streaming_client(client):
+    """
+    Returns:
+        Any: A copy of a ChatOpenAI client that streams from astream(). A non-streaming client
+             answers astream() with a single chunk, and bind(stream=True) is not accepted by
+             current langchain-openai. Other chat models (e.g. LocalLlamaChat) are returned as-is.
+    """
+    if "streaming" in type(client).model_fields:
+        return client.model_copy(update={"streaming": True})
+    return client
+
+def build_chains(client):
+    """
+    Build the chains every request kind uses once per client, so calls only invoke them.
+    The chains return AIMessage(Chunk)s rather than strings so token usage stays available.
+
+    Returns:
+        dict: {"prompt": ..., "messages": ..., "stream": ..., "stream_messages": ...}
+    """
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", system_prompt()),
+        ("user", "{input}")
+    ])
+    return {
+        "prompt": prompt_template | client,
+        "messages": client,  # (role, content) 튜플 리스트를 그대로 입력받음
+        "stream": prompt_template | streaming_client(client),  # 토큰 단위 스트리밍용
+        "stream_messages": streaming_client(client),
+    }
+
+# LangChain ChatOpenAI 설정 (기본 백엔드)
+llm = make_chat_client(LLM_BASE_URL)
+
+# 백엔드 풀: 기본은 단일 백엔드, set_llm_backends()로 여러 추론 서버에 분산
+llm_pool = BackendPool([LLMBackend(LLM_BASE_URL, llm, build_chains(llm))])
+
+###################################
+# Persistent Event Loop
+###################################
+
+_llm_loop = None
+_llm_loop_lock = threading.Lock()
+
+def get_llm_loop():
+    """
+    Return the long-lived event loop that runs every LLM request, starting it on first use.
+
+    The loop runs in a daemon thread so that sync callers (Flask handlers, scenario runners)
+    and async callers share the same HTTP connection pool and can keep many requests in flight.
+
+    Returns:
+        asyncio.AbstractEventLoop: The shared LLM event loop.
+    """
+    global _llm_loop
+    with _llm_loop_lock:
+        if _llm_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+            _llm_loop = loop
+    return _llm_loop
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+async def _on_llm_loop(coro):
+    """
+    Await a coroutine on the shared LLM loop, hopping loops if the caller runs on a different one.
+    """
+    loop = get_llm_loop()
+    if _running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+def run_on_llm_loop(coro):
+    """
+    Run a coroutine on the shared LLM loop and block until it finishes.
+
+    Args:
+        coro (coroutine): Coroutine to execute.
+    Returns:
+        Any: The coroutine's result.
+    """
+    loop = get_llm_loop()
+    if _running_loop() is loop:
+        coro.close()
+        raise RuntimeError("Sync LLM functions cannot be called from the LLM event loop; await the *_async variant instead.")
+    # run_coroutine_threadsafe는 호출 스레드의 컨텍스트를 복사하므로 턴 마감(ContextVar)도 함께 넘어감
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+###################################
+# Response Cache (opt-in)
+###################################
+
+llm_cache = None
+
+def set_llm_cache(path, max_entries=10000, max_bytes=256 * 1024 * 1024, ttl_seconds=None):
+    """
+    Enable the persistent response cache in front of the LLM, or disable it with path=None.
+
+    Args:
+        path (str or None): SQLite file to store cached responses in.
+        max_entries (int): Maximum number of cached responses.
+        max_bytes (int): Maximum total size of cached responses in bytes.
+        ttl_seconds (float, optional): Entry lifetime. None keeps entries until evicted.
+    """
+    global llm_cache
+    if llm_cache is not None:
+        llm_cache.close()
+    llm_cache = LLMResponseCache(path, max_entries, max_bytes, ttl_seconds) if path else None
+
+def get_llm_cache_stats():
+    """
+    Returns:
+        dict or None: Hit/miss counters and LLM seconds saved, or None if caching is off.
+    """
+    return llm_cache.stats() if llm_cache is not None else None
+
+llm_semantic_cache = None
+
+def set_llm_semantic_cache(path, threshold=0.95, purposes=("summary", "reflection"), **kwargs):
+    """
+    Answer low-stakes calls from the most similar earlier prompt, or disable with path=None.
+
+    Only calls whose purpose is listed use it (emotion ratings only when requested as JSON);
+    the prompt (minus the system prompt, or just the caller's `semantic_text`) is embedded
+    with all-MiniLM-L6-v2 and compared with earlier prompts of the same purpose, model and
+    response format. Takes the same arguments as SemanticResponseCache.
+
+    Args:
+        path (str or None): SQLite file to store the entries in.
+        threshold (float): Minimum cosine similarity for reusing an answer.
+        purposes (Iterable[str]): Call purposes allowed to use it.
+    """
+    global llm_semantic_cache
+    if llm_semantic_cache is not None:
+        llm_semantic_cache.close()
+    llm_semantic_cache = SemanticResponseCache(path, threshold, purposes, **kwargs) if path else None
+
+def get_llm_semantic_cache_stats():
+    """
+    Returns:
+        dict or None: Hit rate and similarity distribution, or None if the semantic cache is off.
+    """
+    return llm_semantic_cache.stats() if llm_semantic_cache is not None else None
+
+###################################
+# Record / Replay (opt-in)
+###################################
+
+llm_cassette = None
+# scoped_llm_cassette의 카세트. 컨텍스트별이라 동시에 도는 시나리오끼리 섞이지 않음
+_scoped_cassette = contextvars.ContextVar("llm_cassette", default=None)
+
+def set_llm_cassette(path, mode="record", match="auto", on_miss="error"):
+    """
+    Record every LLM request/response to a cassette file, or replay a recorded one so a
+    scenario run is deterministic and needs no model. path=None turns it off.
+
+    Args:
+        path (str or None): Cassette file, usually llm_cassette.cassette_path_for(db_path).
+        mode (str): "record" or "replay".
+        match (str): Replay matching, "hash", "order" or "auto" (see LLMCassette).
+        on_miss (str): Replay miss policy, "error", "live" or "record".
+    """
+    global llm_cassette
+    llm_cassette = LLMCassette(path, mode, match, on_miss) if path else None
+
+def current_llm_cassette():
+    """
+    Returns:
+        LLMCassette or None: The cassette of the enclosing scoped_llm_cassette in this
+                             context, else the process-wide one.
+    """
+    cassette = _scoped_cassette.get()
+    return cassette if cassette is not None else llm_cassette
+
+@contextmanager
+def scoped_llm_cassette(path, mode="record", match="auto", on_miss="error"):
+    """
+    Record or replay the LLM calls made in this context with a cassette for the enclosed
+    steps only (e.g. one scenario run). Like the turn deadline the cassette is a
+    ContextVar, so scenarios running at the same time in other threads keep their own
+    cassettes. path=None leaves the current cassette unchanged.
+
+    Yields:
+        LLMCassette or None: The cassette of this scope.
+    """
+    if not path:
+        yield current_llm_cassette()
+        return
+    cassette = LLMCassette(path, mode, match, on_miss)
+    token = _scoped_cassette.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _scoped_cassette.reset(token)
+
+def get_llm_cassette_stats():
+    """
+    Returns:
+        dict or None: Recorded/replayed pairs and misses, or None if no cassette is set.
+    """
+    cassette = current_llm_cassette()
+    return cassette.stats() if cassette is not None else None
+
+def _served_model(request):
+    # 요청을 실제로 처리하는 모델: 라우트/요청의 model 옵션, 모델 이름 없는 GGUF 라우트는 파일 경로, 그 밖에는 기본 모델
+    model = request["options"].get("model")
+    route = request["route"]
+    if model is None and route is not None and route.base_url and is_local_model_path(route.base_url):
+        model = route.base_url
+    return model or llm_model
+
+def _cassette_key(request):
+    # 응답 캐시와 같은 형식의 키이지만, 목적별 라우트가 처리한 모델로 구분
+    return make_cache_key(_served_model(request), llm_temperature, request["messages"], request["options"])
+
+###################################
+# Call Telemetry (opt-in)
+###################################
+
+llm_recorder = None
+# scoped_llm_telemetry의 기록기. 턴 마감처럼 컨텍스트별이라 동시에 도는 시나리오끼리 섞이지 않음
+_scoped_recorder = contextvars.ContextVar("llm_recorder", default=None)
+# 같은 대화의 직전 요청과 겹치는 접두부(서버 프롬프트 캐시로 재사용 가능한 부분) 추정
+llm_prefix_tracker = PrefixTracker()
+
+def set_llm_telemetry(path, run=None):
+    """
+    Record every LLM call (purpose, tokens, queue wait, TTFT, latency, retries) to `path`,
+    or stop recording with path=None.
+
+    Args:
+        path (str or None): Scenario DB (records go to its llm_calls table) or a "*.jsonl" sidecar.
+        run (str, optional): Run label stored with each record; defaults to the file name.
+    """
+    global llm_recorder
+    if llm_recorder is not None:
+        llm_recorder.close()
+    llm_recorder = CallRecorder(path, run) if path else None
+
+def current_llm_recorder():
+    """
+    Returns:
+        CallRecorder or None: The recorder of the enclosing scoped_llm_telemetry in this
+                              context, else the process-wide one.
+    """
+    recorder = _scoped_recorder.get()
+    return recorder if recorder is not None else llm_recorder
+
+@contextmanager
+def scoped_llm_telemetry(path, run=None):
+    """
+    Record LLM calls made in this context to `path` for the enclosed steps only (e.g. one
+    scenario run), then close that recorder. Like the turn deadline the recorder is a
+    ContextVar, so scenarios running at the same time in other threads keep their own
+    records. path=None leaves the current recorder unchanged.
+
+    Yields:
+        CallRecorder or None: The recorder of this scope.
+    """
+    if not path:
+        yield current_llm_recorder()
+        return
+    recorder = CallRecorder(path, run)
+    token = _scoped_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _scoped_recorder.reset(token)
+        recorder.close()
+
+def flush_llm_telemetry():
+    """
+    Wait until all finished calls are written, e.g. before building a report.
+    """
+    recorder = current_llm_recorder()
+    if recorder is not None:
+        recorder.flush()
+
+def _finish_call(request, start, error=None):
+    call = request["call"]
+    call["latency"] = time.monotonic() - start
+    if error is not None:
+        call["error"] = str(error)
+    if request["recorder"] is not None:
+        request["recorder"].record(call)
+
+def _add_queue_wait(call, waited):
+    call["queue_wait"] += waited
+
+###################################
+# Adaptive Concurrency Limit
+###################################
+
+# 모든 LLM 호출(query_llm, query_llm_dict, 스트리밍, query_llm_old)이 공유하는 동시성 제한기.
+# 지연이 목표 이하로 유지되면 한도를 늘리고, 타임아웃/429/5xx가 나면 줄임.
+# 대기열은 호출 목적별 우선순위 클래스(발화 > 감정/요약 > 리플렉션)로 가중 공정 스케줄링.
+llm_limiter = PriorityConcurrencyLimiter(initial_limit=5)
+
+def set_llm_concurrency(initial_limit=5, min_limit=1, max_limit=64, target_latency=None, **kwargs):
+    """
+    Replace the shared concurrency limiter. Takes the same arguments as PriorityConcurrencyLimiter
+    (AdaptiveConcurrencyLimiter options plus classes and reserved).
+    Calls already waiting on the old limiter keep their place there.
+    """
+    global llm_limiter
+    llm_limiter = PriorityConcurrencyLimiter(initial_limit, min_limit, max_limit, target_latency, **kwargs)
+
+def get_llm_concurrency_stats():
+    """
+    Returns:
+        dict: Current limit, in-flight calls, queue depth, wait times and recent p95 latency,
+              plus queue numbers per priority class.
+    """
+    return llm_limiter.stats()
+
+def preempt_background_llm_calls():
+    """
+    Cancel queued background calls (reflections) that have not been sent yet, e.g. when a
+    user starts a manual chat. The cancelled calls raise LLMPreempted.
+
+    Returns:
+        int: Number of cancelled calls.
+    """
+    loop = get_llm_loop()
+    if _running_loop() is loop:
+        return llm_limiter.preempt()
+    return asyncio.run_coroutine_threadsafe(_preempt_background(), loop).result()
+
+async def _preempt_background():
+    return llm_limiter.preempt()
+
+def backoff_delay(attempt, retry_delay):
+    """
+    Exponential backoff with jitter for retry number `attempt` (0-based), capped at 30 seconds.
+    """
+    return min(30.0, retry_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+###################################
+# Multi-backend Routing
+###################################
+
+def make_local_backend(model_path, **local_options):
+    """
+    Create an in-process backend that runs a GGUF model with llama.cpp on this machine.
+
+    Args:
+        model_path (str): Path to the quantized .gguf file.
+        **local_options: LocalLlamaChat options (n_ctx, n_threads, max_tokens, cache_bytes, ...).
+
+    Returns:
+        LLMBackend: Backend whose base_url is "local://<file name>".
+    """
+    client = LocalLlamaChat(model_path=model_path, temperature=llm_temperature, **local_options)
+    return LLMBackend(f"local://{os.path.basename(model_path)}", client, build_chains(client))
+
+def set_llm_backends(base_urls, model=None, temperature=None, api_key="ollama", probe_interval=10.0,
+                     local_options=None, **pool_options):
+    """
+    Spread LLM calls over several OpenAI-compatible backends serving the same model.
+
+    Requests go to the healthy backend with the fewest outstanding requests. Backends that
+    fail, time out or get much slower than the rest are ejected and re-admitted after a
+    successful health probe. For a local test, start several stub servers on different ports
+    and pass their URLs here.
+
+    Entries ending in ".gguf" are loaded in-process with llama.cpp instead (no network, no
+    external service), e.g. set_llm_backends(["models/llama-3.2-1b-instruct-q4_k_m.gguf"]).
+
+    Args:
+        base_urls (list[str]): Backend base URLs, e.g. ["http://10.0.0.2:11434/v1", ...], or GGUF model paths.
+        model (str, optional): Model name; defaults to the current model.
+        temperature (float, optional): Sampling temperature; defaults to the current one.
+        api_key (str): API key sent to the backends.
+        probe_interval (float or None): Seconds between health probes; None disables probing.
+        local_options (dict, optional): LocalLlamaChat options for GGUF entries.
+        **pool_options: Extra BackendPool options (failure_threshold, eject_seconds, slow_factor, ...).
+    """
+    global llm_pool, llm_model, llm_temperature
+    llm_model = model or llm_model
+    llm_temperature = llm_temperature if temperature is None else temperature
+
+    backends = []
+    for url in base_urls:
+        if is_local_model_path(url):
+            backends.append(make_local_backend(url, **(local_options or {})))
+            continue
+        client = make_chat_client(url, api_key=api_key)
+        backends.append(LLMBackend(url, client, build_chains(client)))
+
+    llm_pool.stop_health_checks()
+    llm_pool = BackendPool(backends, probe_interval=probe_interval or 10.0, **pool_options)
+    if probe_interval:
+        llm_pool.start_health_checks(get_llm_loop())
+
+def get_llm_backend_stats():
+    """
+    Returns:
+        list[dict]: Per-backend health, outstanding requests, latency EWMA and counters.
+    """
+    return llm_pool.stats()
+
+###################################
+# Purpose-based Model Routes
+###################################
+
+# 호출 목적 -> ModelRoute (모델, max_tokens, temperature, stop, 별도 백엔드)
+llm_routes = {}
+_route_pools = {}
+
+def set_llm_routes(routes, probe_interval=10.0):
+    """
+    Choose the model and output limits per call purpose, e.g. send emotion ratings and
+    summaries to a small model with tight max_tokens (see llm_routes.auxiliary_routes).
+
+    Routes with a base_url get their own backend (server URL or GGUF path), one per URL
+    and model; the others use the main backend pool with the route's model parameters
+    bound to the request.
+
+    Args:
+        routes (dict): {purpose: ModelRoute}; "reflection" also matches "reflection:<type>".
+            An empty dict sends everything to the default model again.
+        probe_interval (float or None): Health probe interval of separate route backends.
+    """
+    global llm_routes, _route_pools
+    for pool in _route_pools.values():
+        pool.stop_health_checks()
+    pools = {}
+    for route in routes.values():
+        key = _route_pool_key(route)
+        if route.base_url and key not in pools:
+            if is_local_model_path(route.base_url):
+                backend = make_local_backend(route.base_url)
+            else:
+                client = make_chat_client(route.base_url, model=route.model)
+                backend = LLMBackend(route.base_url, client, build_chains(client))
+            pools[key] = BackendPool([backend], probe_interval=probe_interval or 10.0)
+            if probe_interval:
+                pools[key].start_health_checks(get_llm_loop())
+    llm_routes = dict(routes)
+    _route_pools = pools
+
+def _route_pool_key(route):
+    # 같은 서버라도 모델이 다르면 다른 클라이언트 (GGUF 경로는 파일 자체가 모델)
+    if route.base_url and is_local_model_path(route.base_url):
+        return route.base_url, None
+    return route.base_url, route.model
+
+def _pool_for(request):
+    route = request["route"]
+    if route is not None and route.base_url:
+        return _route_pools.get(_route_pool_key(route), llm_pool)
+    return llm_pool
+
+###################################
+# Shared Gateway (opt-in)
+###################################
+
+# 설정되면 모든 요청을 같은 머신의 llm_gateway.py 프로세스로 보냄
+# (캐시/배칭/동시성 제한/헤지는 게이트웨이가 모든 프로세스에 대해 한 곳에서 처리)
+llm_gateway_url = None
+
+def use_llm_gateway(url, probe_interval=10.0):
+    """
+    Send every LLM call of this process through a shared llm_gateway.py process.
+
+    The call's purpose and hedge flag travel as X-LLM-Purpose / X-LLM-Hedge headers so the
+    gateway can hedge speech calls and report per-purpose metrics. Also enabled by setting
+    the LLM_GATEWAY_URL environment variable before the connector is imported.
+
+    Args:
+        url (str or None): Gateway base URL, e.g. "http://127.0.0.1:8765/v1"; None goes back
+            to talking to LLM_BASE_URL directly.
+        probe_interval (float or None): Seconds between health probes of the gateway.
+    """
+    global llm_gateway_url
+    llm_gateway_url = url.rstrip("/") if url else None
+    set_llm_backends([url or LLM_BASE_URL], probe_interval=probe_interval)
+
+###################################
+# Hedged Requests
+###################################
+
+# hedge=True로 호출된 요청(대화 발화 생성)에만 적용
+llm_hedger = HedgePolicy()
+
+def set_llm_hedging(quantile=0.95, initial_delay=10.0, min_delay=0.5, max_delay=60.0, **kwargs):
+    """
+    Replace the hedging policy used by calls made with hedge=True.
+    Takes the same arguments as HedgePolicy.
+    """
+    global llm_hedger
+    llm_hedger = HedgePolicy(quantile, initial_delay, min_delay, max_delay, **kwargs)
+
+def get_llm_hedging_stats():
+    """
+    Returns:
+        dict: Hedge counters, win rate of the duplicate and the current hedge delay.
+    """
+    return llm_hedger.stats()
+
+###################################
+# Micro-batching (opt-in)
+###################################
+
+llm_batcher = None
+
+async def _send_one(request, exclude=None, on_sent=None):
+    call = request["call"]
+    async with llm_limiter.slot(lambda waited: _add_queue_wait(call, waited), priority_for(call["purpose"])):
+        async with _pool_for(request).use(exclude or ()) as backend:
+            call["backend"] = backend.base_url
+            if exclude is not None:
+                exclude.append(backend)
+            if on_sent is not None:
+                on_sent()
+            runnable, chain_input = _runnable_for(backend, request)
+            return await runnable.ainvoke(chain_input)
+
+def _batch_priority(requests):
+    # 목적이 섞인 배치는 가장 높은 우선순위 클래스로 (발화가 리플렉션 순서에 묶이지 않도록)
+    ranks = list(llm_limiter.classes)
+    priorities = [priority_for(request["call"]["purpose"]) for request in requests]
+    return min(priorities, key=lambda p: ranks.index(p) if p in ranks else len(ranks))
+
+def set_llm_batching(window_ms=10, max_batch_size=8, batch_sender=None):
+    """
+    Coalesce requests arriving within `window_ms` into batches, or disable batching with window_ms=None.
+
+    Args:
+        window_ms (float or None): How long to hold the first request of a batch.
+        max_batch_size (int): Flush as soon as this many requests are waiting.
+        batch_sender (callable, optional): async fn(list[list[tuple]]) -> list[str] for servers
+            with a batch endpoint. Receives each request's (role, content) messages and returns
+            the completions (str or AIMessage) in order. Without it, the batch is sent as concurrent requests.
+    """
+    global llm_batcher
+    if window_ms is None:
+        llm_batcher = None
+        return
+
+    async def _send_batch(requests):
+        def on_wait(waited):
+            for request in requests:
+                _add_queue_wait(request["call"], waited)
+
+        async with llm_limiter.slot(on_wait, _batch_priority(requests)):
+            return await batch_sender([request["messages"] for request in requests])
+
+    llm_batcher = RequestCoalescer(
+        _send_one,
+        _send_batch if batch_sender is not None else None,
+        window_ms,
+        max_batch_size,
+    )
+
+def get_llm_batching_stats():
+    """
+    Returns:
+        dict or None: Batch counts and mean batch size, or None if batching is off.
+    """
+    return llm_batcher.stats() if llm_batcher is not None else None
+
+###################################
+# Async API
+###################################
+
+def _make_request(kind, chain_input, messages, hedge=False, purpose=None, options=None, semantic_text=None):
+    """
+    Bundle one LLM request as it travels through cache, retries, batching and routing.
+
+    Args:
+        kind (str): Chain kind, see build_chains.
+        chain_input (Any): Input passed to the chain.
+        messages (list[tuple]): Full (role, content) conversation, used as the cache key.
+        hedge (bool): Send a duplicate request if this one is slow.
+        purpose (str, optional): Telemetry tag of the call ("speech", "emotion", ...).
+        options (dict, optional): Extra model parameters for this call (e.g. response_format).
+            The purpose's ModelRoute parameters are added underneath.
+        semantic_text (str, optional): Variable part of the prompt that the semantic cache compares.
+
+    The caller's turn deadline (utils.deadline) is captured here and bounds retries;
+    under a hard deadline the call is cancelled when it passes. The caller's telemetry
+    recorder and cassette are captured too, so the call is recorded (or replayed) for its
+    scenario even when it is sent from a batch or a hedge.
+    """
+    route = route_for(llm_routes, purpose)
+    if route is not None:
+        options = dict(route.options(), **(options or {}))
+    recorder = current_llm_recorder()
+    run = recorder.run if recorder is not None else None
+    call = new_call_record(purpose, (options or {}).get("model", llm_model), run)
+    call["prefix_tokens"] = llm_prefix_tracker.shared_prefix_tokens(messages)
+    headers = {}
+    if llm_gateway_url is not None:
+        # 게이트웨이가 목적별로 헤지/집계하도록 전달하고, 이 프로세스에서는 헤지하지 않음
+        headers = {"X-LLM-Purpose": purpose or "", "X-LLM-Hedge": "1" if hedge else "0"}
+        hedge = False
+    return {
+        "kind": kind,
+        "input": chain_input,
+        "messages": messages,
+        "hedge": hedge,
+        "options": options or {},
+        "headers": headers,
+        "route": route,
+        "deadline": current_deadline(),
+        "recorder": recorder,
+        "cassette": current_llm_cassette(),
+        "call": call,
+        "semantic_text": semantic_text,
+    }
+
+def _runnable_for(backend, request):
+    """
+    Returns:
+        tuple: (runnable, input) for the request on this backend. Requests with per-call
+               options or headers bind them to the client directly and send the full message list.
+    """
+    options = request["options"]
+    if request["headers"]:
+        options = dict(options, extra_headers=request["headers"])
+    if not options:
+        return backend.chains[request["kind"]], request["input"]
+    client = streaming_client(backend.client) if request["kind"].startswith("stream") else backend.client
+    return client.bind(**options), request["messages"]
+
+def _to_response(message):
+    """
+    Convert a chain result (AIMessage, or str from a custom batch sender) to the
+    OpenAI-style response dict the callers read.
+    """
+    if isinstance(message, str):
+        return {"choices": [{"message": {"content": message}}]}
+    response = {"choices": [{"message": {"content": message.content}}]}  # JSON 형식으로 응답 포맷팅
+    prompt_tokens, completion_tokens, cached_tokens = usage_from_message(message)
+    if prompt_tokens is not None or completion_tokens is not None:
+        response["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        if cached_tokens is not None:
+            response["usage"]["prompt_tokens_details"] = {"cached_tokens": cached_tokens}
+    return response
+
+async def _send(request):
+    if request["hedge"]:
+        # 헤지 요청은 배치로 묶지 않고, 두 번째 요청은 첫 요청과 다른 백엔드로 보냄
+        used_backends = []
+        try:
+            return await llm_hedger.run(lambda on_sent: _send_one(request, used_backends, on_sent))
+        finally:
+            request["call"]["hedged"] = request["call"]["hedged"] or len(used_backends) > 1
+    if llm_batcher is None or request["options"] or request["headers"]:
+        return await _send_one(request)  # 요청별 옵션이 있으면 배치 전송기로 보낼 수 없음 (게이트웨이 모드는 게이트웨이가 배치)
+    return await llm_batcher.submit(request)
+
+async def _within_deadline(deadline, coro):
+    """
+    Await a send, cancelling it when a hard turn deadline passes.
+    """
+    if deadline is None or not deadline.hard:
+        return await coro
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        coro.close()
+        raise DeadlineExceeded("Turn deadline passed before the LLM call was sent")
+    try:
+        return await asyncio.wait_for(coro, remaining)
+    except asyncio.TimeoutError:
+        if not deadline.expired():
+            raise
+        raise DeadlineExceeded("LLM call cancelled at the turn deadline") from None
+
+def _check_retry_budget(deadline, delay, error):
+    # 재시도 대기가 턴 마감을 넘기면 재시도하지 않음
+    if deadline is not None and deadline.remaining() < delay:
+        raise DeadlineExceeded(f"No time left in the turn to retry the LLM call: {error}")
+
+async def _ainvoke_with_retry(request, max_retries, retry_delay):
+    deadline = request["deadline"]
+    for attempt in range(max_retries):
+        request["call"]["retries"] = attempt
+        try:
+            return _to_response(await _within_deadline(deadline, _send(request)))
+        except (LLMPreempted, DeadlineExceeded):
+            raise  # 우선순위 스케줄러가 보내기 전에 취소했거나 턴 마감을 넘긴 요청은 재시도하지 않음
+        except Exception as e:
+            if attempt < max_retries - 1:
+                delay = backoff_delay(attempt, retry_delay)
+                _check_retry_budget(deadline, delay, e)
+                await asyncio.sleep(delay)
+            else:
+                raise RuntimeError(f"Error querying LLM after {max_retries} attempts: {e}")
+
+async def _complete(request, max_retries, retry_delay):
+    """
+    Send one request, answering from the response cache when it is enabled,
+    and record the call's telemetry.
+    """
+    call = request["call"]
+    start = time.monotonic()
+    sent = []
+
+    def compute():
+        sent.append(True)
+        return _ainvoke_with_retry(request, max_retries, retry_delay)
+
+    def exact():
+        if llm_cache is None:
+            return compute()
+        key = make_cache_key(llm_model, llm_temperature, request["messages"], request["options"])
+        return llm_cache.get_or_compute(key, compute)
+
+    async def cached():
+        if llm_semantic_cache is not None and llm_semantic_cache.applies(call["purpose"], request["options"]):
+            namespace = request_namespace(llm_model, llm_temperature, call["purpose"], request["messages"],
+                                          request["options"], request["semantic_text"])
+            response, call["semantic_similarity"] = await llm_semantic_cache.aget_or_compute(
+                namespace, request_text(request["messages"], request["semantic_text"]), exact
+            )
+            return response
+        return await exact()
+
+    cassette = request["cassette"]
+    try:
+        if cassette is not None:
+            response = await cassette.aget_or_compute(
+                _cassette_key(request), call["purpose"], request["messages"], request["options"], cached
+            )
+        else:
+            response = await cached()
+    except asyncio.CancelledError:
+        _finish_call(request, start, "cancelled")
+        raise
+    except Exception as e:
+        _finish_call(request, start, e)
+        raise
+
+    call["cached"] = not sent  # 캐시 적중 또는 같은 요청의 진행 중인 호출에 합류
+    if sent and "usage" in response:
+        call["prompt_tokens"] = response["usage"]["prompt_tokens"]
+        call["completion_tokens"] = response["usage"]["completion_tokens"]
+        call["cached_prompt_tokens"] = response["usage"].get("prompt_tokens_details", {}).get("cached_tokens")
+    _finish_call(request, start)
+    return response
+
+async def query_llm_async(prompt, max_retries=5, retry_delay=2, hedge=False, purpose=None):
+    """
+    Async LangChain 기반 LLM 요청 함수. 시스템 프롬프트와 함께 단일 사용자 프롬프트를 전송.
     Args:
         prompt (str): LLM에 보낼 프롬프트.
         max_retries (int): 최대 재시도 횟수.
         retry_delay (int): 재시도 간격(초).
+        hedge (bool): 응답이 최근 지연 백분위보다 늦으면 중복 요청을 보내 먼저 온 응답을 사용.
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적 (예: "speech", "summary").
     Returns:
-        dict: LLM의 응답 JSON.
+        dict: LLM의 응답 JSON. {"choices": [{"message": {"content": ...}}]}
     """
-    async def _query_async():
-        chat_prompt  = ChatPromptTemplate.from_messages([
-                        ("system", system_prompt()),
-                        ("user", "{input}")
-                    ])
-        chain = chat_prompt | llm | StrOutputParser()  # 체인 구성
-        for attempt in range(max_retries):
-            try:
-                # 체인을 통해 invoke 호출
-                response = await chain.ainvoke({"input": prompt})
-                return {"choices": [{"message": {"content": response}}]}  # JSON 형식으로 응답 포맷팅
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                else:
-                    raise RuntimeError(f"Error querying LLM after {max_retries} attempts: {e}")
-
-    # 비동기 실행
-    return asyncio.run(_query_async())
+    messages = [("system", system_prompt()), ("user", prompt)]
+    request = _make_request("prompt", {"input": prompt}, messages, hedge, purpose)
+    return await _on_llm_loop(_complete(request, max_retries, retry_delay))
 
-def query_llm_dict(messages, max_retries=5, retry_delay=2):
+async def query_llm_dict_async(messages, max_retries=5, retry_delay=2, hedge=False, purpose=None,
+                               response_format=None, semantic_text=None):
     """
-    LangChain 기반 LLM 요청 함수. OpenAI 스타일의 messages (list[dict])를 입력받아 처리.
+    Async LangChain 기반 LLM 요청 함수. OpenAI 스타일의 messages (list[dict])를 입력받아 처리.
     Args:
         messages (list[dict]): 예) [
           {"role": "system", "content": "..."},
@@ -101,40 +868,287 @@ def query_llm_dict(messages, max_retries=5, retry_delay=2):
         ]
         max_retries (int): 최대 재시도 횟수.
         retry_delay (int): 재시도 간격(초).
+        hedge (bool): 응답이 최근 지연 백분위보다 늦으면 중복 요청을 보내 먼저 온 응답을 사용.
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적 (예: "emotion").
+        response_format (dict, optional): OpenAI 형식의 응답 형식 (예: JSON 스키마 제약).
+        semantic_text (str, optional): 의미 기반 캐시가 비교할 프롬프트의 가변 부분 (나머지는 정확히 일치해야 함).
+    Returns:
+        dict: LLM의 응답을 OpenAI 호환 JSON 형태로 반환. {"choices": [{"message": {"content": ...}}]}
+    """
+    # messages 리스트를 LangChain 채팅 모델이 받는 (role, content) 튜플 형태로 변환
+    # (템플릿을 거치지 않으므로 content 안의 중괄호도 그대로 전달됨)
+    prompt_list = [(msg["role"], msg["content"]) for msg in messages]
+    options = {"response_format": response_format} if response_format else None
+    request = _make_request("messages", prompt_list, prompt_list, hedge, purpose, options, semantic_text)
+    return await _on_llm_loop(_complete(request, max_retries, retry_delay))
+
+###################################
+# Sync API (기존 호출부 호환용 래퍼)
+###################################
+
+def query_llm(prompt, max_retries=5, retry_delay=2, hedge=False, purpose=None):
+    """
+    LangChain 기반 LLM 요청 함수. JSON 응답을 그대로 반환.
+    Args:
+        prompt (str): LLM에 보낼 프롬프트.
+        max_retries (int): 최대 재시도 횟수.
+        retry_delay (int): 재시도 간격(초).
+        hedge (bool): 느린 응답에 대해 중복 요청을 보낼지 여부.
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적.
+    Returns:
+        dict: LLM의 응답 JSON.
+    """
+    return run_on_llm_loop(query_llm_async(prompt, max_retries, retry_delay, hedge, purpose))
+
+def query_llm_dict(messages, max_retries=5, retry_delay=2, hedge=False, purpose=None, response_format=None,
+                   semantic_text=None):
+    """
+    LangChain 기반 LLM 요청 함수. OpenAI 스타일의 messages (list[dict])를 입력받아 처리.
+    Args:
+        messages (list[dict]): OpenAI 스타일 메시지 리스트.
+        max_retries (int): 최대 재시도 횟수.
+        retry_delay (int): 재시도 간격(초).
+        hedge (bool): 느린 응답에 대해 중복 요청을 보낼지 여부.
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적.
+        response_format (dict, optional): OpenAI 형식의 응답 형식 (예: JSON 스키마 제약).
+        semantic_text (str, optional): 의미 기반 캐시가 비교할 프롬프트의 가변 부분.
     Returns:
         dict: LLM의 응답을 OpenAI 호환 JSON 형태로 반환. {"choices": [{"message": {"content": ...}}]}
     """
+    return run_on_llm_loop(query_llm_dict_async(messages, max_retries, retry_delay, hedge, purpose, response_format,
+                                                semantic_text))
 
-    async def _query_async_dict():
-        # 1) messages 리스트를 LangChain에서 요구하는 (role, content) 튜플 형태로 변환
-        prompt_list = []
-        for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
-            prompt_list.append((role, content))
+###################################
+# Streaming API
+###################################
+
+async def _astream_once(request):
+    call = request["call"]
+    async with llm_limiter.slot(lambda waited: _add_queue_wait(call, waited), priority_for(call["purpose"])):
+        async with _pool_for(request).use() as backend:
+            call["backend"] = backend.base_url
+            runnable, chain_input = _runnable_for(backend, request)
+            async for chunk in runnable.astream(chain_input):
+                yield chunk
+
+async def _stream_within_deadline(deadline, stream):
+    """
+    Yield from a stream, cancelling it when a hard turn deadline passes (queue wait included).
+    """
+    if deadline is None or not deadline.hard:
+        async for item in stream:
+            yield item
+        return
+    try:
+        while True:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise DeadlineExceeded("Turn deadline passed before the LLM stream finished")
+            try:
+                item = await asyncio.wait_for(stream.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                if not deadline.expired():
+                    raise
+                raise DeadlineExceeded("LLM stream cancelled at the turn deadline") from None
+            yield item
+    finally:
+        await stream.aclose()
 
-        # 2) ChatPromptTemplate.from_messages(...)로 PromptTemplate 구성
-        chat_prompt = ChatPromptTemplate.from_messages(prompt_list)
+async def _astream_with_retry(request, max_retries, retry_delay):
+    """
+    Yield completion chunks as they arrive. A failed attempt is only retried if nothing
+    has been yielded yet, so callers never see a partially repeated answer. Like the
+    non-streaming path, a hard turn deadline cancels the stream and retries that would
+    end after the turn deadline are skipped.
+    """
+    call = request["call"]
+    start = time.monotonic()
+    error = None
+    cassette = request["cassette"]
+    record = cassette is not None and cassette.mode == "record"
+    try:
+        if cassette is not None and cassette.mode == "replay":
+            replayed = cassette.lookup(_cassette_key(request), call["purpose"])
+            if replayed is not None:
+                call["cached"] = True
+                call["ttft"] = time.monotonic() - start
+                yield replayed["choices"][0]["message"]["content"]
+                return
+            record = cassette.miss(call["purpose"])
 
-        # 3) 체인 구성 (StrOutputParser는 단순 문자열로 결과를 파싱)
-        chain = chat_prompt | llm | StrOutputParser()
+        if llm_cache is not None:
+            key = make_cache_key(llm_model, llm_temperature, request["messages"], request["options"])
+            cached = await asyncio.to_thread(llm_cache.get, key)  # SQLite는 LLM 루프 밖에서
+            if cached is not None:
+                call["cached"] = True
+                call["ttft"] = time.monotonic() - start
+                if record:
+                    cassette.record(_cassette_key(request), call["purpose"], request["messages"],
+                                        request["options"], cached)
+                yield cached["choices"][0]["message"]["content"]
+                return
 
-        # 4) 비동기 실행
         for attempt in range(max_retries):
+            call["retries"] = attempt
+            chunks = []
             try:
-                # chain.ainvoke에 빈 딕셔너리(또는 필요한 입력) 전달
-                response = await chain.ainvoke({})
-                # OpenAI 호환 JSON 형태로 반환
-                return {
-                    "choices": [
-                        {"message": {"content": response}}
-                    ]
-                }
+                async for chunk in _stream_within_deadline(request["deadline"], _astream_once(request)):
+                    prompt_tokens, completion_tokens, cached_tokens = usage_from_message(chunk)
+                    if prompt_tokens is not None or completion_tokens is not None:
+                        call["prompt_tokens"] = prompt_tokens
+                        call["completion_tokens"] = completion_tokens
+                        call["cached_prompt_tokens"] = cached_tokens
+                    if chunk.content:
+                        if not chunks:
+                            call["ttft"] = time.monotonic() - start
+                        chunks.append(chunk.content)
+                        yield chunk.content
+                break
+            except (LLMPreempted, DeadlineExceeded):
+                raise  # 보내기 전에 취소됐거나 턴 마감을 넘긴 스트림은 재시도하지 않음
             except Exception as e:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                else:
-                    raise RuntimeError(f"Error querying LLM after {max_retries} attempts: {e}")
+                if chunks or attempt >= max_retries - 1:
+                    raise RuntimeError(f"Error streaming from LLM after {attempt + 1} attempts: {e}")
+                delay = backoff_delay(attempt, retry_delay)
+                _check_retry_budget(request["deadline"], delay, e)
+                await asyncio.sleep(delay)
+
+        response = {"choices": [{"message": {"content": "".join(chunks)}}]}
+        if llm_cache is not None:
+            await asyncio.to_thread(llm_cache.put, key, response, time.monotonic() - start)
+        if record:
+            cassette.record(_cassette_key(request), call["purpose"], request["messages"],
+                                request["options"], response)
+    except Exception as e:
+        error = e
+        raise
+    except BaseException:
+        error = "cancelled"  # 소비자가 스트림을 중간에 닫은 경우
+        raise
+    finally:
+        _finish_call(request, start, error)
+
+async def astream_llm(prompt, max_retries=5, retry_delay=2, purpose=None):
+    """
+    Async generator version of query_llm that yields the completion token by token.
+    Args:
+        prompt (str): LLM에 보낼 프롬프트.
+        max_retries (int): 첫 토큰 이전 실패에 대한 최대 재시도 횟수.
+        retry_delay (int): 재시도 간격(초).
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적.
+    Yields:
+        str: 응답 텍스트 조각.
+    """
+    messages = [("system", system_prompt()), ("user", prompt)]
+    request = _make_request("stream", {"input": prompt}, messages, purpose=purpose)
+    async for chunk in _astream_request(request, max_retries, retry_delay):
+        yield chunk
+
+async def astream_llm_dict(messages, max_retries=5, retry_delay=2, purpose=None, response_format=None):
+    """
+    Async generator version of query_llm_dict that yields the completion token by token.
+    Args:
+        messages (list[dict]): OpenAI 스타일 메시지 리스트.
+        max_retries (int): 첫 토큰 이전 실패에 대한 최대 재시도 횟수.
+        retry_delay (int): 재시도 간격(초).
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적.
+        response_format (dict, optional): OpenAI 형식의 응답 형식 (예: JSON 스키마 제약).
+    Yields:
+        str: 응답 텍스트 조각.
+    """
+    prompt_list = [(msg["role"], msg["content"]) for msg in messages]
+    options = {"response_format": response_format} if response_format else None
+    request = _make_request("stream_messages", prompt_list, prompt_list, purpose=purpose, options=options)
+    async for chunk in _astream_request(request, max_retries, retry_delay):
+        yield chunk
+
+def stream_llm(prompt, max_retries=5, retry_delay=2, purpose=None):
+    """
+    Sync generator version of query_llm that yields the completion token by token.
+    Args:
+        prompt (str): LLM에 보낼 프롬프트.
+        max_retries (int): 첫 토큰 이전 실패에 대한 최대 재시도 횟수.
+        retry_delay (int): 재시도 간격(초).
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적.
+    Yields:
+        str: 응답 텍스트 조각.
+    """
+    messages = [("system", system_prompt()), ("user", prompt)]
+    request = _make_request("stream", {"input": prompt}, messages, purpose=purpose)
+    return _stream_request(request, max_retries, retry_delay)
+
+def stream_llm_dict(messages, max_retries=5, retry_delay=2, purpose=None, response_format=None):
+    """
+    Sync generator version of query_llm_dict that yields the completion token by token.
+    Args:
+        messages (list[dict]): OpenAI 스타일 메시지 리스트.
+        max_retries (int): 첫 토큰 이전 실패에 대한 최대 재시도 횟수.
+        retry_delay (int): 재시도 간격(초).
+        purpose (str, optional): 텔레메트리에 기록할 호출 목적.
+        response_format (dict, optional): OpenAI 형식의 응답 형식 (예: JSON 스키마 제약).
+    Yields:
+        str: 응답 텍스트 조각.
+    """
+    prompt_list = [(msg["role"], msg["content"]) for msg in messages]
+    options = {"response_format": response_format} if response_format else None
+    request = _make_request("stream_messages", prompt_list, prompt_list, purpose=purpose, options=options)
+    return _stream_request(request, max_retries, retry_delay)
+
+async def _astream_request(request, max_retries, retry_delay):
+    stream = _astream_with_retry(request, max_retries, retry_delay)
+
+    loop = get_llm_loop()
+    caller_loop = asyncio.get_running_loop()
+    if caller_loop is loop:
+        async for chunk in stream:
+            yield chunk
+        return
+
+    # 다른 이벤트 루프에서 호출된 경우: LLM 루프에서 받아 호출자 루프의 큐로 전달
+    chunks = asyncio.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        _pump_stream(stream, lambda item: caller_loop.call_soon_threadsafe(chunks.put_nowait, item)),
+        loop,
+    )
+    try:
+        while True:
+            kind, value = await chunks.get()
+            if kind == "chunk":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        future.cancel()
+
+def _stream_request(request, max_retries, retry_delay):
+    stream = _astream_with_retry(request, max_retries, retry_delay)
+
+    chunks = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(_pump_stream(stream, chunks.put), get_llm_loop())
+    try:
+        while True:
+            kind, value = chunks.get()
+            if kind == "chunk":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+    finally:
+        # 소비자가 중간에 멈추면(예: 브라우저 연결 종료) LLM 요청도 취소
+        future.cancel()
+
+async def _pump_stream(stream, emit):
+    try:
+        async for chunk in stream:
+            emit(("chunk", chunk))
+        emit(("done", None))
+    except Exception as e:
+        emit(("error", e))
 
-    # 5) asyncio.run(...)으로 비동기 함수 실행
-    return asyncio.run(_query_async_dict())
\ No newline at end of file
+if os.environ.get("LLM_GATEWAY_URL"):
+    use_llm_gateway(os.environ["LLM_GATEWAY_URL"])
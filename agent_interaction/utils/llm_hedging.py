@@ -0,0 +1,115 @@
+# llm_hedging.py
+import asyncio
+import time
+from collections import deque
+
+from .llm_concurrency import percentile
+
+###################################
+# Hedged Requests
+###################################
+
+class HedgePolicy:
+    """
+    Send a duplicate request when the first one is slower than a learned latency percentile.
+
+    The hedge delay is the `quantile` of recent latencies (once `min_samples` are known,
+    `initial_delay` before that), clamped to [min_delay, max_delay]. The first successful
+    answer wins and the other request is cancelled. If one copy fails the other one is
+    still awaited, so a hedge also covers a single failed attempt.
+
+    Must be used from a single event loop (the shared LLM loop).
+    """
+
+    def __init__(self, quantile=0.95, initial_delay=10.0, min_delay=0.5, max_delay=60.0,
+                 min_samples=20, window=200):
+        """
+        Args:
+            quantile (float): Latency percentile after which a hedge is sent (0-1).
+            initial_delay (float): Hedge delay in seconds until enough samples are collected.
+            min_delay (float): Lower bound of the hedge delay.
+            max_delay (float): Upper bound of the hedge delay.
+            min_samples (int): Samples needed before the learned percentile is used.
+            window (int): Number of recent latencies kept.
+        """
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+
+        self.requests = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+
+        self._latencies = deque(maxlen=window)
+
+    def delay(self):
+        """
+        Returns:
+            float: Seconds to wait for the first request before sending a hedge.
+        """
+        if len(self._latencies) < self.min_samples:
+            learned = self.initial_delay
+        else:
+            learned = percentile(self._latencies, self.quantile)
+        return min(self.max_delay, max(self.min_delay, learned))
+
+    async def run(self, attempt):
+        """
+        Run `attempt` and hedge it with a second call if it is slow.
+
+        Args:
+            attempt (callable): async fn(on_sent) -> result. Each call must send its own
+                request and call on_sent() once the request has actually gone out (after any
+                local queueing), which is when the hedge timer starts.
+
+        Returns:
+            Any: The result of whichever attempt finished first successfully.
+        """
+        self.requests += 1
+        sent = asyncio.Event()
+        primary = asyncio.ensure_future(attempt(sent.set))
+        tasks = {primary}
+        try:
+            # 로컬 대기열에서 기다리는 시간은 헤지 타이머에 넣지 않음
+            sent_wait = asyncio.ensure_future(sent.wait())
+            try:
+                await asyncio.wait({primary, sent_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                sent_wait.cancel()
+            start = time.monotonic()
+
+            done, _ = await asyncio.wait({primary}, timeout=self.delay())
+            if not done:
+                self.hedges_sent += 1
+                secondary = asyncio.ensure_future(attempt(lambda: None))
+                tasks.add(secondary)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        self._latencies.append(time.monotonic() - start)
+                        return task.result()
+            return primary.result()  # 둘 다 실패하면 첫 요청의 오류를 전달
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Request and hedge counters plus the current hedge delay.
+        """
+        return {
+            "requests": self.requests,
+            "hedges_sent": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges_sent / self.requests if self.requests else 0.0,
+            "delay": self.delay(),
+        }
@@ -0,0 +1,144 @@
+# llm_local_backend.py
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# LangChain 메시지 타입 -> OpenAI 역할
+_ROLES = {"system": "system", "human": "user", "ai": "assistant", "tool": "tool"}
+
+def is_local_model_path(target):
+    """
+    Returns:
+        bool: True if a backend target names a GGUF model file rather than a server URL.
+    """
+    return target.lower().endswith(".gguf")
+
+def _to_llama_format(response_format):
+    # OpenAI json_schema 형식 -> llama-cpp-python의 json_object + schema (문법 제약 디코딩)
+    if not response_format:
+        return None
+    if response_format.get("type") == "json_schema":
+        return {"type": "json_object", "schema": response_format["json_schema"]["schema"]}
+    return response_format
+
+class LocalLlamaChat(BaseChatModel):
+    """
+    Chat model that runs a quantized GGUF model in-process on the CPU with llama-cpp-python.
+
+    It is a LangChain chat model, so llm_connector builds the same chains on it as on the
+    ChatOpenAI clients and callers get the same response shape, without an HTTP round-trip.
+    The model is loaded on first use. llama.cpp runs one completion at a time per model,
+    so calls are serialized by a lock; the shared concurrency limiter queues the rest.
+    """
+
+    model_path: str
+    n_ctx: int = 4096
+    n_threads: Optional[int] = None
+    n_gpu_layers: int = 0
+    temperature: float = 0.7
+    max_tokens: Optional[int] = 512
+    cache_bytes: int = 256 * 1024 * 1024  # 접두부 KV 캐시 (같은 프롬프트 앞부분은 다시 계산하지 않음)
+    seed: Optional[int] = None
+
+    _llama: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self):
+        return "llama-cpp-local"
+
+    @property
+    def _identifying_params(self):
+        return {"model_path": self.model_path, "n_ctx": self.n_ctx, "temperature": self.temperature}
+
+    def load(self):
+        """
+        Load the model if it is not loaded yet.
+
+        Raises:
+            ImportError: If llama-cpp-python is not installed.
+            FileNotFoundError: If the model file does not exist.
+        """
+        if self._llama is not None:
+            return self._llama
+        try:
+            from llama_cpp import Llama, LlamaRAMCache
+        except ImportError as e:
+            raise ImportError("The local LLM backend needs llama-cpp-python (pip install llama-cpp-python).") from e
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"GGUF model not found: {self.model_path}")
+
+        llama = Llama(
+            model_path=self.model_path,
+            n_ctx=self.n_ctx,
+            n_threads=self.n_threads,
+            n_gpu_layers=self.n_gpu_layers,
+            seed=self.seed if self.seed is not None else -1,
+            verbose=False,
+        )
+        if self.cache_bytes:
+            llama.set_cache(LlamaRAMCache(capacity_bytes=self.cache_bytes))
+        self._llama = llama
+        return llama
+
+    def _completion_args(self, messages, stop, kwargs):
+        kwargs.pop("stream", None)  # 스트리밍 여부는 _stream/_generate 경로가 정함
+        args = {
+            "messages": [{"role": _ROLES.get(m.type, "user"), "content": m.content} for m in messages],
+            "temperature": kwargs.pop("temperature", self.temperature),
+            "max_tokens": kwargs.pop("max_tokens", self.max_tokens),
+            "stop": stop or kwargs.pop("stop", None),
+        }
+        response_format = _to_llama_format(kwargs.pop("response_format", None))
+        if response_format:
+            args["response_format"] = response_format
+        return args
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        llama = self.load()
+        args = self._completion_args(messages, stop, kwargs)
+        with self._lock:
+            result = llama.create_chat_completion(**args)
+
+        usage = result.get("usage") or {}
+        message = AIMessage(
+            content=result["choices"][0]["message"].get("content") or "",
+            usage_metadata={
+                "input_tokens": usage.get("prompt_tokens", 0),
+                "output_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            },
+            response_metadata={"model_name": os.path.basename(self.model_path),
+                               "finish_reason": result["choices"][0].get("finish_reason")},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        llama = self.load()
+        args = self._completion_args(messages, stop, kwargs)
+        completion_tokens = 0
+        with self._lock:
+            for part in llama.create_chat_completion(stream=True, **args):
+                text = part["choices"][0]["delta"].get("content")
+                if not text:
+                    continue
+                completion_tokens += 1  # 스트림 조각 하나가 토큰 하나
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+                if run_manager:
+                    run_manager.on_llm_new_token(text, chunk=chunk)
+                yield chunk
+            # 스트리밍 응답에는 usage가 없으므로 컨텍스트 길이에서 계산
+            prompt_tokens = max(0, getattr(llama, "n_tokens", completion_tokens) - completion_tokens)
+
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }))
@@ -0,0 +1,228 @@
+# llm_router.py
+import asyncio
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+###################################
+# Backend
+###################################
+
+class LLMBackend:
+    """
+    One OpenAI-compatible inference host in the pool, with its client, prebuilt chains
+    and the load/health numbers the router uses to pick between hosts.
+    """
+
+    def __init__(self, base_url, client=None, chains=None):
+        """
+        Args:
+            base_url (str): OpenAI-compatible base URL, e.g. "http://host:11434/v1"
+                (or "local://<model file>" for an in-process model).
+            client (Any, optional): Chat model client bound to this URL.
+            chains (dict, optional): Prebuilt chains by kind ("prompt", "messages", "stream", ...).
+        """
+        self.base_url = base_url.rstrip("/")
+        self.client = client
+        self.chains = chains or {}
+
+        self.outstanding = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.consecutive_failures = 0
+        self.ewma_latency = None
+
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_latency": self.ewma_latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+        }
+
+###################################
+# Backend Pool
+###################################
+
+class BackendPool:
+    """
+    Least-outstanding-requests router over several LLM backends.
+
+    A backend is ejected after `failure_threshold` consecutive failures, a failed health
+    probe, or when its latency EWMA exceeds `slow_factor` times the median of the other
+    healthy backends. Ejected backends are probed again after `eject_seconds` and
+    re-admitted once a probe succeeds.
+
+    Must be used from a single event loop (the shared LLM loop).
+    """
+
+    def __init__(self, backends, failure_threshold=3, eject_seconds=30.0, slow_factor=3.0,
+                 probe_interval=10.0, probe_timeout=5.0, ewma_alpha=0.3):
+        """
+        Args:
+            backends (list[LLMBackend]): Backends to route between.
+            failure_threshold (int): Consecutive failures before a backend is ejected.
+            eject_seconds (float): Minimum time an ejected backend stays out.
+            slow_factor (float): Latency multiple over the pool median that counts as slow.
+            probe_interval (float): Seconds between health probe rounds.
+            probe_timeout (float): Timeout of a single health probe.
+            ewma_alpha (float): Smoothing factor of the latency EWMA.
+        """
+        self.backends = list(backends)
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.slow_factor = slow_factor
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.ewma_alpha = ewma_alpha
+
+        self._health_task = None
+
+    ###################################
+    # Routing
+    ###################################
+
+    def available(self, exclude=()):
+        if self._health_task is None:
+            # 헬스 체크를 돌리지 않을 때는 제외 시간이 지나면 바로 재투입
+            now = time.monotonic()
+            for backend in self.backends:
+                if not backend.healthy and now >= backend.ejected_until:
+                    self.readmit(backend)
+        return [b for b in self.backends if b.healthy and b not in exclude]
+
+    def pick(self, exclude=()):
+        """
+        Choose the healthy backend with the fewest outstanding requests.
+
+        Falls back to ejected backends if no healthy one is left, so requests still
+        have somewhere to go while the whole pool is degraded.
+
+        Args:
+            exclude (Iterable[LLMBackend]): Backends to avoid (e.g. the one a hedge duplicates).
+
+        Returns:
+            LLMBackend: The chosen backend.
+        """
+        candidates = (
+            self.available(exclude)
+            or [b for b in self.backends if b not in exclude]
+            or self.backends
+        )
+        return min(candidates, key=lambda b: (b.outstanding, b.ewma_latency or 0.0))
+
+    @asynccontextmanager
+    async def use(self, exclude=()):
+        """
+        Async context manager that picks a backend and records the outcome of the call.
+
+        Yields:
+            LLMBackend: The backend to send the request to.
+        """
+        backend = self.pick(exclude)
+        backend.outstanding += 1
+        backend.requests += 1
+        start = time.monotonic()
+        try:
+            yield backend
+        except Exception as e:
+            self.record_failure(backend, e)
+            raise
+        else:
+            self.record_success(backend, time.monotonic() - start)
+        finally:
+            backend.outstanding -= 1
+
+    ###################################
+    # Health
+    ###################################
+
+    def record_success(self, backend, latency):
+        backend.consecutive_failures = 0
+        if backend.ewma_latency is None:
+            backend.ewma_latency = latency
+        else:
+            backend.ewma_latency += self.ewma_alpha * (latency - backend.ewma_latency)
+
+        others = [b.ewma_latency for b in self.available((backend,)) if b.ewma_latency is not None]
+        if backend.healthy and others and backend.ewma_latency > self.slow_factor * statistics.median(others):
+            self.eject(backend, f"slow (ewma {backend.ewma_latency:.2f}s)")
+
+    def record_failure(self, backend, exc):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.healthy and backend.consecutive_failures >= self.failure_threshold:
+            self.eject(backend, f"{backend.consecutive_failures} consecutive failures ({exc})")
+
+    def eject(self, backend, reason):
+        backend.healthy = False
+        backend.ejected_until = time.monotonic() + self.eject_seconds
+        backend.ejections += 1
+        print(f"LLM backend ejected: {backend.base_url} - {reason}")
+
+    def readmit(self, backend):
+        backend.healthy = True
+        backend.consecutive_failures = 0
+        backend.ewma_latency = None  # 과거의 느린 기록 때문에 바로 다시 제외되지 않도록
+        print(f"LLM backend re-admitted: {backend.base_url}")
+
+    async def probe(self, backend, client):
+        """
+        Check that a backend answers GET {base_url}/models.
+
+        Returns:
+            bool: True if the backend responded with a 2xx status.
+        """
+        if backend.base_url.startswith("local://"):
+            return True  # 프로세스 내 백엔드는 네트워크 확인이 필요 없음
+        try:
+            response = await client.get(f"{backend.base_url}/models", timeout=self.probe_timeout)
+            return response.status_code < 300
+        except Exception:
+            return False
+
+    async def probe_all(self, client):
+        """
+        Run one round of health probes and eject or re-admit backends accordingly.
+        """
+        results = await asyncio.gather(*(self.probe(b, client) for b in self.backends))
+        now = time.monotonic()
+        for backend, ok in zip(self.backends, results):
+            if backend.healthy and not ok:
+                self.eject(backend, "health probe failed")
+            elif not backend.healthy and ok and now >= backend.ejected_until:
+                self.readmit(backend)
+
+    async def _health_loop(self):
+        import httpx
+
+        async with httpx.AsyncClient() as client:
+            while True:
+                await self.probe_all(client)
+                await asyncio.sleep(self.probe_interval)
+
+    def start_health_checks(self, loop):
+        """
+        Start periodic health probes on the given event loop (no-op if already running).
+        """
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.run_coroutine_threadsafe(self._health_loop(), loop)
+
+    def stop_health_checks(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    def stats(self):
+        """
+        Returns:
+            list[dict]: Per-backend load and health numbers.
+        """
+        return [b.stats() for b in self.backends]
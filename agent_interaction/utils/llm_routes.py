@@ -0,0 +1,78 @@
+# llm_routes.py
+
+###################################
+# Model Routes
+###################################
+
+class ModelRoute:
+    """
+    How calls of one purpose are sent: which model, where, and with which output limits.
+    Fields left as None keep the connector's defaults.
+    """
+
+    def __init__(self, model=None, max_tokens=None, temperature=None, stop=None, base_url=None):
+        """
+        Args:
+            model (str, optional): Model name sent with the request (e.g. a small model on the same Ollama host).
+            max_tokens (int, optional): Output token limit.
+            temperature (float, optional): Sampling temperature.
+            stop (list[str], optional): Stop sequences.
+            base_url (str, optional): Separate backend for this route, a server URL or a GGUF path.
+        """
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.stop = list(stop) if stop else None
+        self.base_url = base_url
+
+    def options(self):
+        """
+        Returns:
+            dict: Model parameters to bind for this route's calls.
+        """
+        options = {}
+        if self.model is not None:
+            options["model"] = self.model
+        if self.max_tokens is not None:
+            options["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            options["temperature"] = self.temperature
+        if self.stop:
+            options["stop"] = self.stop
+        return options
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v is not None)
+        return f"ModelRoute({fields})"
+
+def auxiliary_routes(model=None, base_url=None):
+    """
+    Routes that send the auxiliary calls to a smaller model with tight output limits,
+    sized for what each caller parses:
+      - emotion: 8 numbers (or a small JSON object with 8 integers)
+      - summary: one or two sentences
+      - reflection:*: a short paragraph
+      - repair:*: a reformatted reply
+
+    Args:
+        model (str, optional): Small model name, e.g. "llama3.2:1b".
+        base_url (str, optional): Backend serving it, if not the main one.
+
+    Returns:
+        dict: {purpose: ModelRoute}
+    """
+    return {
+        "emotion": ModelRoute(model, max_tokens=64, temperature=0.3, base_url=base_url),
+        "summary": ModelRoute(model, max_tokens=96, stop=["\n\n"], base_url=base_url),
+        "reflection": ModelRoute(model, max_tokens=160, base_url=base_url),
+        "repair": ModelRoute(model, max_tokens=256, temperature=0.0, base_url=base_url),
+    }
+
+def route_for(routes, purpose):
+    """
+    Returns:
+        ModelRoute or None: The route of a purpose ("reflection:lesson" falls back to "reflection").
+    """
+    if not purpose or not routes:
+        return None
+    return routes.get(purpose) or routes.get(purpose.split(":", 1)[0])
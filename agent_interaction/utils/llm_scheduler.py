@@ -0,0 +1,217 @@
+# llm_scheduler.py
+import asyncio
+import time
+from collections import deque
+
+from .llm_concurrency import AdaptiveConcurrencyLimiter, percentile
+
+###################################
+# Priority Classes
+###################################
+
+class PriorityClass:
+    """
+    One queue of the scheduler.
+    """
+
+    def __init__(self, name, weight, max_queue_time=None, preemptible=False):
+        """
+        Args:
+            name (str): Class name ("interactive", "normal", "background").
+            weight (float): Share of dispatches while several classes are waiting.
+            max_queue_time (float, optional): Queue time bound in seconds. Waiters past it are
+                served next, or cancelled before send if the class is preemptible.
+            preemptible (bool): Waiters may be cancelled before they are sent.
+        """
+        self.name = name
+        self.weight = weight
+        self.max_queue_time = max_queue_time
+        self.preemptible = preemptible
+
+        self.waiters = deque()  # (future, enqueued_at)
+        self.pass_value = 0.0  # stride scheduling: 다음 차례의 가상 시각
+
+        self.served = 0
+        self.preempted = 0
+        self.waits = deque(maxlen=500)
+
+    def head(self):
+        while self.waiters and self.waiters[0][0].done():
+            self.waiters.popleft()
+        return self.waiters[0] if self.waiters else None
+
+DEFAULT_CLASSES = (
+    ("interactive", 8.0, None, False),   # 대화 발화 생성 (사용자에게 보이는 지연)
+    ("normal", 3.0, 30.0, False),        # 감정 측정, 요약, 형식 수정
+    ("background", 1.0, 120.0, True),    # 리플렉션 (늦어지면 이번 회차는 건너뜀)
+)
+
+# 호출 목적 -> 우선순위 클래스 (없는 목적은 "normal")
+PRIORITY_BY_PURPOSE = {
+    "speech": "interactive",
+    "reflection": "background",
+}
+
+def priority_for(purpose):
+    """
+    Returns:
+        str: Priority class of a call purpose ("reflection:lesson" uses the "reflection" entry).
+    """
+    if not purpose:
+        return "normal"
+    return PRIORITY_BY_PURPOSE.get(purpose) or PRIORITY_BY_PURPOSE.get(purpose.split(":", 1)[0], "normal")
+
+class LLMPreempted(RuntimeError):
+    """
+    Raised in a queued call that was cancelled before being sent to make room for
+    higher-priority work. It is not retried.
+    """
+
+###################################
+# Scheduler
+###################################
+
+class PriorityConcurrencyLimiter(AdaptiveConcurrencyLimiter):
+    """
+    AdaptiveConcurrencyLimiter whose queue serves priority classes by weighted fair queuing
+    instead of FIFO.
+
+    - Stride scheduling: each dispatch advances its class by 1/weight; the waiting class
+      that is furthest behind goes next, so with weights 8/3/1 and all queues full the
+      classes get 8:3:1 of the slots, and an idle class does not bank credit.
+    - `reserved` slots are only given to the first class, so speech never waits behind
+      calls that background work already has in flight.
+    - Waiters past their class's max_queue_time are served before everything else, or,
+      in preemptible classes, cancelled before send with LLMPreempted.
+
+    The AIMD limit works as before. Must be used from a single event loop.
+    """
+
+    def __init__(self, *args, classes=DEFAULT_CLASSES, reserved=1, **kwargs):
+        """
+        Args:
+            *args, **kwargs: AdaptiveConcurrencyLimiter arguments.
+            classes (Iterable[tuple]): (name, weight, max_queue_time, preemptible), highest
+                priority first.
+            reserved (int): Slots kept free for the highest-priority class.
+        """
+        super().__init__(*args, **kwargs)
+        self.classes = {name: PriorityClass(name, *rest) for name, *rest in classes}
+        self.top = next(iter(self.classes))
+        self.reserved = reserved
+        self._virtual_time = 0.0
+
+    def _class(self, priority):
+        return self.classes.get(priority) or self.classes.get("normal") or self.classes[self.top]
+
+    def _room_for(self, cls):
+        if cls.name == self.top:
+            return self.in_flight < self.limit
+        # 예약 슬롯은 최상위 클래스만 사용 (한도가 작을 때도 하나는 남김)
+        return self.in_flight < max(1, self.limit - self.reserved)
+
+    ###################################
+    # Queue discipline
+    ###################################
+
+    def _can_start(self, priority):
+        cls = self._class(priority)
+        if not self._room_for(cls):
+            return False
+        # 같은 클래스나 더 높은 클래스가 기다리고 있으면 순서를 지킴
+        for other in self.classes.values():
+            if other.head() is not None:
+                return False
+            if other is cls:
+                break
+        self._charge(cls, 0.0)
+        return True
+
+    def _enqueue(self, future, priority=None):
+        cls = self._class(priority)
+        if cls.head() is None:
+            cls.pass_value = max(cls.pass_value, self._virtual_time)
+        cls.waiters.append((future, time.monotonic()))
+        if cls.preemptible and cls.max_queue_time is not None:
+            asyncio.get_running_loop().call_later(cls.max_queue_time, self._expire, cls, future)
+
+    def _discard(self, future):
+        for cls in self.classes.values():
+            for entry in cls.waiters:
+                if entry[0] is future:
+                    cls.waiters.remove(entry)
+                    return
+
+    def _expire(self, cls, future):
+        if not future.done():
+            self._discard(future)
+            cls.preempted += 1
+            future.set_exception(LLMPreempted(
+                f"{cls.name} LLM call cancelled after {cls.max_queue_time:.0f}s in the queue"
+            ))
+
+    def preempt(self, priority="background"):
+        """
+        Cancel every queued, not yet sent call of a preemptible class.
+
+        Returns:
+            int: Number of cancelled calls.
+        """
+        cls = self.classes[priority]
+        if not cls.preemptible:
+            return 0
+        cancelled = 0
+        while cls.head() is not None:
+            future, _ = cls.waiters.popleft()
+            cls.preempted += 1
+            cancelled += 1
+            future.set_exception(LLMPreempted(f"{cls.name} LLM call preempted"))
+        return cancelled
+
+    def _charge(self, cls, waited):
+        self._virtual_time = max(self._virtual_time, cls.pass_value)
+        cls.pass_value = max(cls.pass_value, self._virtual_time) + 1.0 / cls.weight
+        cls.served += 1
+        cls.waits.append(waited)
+
+    def _next_waiter(self):
+        now = time.monotonic()
+        candidates = [(cls, cls.head()) for cls in self.classes.values()]
+        candidates = [(cls, head) for cls, head in candidates if head is not None and self._room_for(cls)]
+        if not candidates:
+            return None
+
+        # 대기 시간 상한을 넘긴 요청이 먼저 (가장 오래 기다린 것부터)
+        overdue = [(cls, head) for cls, head in candidates
+                   if cls.max_queue_time is not None and now - head[1] >= cls.max_queue_time]
+        if overdue:
+            cls, head = min(overdue, key=lambda item: item[1][1])
+        else:
+            cls, head = min(candidates, key=lambda item: item[0].pass_value)
+
+        cls.waiters.popleft()
+        self._charge(cls, now - head[1])
+        return head[0]
+
+    def queue_depth(self):
+        return sum(1 for cls in self.classes.values() for future, _ in cls.waiters if not future.done())
+
+    def stats(self):
+        """
+        Returns:
+            dict: Limiter stats plus, per class, queue depth, dispatches, preemptions and waits.
+        """
+        stats = super().stats()
+        stats["reserved"] = self.reserved
+        stats["classes"] = {
+            name: {
+                "queued": sum(1 for future, _ in cls.waiters if not future.done()),
+                "served": cls.served,
+                "preempted": cls.preempted,
+                "wait_p50": percentile(cls.waits, 0.5),
+                "wait_p95": percentile(cls.waits, 0.95),
+                "wait_max": max(cls.waits) if cls.waits else None,
+            }
+            for name, cls in self.classes.items()
+        }
+        return stats
@@ -0,0 +1,258 @@
+# llm_semantic_cache.py
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .llm_concurrency import percentile
+
+###################################
+# Embedding
+###################################
+
+# all-MiniLM-L6-v2는 256 word-piece 이후를 잘라내므로, 긴 텍스트는 나눠서 임베딩한 뒤 평균
+EMBED_CHUNK_WORDS = 150
+
+def default_embed(text):
+    """
+    Embed text with the all-MiniLM-L6-v2 model that importance_scoring already loads.
+    Texts longer than EMBED_CHUNK_WORDS words are embedded in chunks and mean-pooled,
+    so their end is not cut off by the model's input limit.
+
+    Returns:
+        numpy.ndarray: Unit-length float32 vector.
+    """
+    from .importance_scoring import model  # 처음 사용할 때만 모델을 불러옴
+    words = text.split()
+    chunks = [" ".join(words[i:i + EMBED_CHUNK_WORDS]) for i in range(0, len(words), EMBED_CHUNK_WORDS)]
+    if len(chunks) <= 1:
+        return np.asarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
+    vector = np.mean(model.encode(chunks, normalize_embeddings=True), axis=0)
+    return np.asarray(vector / np.linalg.norm(vector), dtype=np.float32)
+
+def request_namespace(model, temperature, purpose, messages, options=None, semantic_text=None):
+    """
+    Requests can only share answers inside one namespace: same model, sampling settings,
+    purpose, system prompt and response options. Only the rest of the prompt is compared
+    by similarity.
+
+    With `semantic_text`, only that variable part is compared; the rest of the prompt
+    (template, instructions, question order) must match exactly and goes into the namespace.
+
+    Returns:
+        str: Hex digest identifying the namespace.
+    """
+    system = [content for role, content in messages if role == "system"]
+    fixed = None
+    if semantic_text:
+        fixed = [(role, content.replace(semantic_text, "{semantic_text}", 1))
+                 for role, content in messages if role != "system"]
+    canonical = json.dumps({"model": model, "temperature": temperature, "purpose": purpose,
+                            "system": system, "fixed": fixed, "options": options or {}},
+                           ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def request_text(messages, semantic_text=None):
+    """
+    Returns:
+        str: The text that is embedded: `semantic_text` if given, otherwise the non-system
+             part of the request.
+    """
+    if semantic_text:
+        return semantic_text
+    return "\n".join(f"{role}: {content}" for role, content in messages if role != "system")
+
+###################################
+# Semantic Response Cache
+###################################
+
+class SemanticResponseCache:
+    """
+    Opt-in LLM response cache that reuses the answer of the most similar earlier prompt.
+
+    Meant for low-stakes calls (summaries, reflections, structured emotion ratings) whose
+    prompts differ between runs only by timestamps or a slightly different memory. Entries live in SQLite;
+    each namespace keeps its unit vectors in a float32 matrix, so a lookup is one
+    matrix-vector product (a few thousand entries take well under a millisecond).
+    """
+
+    def __init__(self, path, threshold=0.95, purposes=("summary", "reflection"),
+                 max_entries=5000, embed=None, structured_purposes=("emotion",)):
+        """
+        Args:
+            path (str): SQLite file to store the entries in.
+            threshold (float): Minimum cosine similarity for reusing an answer.
+            purposes (Iterable[str]): Call purposes that may use the cache; "reflection"
+                also covers "reflection:<type>".
+            max_entries (int): Entries kept before the least recently used are dropped.
+            embed (callable, optional): fn(str) -> unit vector; defaults to all-MiniLM-L6-v2.
+            structured_purposes (Iterable[str]): Purposes that may use the cache only for
+                requests with a response_format. Plain-text emotion ratings are matched to
+                emotions by position, so a reused answer is only safe when it is keyed by name.
+        """
+        self.path = path
+        self.threshold = threshold
+        self.purposes = set(purposes)
+        self.structured_purposes = set(structured_purposes)
+        self.max_entries = max_entries
+        self.embed = embed or default_embed
+
+        self.hits = 0
+        self.misses = 0
+        self.hit_similarities = deque(maxlen=1000)
+        self.miss_similarities = deque(maxlen=1000)  # 임계값 조정용: 적중하지 못한 요청의 최고 유사도
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_semantic_cache_ns ON semantic_cache(namespace)")
+        self._conn.commit()
+        self._index = {}  # namespace -> (ids, matrix)
+        self._load_index()
+
+    def _load_index(self):
+        rows = self._conn.execute("SELECT id, namespace, embedding FROM semantic_cache ORDER BY id").fetchall()
+        grouped = {}
+        for entry_id, namespace, blob in rows:
+            grouped.setdefault(namespace, []).append((entry_id, np.frombuffer(blob, dtype=np.float32)))
+        for namespace, entries in grouped.items():
+            self._index[namespace] = ([e[0] for e in entries], np.vstack([e[1] for e in entries]))
+
+    def applies(self, purpose, options=None):
+        """
+        Args:
+            purpose (str or None): Call purpose.
+            options (dict, optional): Model options of the call (checked for response_format).
+
+        Returns:
+            bool: True if calls with this purpose may be answered from the cache.
+        """
+        if not purpose:
+            return False
+        base = purpose.split(":", 1)[0]
+        if purpose in self.purposes or base in self.purposes:
+            return True
+        return base in self.structured_purposes and bool((options or {}).get("response_format"))
+
+    def lookup(self, namespace, text):
+        """
+        Find the most similar cached prompt of the namespace.
+
+        Returns:
+            tuple: (response dict or None, best similarity or None, embedding of `text`).
+        """
+        vector = self.embed(text)
+        with self._lock:
+            ids, matrix = self._index.get(namespace, ([], None))
+            if matrix is None:
+                self.misses += 1
+                return None, None, vector
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                self.miss_similarities.append(similarity)
+                return None, similarity, vector
+            entry_id = ids[best]
+            row = self._conn.execute("SELECT response FROM semantic_cache WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None, similarity, vector
+            self._conn.execute("UPDATE semantic_cache SET last_used = ?, hits = hits + 1 WHERE id = ?",
+                               (time.time(), entry_id))
+            self._conn.commit()
+            self.hits += 1
+            self.hit_similarities.append(similarity)
+        return json.loads(row[0]), similarity, vector
+
+    def put(self, namespace, text, vector, response):
+        """
+        Store an answer under its prompt embedding.
+        """
+        now = time.time()
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            cursor = self._conn.execute("""
+                INSERT INTO semantic_cache (namespace, prompt, embedding, response, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (namespace, text, vector.tobytes(), json.dumps(response, ensure_ascii=False), now, now))
+            ids, matrix = self._index.get(namespace, ([], None))
+            matrix = vector[None, :] if matrix is None else np.vstack([matrix, vector])
+            self._index[namespace] = (ids + [cursor.lastrowid], matrix)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        stale = [row[0] for row in self._conn.execute(
+            "SELECT id FROM semantic_cache ORDER BY last_used, id LIMIT ?", (count - self.max_entries,)
+        )]
+        self._conn.executemany("DELETE FROM semantic_cache WHERE id = ?", [(i,) for i in stale])
+        stale = set(stale)
+        for namespace, (ids, matrix) in list(self._index.items()):
+            keep = [i for i, entry_id in enumerate(ids) if entry_id not in stale]
+            if len(keep) == len(ids):
+                continue
+            if keep:
+                self._index[namespace] = ([ids[i] for i in keep], matrix[keep])
+            else:
+                del self._index[namespace]
+
+    async def aget_or_compute(self, namespace, text, compute):
+        """
+        Answer from the cache if a similar enough prompt is stored, otherwise await
+        `compute()` and store its result. Embedding runs in a worker thread.
+
+        Returns:
+            tuple: (response, similarity) where similarity is set only for cache hits.
+        """
+        loop = asyncio.get_running_loop()
+        response, similarity, vector = await loop.run_in_executor(None, self.lookup, namespace, text)
+        if response is not None:
+            return response, similarity
+        response = await compute()
+        await loop.run_in_executor(None, self.put, namespace, text, vector, response)
+        return response, None
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit rate, similarity of hits, and the similarity distribution of misses
+                  (how many more calls a lower threshold would have saved).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = sum(len(ids) for ids, _ in self._index.values())
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "threshold": self.threshold,
+                "entries": entries,
+                "hit_similarity_p50": percentile(self.hit_similarities, 0.5),
+                "miss_similarity_p50": percentile(self.miss_similarities, 0.5),
+                "miss_similarity_p95": percentile(self.miss_similarities, 0.95),
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,369 @@
+# llm_telemetry.py
+import json
+import os
+import queue
+import sqlite3
+import statistics
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from .llm_concurrency import percentile
+
+###################################
+# Call Records
+###################################
+
+CALL_FIELDS = [
+    "run", "timestamp", "purpose", "model", "backend", "prompt_tokens", "completion_tokens",
+    "cached_prompt_tokens", "prefix_tokens", "queue_wait", "ttft", "latency", "retries",
+    "cached", "semantic_similarity", "hedged", "error",
+]
+
+def new_call_record(purpose, model, run=None):
+    """
+    Start the telemetry record of one LLM call. The connector fills it in as the call
+    goes through the cache, limiter, router and retries.
+
+    Args:
+        purpose (str or None): What the call is for, e.g. "speech", "emotion", "summary", "reflection:lesson".
+        model (str): Model name.
+        run (str, optional): Label of the run (scenario DB name) the call belongs to.
+
+    Returns:
+        dict: Record with every field of CALL_FIELDS.
+    """
+    return {
+        "run": run,
+        "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+        "purpose": purpose or "unspecified",
+        "model": model,
+        "backend": None,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "cached_prompt_tokens": None,
+        "prefix_tokens": 0,
+        "queue_wait": 0.0,
+        "ttft": None,
+        "latency": None,
+        "retries": 0,
+        "cached": False,
+        "semantic_similarity": None,  # 의미 기반 캐시로 답한 경우 가장 가까운 프롬프트와의 유사도
+        "hedged": False,
+        "error": None,
+    }
+
+def usage_from_message(message):
+    """
+    Read token counts from a LangChain AIMessage/AIMessageChunk without importing LangChain.
+
+    Returns:
+        tuple: (prompt_tokens, completion_tokens, cached_prompt_tokens), None where the
+               server did not report a number. Cached prompt tokens are the part of the
+               prompt the server served from its prefix/KV cache.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        return usage.get("input_tokens"), usage.get("output_tokens"), cached
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens"), cached
+
+def estimate_tokens(text):
+    # 토크나이저 없이 쓰는 대략적인 추정치 (영어 기준 약 4글자 = 1토큰)
+    return len(text) // 4
+
+class PrefixTracker:
+    """
+    Estimate how much of a chat request repeats the previous request of the same
+    conversation, i.e. the prefix a server with prompt caching would not re-process.
+
+    Conversations are told apart by their first two messages (system prompt and who is
+    talking). Only whole leading messages that are identical count as shared.
+    """
+
+    def __init__(self, max_conversations=256):
+        self.max_conversations = max_conversations
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+
+    def shared_prefix_tokens(self, messages):
+        """
+        Args:
+            messages (list[tuple]): (role, content) messages of the new request.
+
+        Returns:
+            int: Estimated tokens shared with the previous request of the conversation.
+        """
+        key = tuple(messages[:2])
+        with self._lock:
+            previous = self._last.pop(key, None)
+            self._last[key] = list(messages)
+            while len(self._last) > self.max_conversations:
+                self._last.popitem(last=False)
+        if previous is None:
+            return 0
+        shared = 0
+        for old, new in zip(previous, messages[:-1]):  # 마지막 메시지는 항상 새 내용
+            if old != new:
+                break
+            shared += estimate_tokens(new[1])
+        return shared
+
+###################################
+# Sinks
+###################################
+
+class SQLiteCallSink:
+    """
+    Stores call records in an `llm_calls` table, normally inside the scenario DB of the run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with sqlite3.connect(path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run TEXT,
+                    timestamp TEXT,
+                    purpose TEXT,
+                    model TEXT,
+                    backend TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    cached_prompt_tokens INTEGER,
+                    prefix_tokens INTEGER,
+                    queue_wait REAL,
+                    ttft REAL,
+                    latency REAL,
+                    retries INTEGER,
+                    cached INTEGER,
+                    semantic_similarity REAL,
+                    hedged INTEGER,
+                    error TEXT
+                )
+            """)
+            # 이전 버전에서 만든 테이블에 새 컬럼 추가
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_calls)")}
+            for column, kind in (("cached_prompt_tokens", "INTEGER"), ("prefix_tokens", "INTEGER"),
+                                 ("semantic_similarity", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE llm_calls ADD COLUMN {column} {kind}")
+
+    def write(self, records):
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                f"INSERT INTO llm_calls ({', '.join(CALL_FIELDS)}) VALUES ({', '.join('?' * len(CALL_FIELDS))})",
+                [[record[field] for field in CALL_FIELDS] for record in records],
+            )
+
+class JSONLCallSink:
+    """
+    Appends call records to a JSON Lines sidecar file, one record per line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+class CallRecorder:
+    """
+    Hands finished call records to a sink on a background thread, so the LLM event loop
+    never waits on disk I/O. Records are written in small batches.
+    """
+
+    def __init__(self, path, run=None):
+        """
+        Args:
+            path (str): "*.jsonl" for a sidecar file, anything else is used as an SQLite DB.
+            run (str, optional): Run label stored with every record; defaults to the file name.
+        """
+        self.path = path
+        self.run = run or os.path.splitext(os.path.basename(path))[0]
+        self.sink = JSONLCallSink(path) if path.endswith(".jsonl") else SQLiteCallSink(path)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer, name="llm-telemetry", daemon=True)
+        self._thread.start()
+
+    def record(self, record):
+        self._queue.put(record)
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not None]
+            try:
+                if records:
+                    self.sink.write(records)
+            except Exception as e:
+                print(f"Error writing LLM telemetry to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return  # close() 신호
+
+    def flush(self):
+        """
+        Block until every record handed over so far is written.
+        """
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+###################################
+# Reports
+###################################
+
+def load_llm_calls(path):
+    """
+    Load call records from a scenario DB (llm_calls table) or a JSONL sidecar.
+
+    Returns:
+        list[dict]: Records in insertion order.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return [{field: record.get(field) for field in CALL_FIELDS} for record in records]
+    with sqlite3.connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute("SELECT * FROM llm_calls ORDER BY id").fetchall()
+        except sqlite3.OperationalError:
+            return []  # 텔레메트리 없이 생성된 DB
+    return [{field: dict(row).get(field) for field in CALL_FIELDS} for row in rows]
+
+def _reused_tokens(record):
+    # 서버가 캐시 적중 토큰을 알려주면 그 값을, 아니면 클라이언트 쪽 공통 접두부 추정치를 사용
+    if record.get("cached_prompt_tokens") is not None:
+        return record["cached_prompt_tokens"]
+    return record.get("prefix_tokens") or 0
+
+def prompt_eval_seconds_per_token(records):
+    """
+    Estimate prompt processing speed from streamed calls without prefix reuse:
+    (time to first token - queue wait) / prompt tokens, median over calls.
+
+    Returns:
+        float or None: Seconds per prompt token, or None without suitable calls.
+    """
+    rates = [
+        (r["ttft"] - (r["queue_wait"] or 0.0)) / r["prompt_tokens"]
+        for r in records
+        if r["ttft"] is not None and r["prompt_tokens"] and not r["cached"] and not _reused_tokens(r)
+    ]
+    return statistics.median(rates) if rates else None
+
+def _summarize_group(records, total_latency, seconds_per_token=None):
+    latencies = [r["latency"] for r in records if r["latency"] is not None]
+    ttfts = [r["ttft"] for r in records if r["ttft"] is not None]
+    latency_sum = sum(latencies)
+    reused = sum(_reused_tokens(r) for r in records)
+    saved = reused * seconds_per_token if seconds_per_token is not None else None
+    return {
+        "calls": len(records),
+        "latency_total": latency_sum,
+        "latency_share": latency_sum / total_latency if total_latency else 0.0,
+        "latency_mean": statistics.mean(latencies) if latencies else None,
+        "latency_p95": percentile(latencies, 0.95),
+        "queue_wait_mean": statistics.mean(r["queue_wait"] or 0.0 for r in records) if records else None,
+        "ttft_mean": statistics.mean(ttfts) if ttfts else None,
+        "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in records),
+        "completion_tokens": sum(r["completion_tokens"] or 0 for r in records),
+        "reused_prompt_tokens": reused,
+        "prompt_eval_saved": saved,
+        "prompt_eval_saved_per_call": saved / len(records) if saved is not None and records else None,
+        "retries": sum(r["retries"] or 0 for r in records),
+        "cached": sum(1 for r in records if r["cached"]),
+        "hedged": sum(1 for r in records if r["hedged"]),
+        "errors": sum(1 for r in records if r["error"]),
+    }
+
+def summarize_llm_calls(records, seconds_per_token=None):
+    """
+    Aggregate call records per run and per purpose.
+
+    Args:
+        records (list[dict]): Call records.
+        seconds_per_token (float, optional): Prompt processing time per token, used to turn
+            reused prefix tokens into saved seconds. Estimated from streamed calls if omitted.
+
+    Returns:
+        dict: {run: {"total": {...}, "by_purpose": {purpose: {...}}}}, purposes sorted by
+              total latency, largest first.
+    """
+    runs = {}
+    for record in records:
+        runs.setdefault(record["run"], []).append(record)
+
+    summary = {}
+    for run, run_records in runs.items():
+        total_latency = sum(r["latency"] or 0.0 for r in run_records)
+        rate = seconds_per_token if seconds_per_token is not None else prompt_eval_seconds_per_token(run_records)
+        purposes = {}
+        for record in run_records:
+            purposes.setdefault(record["purpose"], []).append(record)
+        by_purpose = {
+            purpose: _summarize_group(group, total_latency, rate)
+            for purpose, group in purposes.items()
+        }
+        summary[run] = {
+            "total": _summarize_group(run_records, total_latency, rate),
+            "by_purpose": dict(sorted(by_purpose.items(), key=lambda item: -item[1]["latency_total"])),
+        }
+    return summary
+
+def format_llm_report(summary):
+    """
+    Render summarize_llm_calls() output as a plain-text table.
+    """
+    def fmt(value, spec=".2f"):
+        return "-" if value is None else format(value, spec)
+
+    lines = []
+    for run, data in summary.items():
+        lines.append(f"=== LLM calls: {run} ===")
+        lines.append(f"{'purpose':22s} {'calls':>6s} {'time(s)':>9s} {'share':>6s} {'mean':>7s} {'p95':>7s} "
+                     f"{'queue':>7s} {'ttft':>7s} {'in_tok':>8s} {'out_tok':>8s} {'reused':>8s} {'saved/call':>10s} "
+                     f"{'retry':>6s} {'cache':>6s} {'err':>4s}")
+        rows = list(data["by_purpose"].items()) + [("TOTAL", data["total"])]
+        for purpose, s in rows:
+            lines.append(
+                f"{purpose:22s} {s['calls']:6d} {s['latency_total']:9.2f} {s['latency_share']:6.0%} "
+                f"{fmt(s['latency_mean']):>7s} {fmt(s['latency_p95']):>7s} {fmt(s['queue_wait_mean']):>7s} "
+                f"{fmt(s['ttft_mean']):>7s} {s['prompt_tokens']:8d} {s['completion_tokens']:8d} "
+                f"{s['reused_prompt_tokens']:8d} {fmt(s['prompt_eval_saved_per_call'], '.3f'):>10s} "
+                f"{s['retries']:6d} {s['cached']:6d} {s['errors']:4d}"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    # 사용법: python -m utils.llm_telemetry results/runs_xxx/scenario_1.db [more.db|calls.jsonl ...]
+    #         [--prompt-eval-tps 800]  (재사용된 접두부 토큰을 절약 시간으로 환산할 때 사용할 처리 속도)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize recorded LLM calls")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--prompt-eval-tps", type=float, default=None)
+    args = parser.parse_args()
+
+    all_records = []
+    for path in args.paths:
+        all_records.extend(load_llm_calls(path))
+    rate = 1.0 / args.prompt_eval_tps if args.prompt_eval_tps else None
+    print(format_llm_report(summarize_llm_calls(all_records, rate)))
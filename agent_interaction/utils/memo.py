@@ -10,9 +10,23 @@ from .memory_management import (
     debug_log,
     retrieve_reflections_from_db
 )
-from .llm_connector import query_llm  # LLM API 호출 함수
-from .prompt_templates import c_onversation_prompt
-from .general_methods import parse_llm_response
+from .llm_connector import query_llm, query_llm_dict, stream_llm, stream_llm_dict  # LLM API 호출 함수
+from .prompt_templates import c_onversation_prompt, c_onversation_messages, fused_turn_instruction, system_prompt
+from .chat_session import format_reply, get_chat_session
+from .general_methods import parse_llm_response, SpeechStreamParser
+from . import structured_output
+from .structured_output import (
+    SPEECH_SCHEMA,
+    StructuredOutputError,
+    JSONStringFieldStreamer,
+    parse_fused_turn,
+    parse_structured_speech,
+    parse_stats,
+    response_format_for,
+    schema_instruction,
+    speech_repair_messages,
+    turn_schema,
+)
 # 감정 관련 함수들 import
 from .emotion_methods import (
     retrieve_current_emotions,
@@ -21,7 +35,387 @@ from .emotion_methods import (
     analyze_sentiment
 )
 from .context_methods import g_enerate_context
-from .emotion_measure import measure_and_update_emotions
+from . import token_budget as budgets
+from .emotion_decay import retrieve_emotions_at
+from .emotion_measure import EMOTION_NAMES, measure_and_update_emotions, store_emotion_scores
+from .emotion_worker import EmotionMeasurementWorker
+from .deadline import DeadlineExceeded, TurnDeadline, degrade, optional_step, remaining_time, use_deadline
+
+# 대화 프롬프트 구성 방식
+#   "single":  c_onversation_prompt 하나의 user 메시지 (기존 방식)
+#   "session": 안정적인 내용부터 배치한 메시지 목록 + 에이전트별 채팅 세션 (서버 프롬프트 캐시 재사용)
+conversation_prompt_layout = "single"
+
+def set_conversation_prompt_layout(layout):
+    """
+    Choose how the speech request is assembled: "single" (one user message) or
+    "session" (stable-prefix message list with a per-agent chat session).
+    """
+    global conversation_prompt_layout
+    if layout not in ("single", "session"):
+        raise ValueError(f"Unknown prompt layout: {layout}")
+    conversation_prompt_layout = layout
+
+# 턴 처리 방식
+#   "standard": 발화 전/후 감정 측정, 발화, 기억 요약을 각각 호출 (턴당 LLM 호출 4회)
+#   "fused":    발화 요청 하나로 발화, 생각, 발화 후 감정 평가(1~5), 기억 요약을 함께 받음 (턴당 1회)
+turn_mode = "standard"
+
+def set_turn_mode(mode):
+    """
+    Choose how many LLM round trips a turn makes: "standard" (separate emotion, speech and
+    summary calls) or "fused" (one structured reply feeds all the turn's DB writes; parts
+    missing from it fall back to the separate calls).
+    """
+    global turn_mode
+    if mode not in ("standard", "fused"):
+        raise ValueError(f"Unknown turn mode: {mode}")
+    turn_mode = mode
+
+# 감정 측정 방식
+#   "inline":     턴 안에서 측정이 끝날 때까지 기다림
+#   "background": 작업만 넣고 마지막으로 기록된 감정 벡터로 진행 (EmotionMeasurementWorker)
+emotion_measurement = "inline"
+emotion_worker = None
+
+def set_emotion_measurement(mode, workers=2):
+    """
+    Choose whether turns wait for emotion measurements ("inline") or hand them to a
+    background worker ("background") and use the last committed emotion vector.
+
+    Returns:
+        EmotionMeasurementWorker or None: The worker in background mode (for stats and wait_idle).
+    """
+    global emotion_measurement, emotion_worker
+    if mode not in ("inline", "background"):
+        raise ValueError(f"Unknown emotion measurement mode: {mode}")
+    emotion_measurement = mode
+    if mode == "background" and emotion_worker is None:
+        emotion_worker = EmotionMeasurementWorker(measure_and_update_emotions, workers=workers)
+    return emotion_worker if mode == "background" else None
+
+# 감정 측정 샘플링 정책 (EmotionSamplingPolicy). None이면 기회마다 측정
+emotion_sampling = None
+
+def set_emotion_sampling(policy):
+    """
+    Measure emotions only when the policy sees a sentiment shift, a novel message or too
+    many skipped opportunities; otherwise the previous state is carried forward.
+
+    Args:
+        policy (EmotionSamplingPolicy or None): None measures at every opportunity.
+    """
+    global emotion_sampling
+    emotion_sampling = policy
+
+# 턴 시간 예산 (초). None이면 마감 없이 모든 단계를 실행
+turn_time_budget = None
+# 발화 생성과 저장을 위해 남겨 두는 시간 (발화 전 감정 측정은 이 시간을 쓰지 않음)
+speech_time_reserve = 8.0
+# 남은 시간이 이보다 적으면 선택 LLM 단계(감정 측정, 요약, 형식 수정)는 시작하지 않음
+MIN_LLM_STEP_SECONDS = 1.0
+
+def set_turn_time_budget(seconds, speech_reserve=8.0):
+    """
+    Give every turn a time budget. When it runs short, optional steps degrade instead of
+    delaying the reply: the last emotion vector is reused, the raw speech is stored without
+    a summary, and memory promotion waits for the next turn. Each degradation is recorded
+    in the scenario DB's degradation_events table.
+
+    Args:
+        seconds (float or None): Budget per turn; None disables it.
+        speech_reserve (float): Part of the budget kept for speech generation and the DB writes.
+    """
+    global turn_time_budget, speech_time_reserve
+    turn_time_budget = seconds
+    speech_time_reserve = speech_reserve
+
+def _new_turn_deadline(database_path, agent2, conversation_turn):
+    if turn_time_budget is None:
+        return None
+    return TurnDeadline(turn_time_budget, database_path, agent2.name, conversation_turn)
+
+def _measure_emotions_in_budget(database_path, agent, step, reserve=0.0, text=None, sentiment=None):
+    """
+    Measure the agent's emotions if the sampling policy and the turn budget allow it.
+    Otherwise the last measured vector stays current (retrieve_current_emotions reads the latest row).
+    In background mode the measurement is queued and the turn does not wait for it.
+
+    Args:
+        text (str, optional): Message that prompted the measurement, for the sampling policy.
+        sentiment (float, optional): Its polarity, already computed by the turn.
+
+    Returns:
+        bool: True if new emotions were measured (or queued for the background worker).
+    """
+    if emotion_sampling is not None and text is not None:
+        if not emotion_sampling.should_measure(database_path, agent.name, text, sentiment):
+            return False
+    if emotion_measurement == "background":
+        emotion_worker.submit(database_path, agent)
+        return True
+    with optional_step(step, reserve=reserve, min_seconds=MIN_LLM_STEP_SECONDS) as allowed:
+        if allowed:
+            try:
+                return measure_and_update_emotions(database_path, agent) is not None
+            except DeadlineExceeded:
+                pass
+    degrade(step, "reused last emotion vector")
+    return False
+
+def _prepare_turn(database_path, agent1, agent2, message, context):
+    """
+    Run the steps before speech generation: context, sentiment/emotion updates and prompt assembly.
+
+    Returns:
+        tuple: (context, prompt) where prompt is a string, or a list of chat messages
+               in the "session" layout.
+    """
+    session_layout = conversation_prompt_layout == "session"
+
+    # 1) Context가 없으면 생성 (session 방식에서는 대화 기록을 채팅 메시지로 따로 보냄)
+    if context is None:
+        context = g_enerate_context(database_path, agent2, max_stm=5, max_ltm=5, history_limit=10,
+                                    include_history=not session_layout)
+
+    # 2) 상대방(Agent1)의 말에 대한 감정 분석 (agent2가 이를 듣고 기분이 변함)
+    sentiment_score = analyze_sentiment(message)
+    if sentiment_score > 0:
+        event_type = 'positive_interaction'
+    elif sentiment_score < 0:
+        event_type = 'negative_interaction'
+    else:
+        event_type = 'neutral_interaction'
+
+    # 감정 업데이트 (감쇠 모델이 있으면 지금까지 식은 상태에 적용)
+    update_emotion(database_path, agent2.name, event_type, sentiment_score,
+                   current_emotions=retrieve_emotions_at(database_path, agent2.name))
+    if turn_mode == "standard":
+        # fused 방식에서는 지난 턴의 자기 평가가 최신 감정 상태
+        _measure_emotions_in_budget(database_path, agent2, "emotion_before_speech", reserve=speech_time_reserve,
+                                    text=message, sentiment=sentiment_score)
+    # 감정 조정은 행을 쓰지 않고 조회 시점에 계산 (emotion_decay)
+
+    # 3) agent2의 현재 감정 상태 조회
+    current_emotions = retrieve_emotions_at(database_path, agent2.name)
+    # 감정 상태를 문자열로 변환
+    emotion_text = f"Emotional State of {agent2.name}: " + ", ".join(
+        f"{k}={v:.2f}" for k, v in current_emotions.items()
+    )
+
+    # 4) 메모리 컨텍스트와 리플렉션 가져오기 (이미 generate_context에서 포함됨)
+    memory_context = context  # generate_context에서 이미 대화 기록 포함
+    reflections = retrieve_reflections_from_db(database_path, agent2.name)
+    if budgets.context_token_budget is not None:
+        reflections = budgets.context_token_budget.fit_reflections(reflections)
+
+    # 5) 대화 프롬프트에 감정 상태 및 대화 기록 추가
+    if session_layout:
+        session = get_chat_session(database_path, agent2.name, agent1.name)
+        with session.lock:
+            history = session.history_messages()
+        prompt = c_onversation_messages(
+            agent1.name, agent1.persona, agent2.name, message, memory_context, reflections, emotion_text, history
+        )
+        _record_prompt_tokens(agent2.name, memory_context, reflections, prompt, history)
+        return context, prompt
+
+    prompt = c_onversation_prompt(
+        agent1.name,
+        agent1.persona,
+        agent2.name,
+        message,
+        memory_context,
+        reflections,
+        emotion_text=emotion_text  # 추가된 파라미터로 감정 상태 전달
+        # history_text는 generate_context에서 이미 포함되어 있음
+    )
+    _record_prompt_tokens(agent2.name, memory_context, reflections, prompt)
+    return context, prompt
+
+def _record_prompt_tokens(agent_name, memory_context, reflections, prompt, history=None):
+    # 턴마다 프롬프트 크기를 섹션별로 기록 (token_budget.prompt_token_stats)
+    sections = {
+        "context": budgets.count_tokens(memory_context),
+        "reflections": sum(budgets.count_tokens(text) for text in reflections.values() if isinstance(text, str)),
+        "total": budgets.prompt_tokens(prompt),
+    }
+    if history is not None:
+        sections["session_history"] = budgets.prompt_tokens(history)
+    budgets.prompt_token_stats.record(agent_name, sections)
+
+def _speech_request(prompt, agent_name):
+    """
+    Adapt the speech prompt for structured output or the fused turn mode.
+
+    Returns:
+        tuple: (prompt or chat messages, response_format or None). In structured and fused
+               mode the request is always a message list ending with the JSON instruction.
+    """
+    fused = turn_mode == "fused"
+    if not fused and not structured_output.structured_output_enabled:
+        return prompt, None
+    if isinstance(prompt, list):
+        messages = [dict(m) for m in prompt]
+    else:
+        messages = [{"role": "system", "content": system_prompt()}, {"role": "user", "content": prompt}]
+    if fused:
+        schema = turn_schema(EMOTION_NAMES)
+        messages[-1]["content"] += "\n\n" + fused_turn_instruction(agent_name) + "\n" + schema_instruction(schema)
+        return messages, response_format_for(schema, "agent_turn")
+    messages[-1]["content"] += "\n\n" + schema_instruction(SPEECH_SCHEMA)
+    return messages, response_format_for(SPEECH_SCHEMA, "agent_speech")
+
+def _parse_text_speech(content):
+    speech, thought_process = parse_llm_response(content)
+    if speech == "No speech provided.":
+        raise StructuredOutputError("no Speech: section in reply")
+    return speech, thought_process
+
+def _parse_speech_once(content, structured):
+    if structured:
+        try:
+            return parse_structured_speech(content)
+        except StructuredOutputError:
+            pass  # 백엔드가 스키마를 무시하고 텍스트 형식으로 답한 경우
+    return _parse_text_speech(content)
+
+def _parse_speech(content, structured=None):
+    """
+    Parse the speech reply. A malformed reply gets one short repair call that only
+    reformats it, instead of silently turning into "No speech provided.".
+
+    Args:
+        content (str): The speech reply.
+        structured (bool, optional): The reply was requested as JSON (default: the structured output setting).
+
+    Returns:
+        tuple: (speech, thought_process)
+    """
+    if structured is None:
+        structured = structured_output.structured_output_enabled
+    try:
+        result = _parse_speech_once(content, structured)
+        parse_stats.record("speech", "ok")
+        return result
+    except StructuredOutputError as e:
+        debug_log(f"Speech reply could not be parsed ({e}), asking for a reformatted reply")
+
+    with optional_step("speech_repair", min_seconds=MIN_LLM_STEP_SECONDS) as allowed:
+        try:
+            if not allowed:
+                raise DeadlineExceeded("no time left in the turn")
+            response_format = response_format_for(SPEECH_SCHEMA, "agent_speech") if structured else None
+            repaired = query_llm_dict(
+                speech_repair_messages(content, structured),
+                max_retries=2,
+                purpose="repair:speech",
+                response_format=response_format,
+            )["choices"][0]["message"]["content"]
+            result = _parse_speech_once(repaired, structured)
+            parse_stats.record("speech", "repaired")
+            return result
+        except Exception as e:
+            debug_log(f"Speech reply repair failed: {e}")
+            if isinstance(e, DeadlineExceeded):
+                degrade("speech_repair", "used unrepaired reply")
+            parse_stats.record("speech", "failed")
+            return parse_llm_response(content)
+
+def _parse_fused_turn(content):
+    """
+    Parse a fused turn reply.
+
+    Returns:
+        dict or None: See structured_output.parse_fused_turn; None if the reply has no
+                      readable speech (the caller then treats it as a plain speech reply).
+                      Replies with missing parts are counted by _finish_turn once it knows
+                      whether the separate calls filled them.
+    """
+    try:
+        fused = parse_fused_turn(content, EMOTION_NAMES)
+    except StructuredOutputError as e:
+        debug_log(f"Fused turn reply could not be parsed ({e}), falling back to separate calls")
+        parse_stats.record("turn", "failed")
+        return None
+    if fused["emotions"] is not None and fused["memory_summary"] is not None:
+        parse_stats.record("turn", "ok")
+    return fused
+
+def _finish_turn(database_path, agent1, agent2, message, conversation_turn, context, content):
+    """
+    Run the steps after speech generation: parsing, emotion updates, memory and DB writes.
+    In the fused turn mode the emotion ratings and memory summary come from the same reply.
+
+    Returns:
+        tuple: (response speech from agent2, updated conversation turn)
+    """
+    # 7) LLM 응답 파싱 (형식이 틀리면 짧은 수정 요청)
+    fused = _parse_fused_turn(content) if turn_mode == "fused" else None
+    if fused is not None:
+        speech, thought_process = fused["speech"], fused["thought_process"]
+    else:
+        speech, thought_process = _parse_speech(content, structured=True if turn_mode == "fused" else None)
+
+    debug_log(f"{agent2.name} answered : {speech}")
+
+    # 8) 에이전트(Agent2)의 응답에 대한 감정 분석 (자신의 발화가 자기 감정에도 영향 줄 수 있음)
+    response_sentiment_score = analyze_sentiment(speech)
+    if response_sentiment_score > 0:
+        resp_event = 'positive_interaction'
+    elif response_sentiment_score < 0:
+        resp_event = 'negative_interaction'
+    else:
+        resp_event = 'neutral_interaction'
+
+    # 응답에 대한 감정 업데이트 및 조정
+    update_emotion(database_path, agent2.name, resp_event, response_sentiment_score,
+                   current_emotions=retrieve_emotions_at(database_path, agent2.name))
+    emotions_filled = True
+    if fused is not None and fused["emotions"] is not None:
+        store_emotion_scores(database_path, agent2.name, [fused["emotions"][name] for name in EMOTION_NAMES])
+    else:
+        emotions_filled = _measure_emotions_in_budget(database_path, agent2, "emotion_after_speech",
+                                                      text=speech, sentiment=response_sentiment_score)
+
+    # 9) agent2가 말한 내용을 STM에 추가 (시간이 부족하면 요약 없이 원문 저장)
+    summary = fused["memory_summary"] if fused is not None else None
+    with optional_step("summary", min_seconds=MIN_LLM_STEP_SECONDS) as summarize:
+        if not summarize and summary is None:
+            degrade("summary", "stored raw speech")
+        stored = add_to_short_term_memory(
+            database_path,
+            {"content": speech, "agent_name": agent2.name},
+            context,
+            summarize=summarize,
+            summary=summary
+        )
+    if fused is not None and (fused["emotions"] is None or summary is None):
+        # 빠진 부분(감정 평가 또는 요약)을 별도 호출로 실제로 채운 경우에만 "repaired"
+        summary_filled = summary is not None or stored != speech
+        parse_stats.record("turn", "repaired" if emotions_filled and summary_filled else "failed")
+    # 승격은 조건에 맞는 STM 전체를 옮기므로, 미룬 경우 다음 턴의 승격에서 함께 처리됨
+    if remaining_time(default=1.0) > 0:
+        promote_to_long_term_memory(database_path, agent2.name)
+    else:
+        degrade("promotion", "deferred to the next turn")
+
+    # 10) 대화 로그 DB 저장
+    save_message_to_db(database_path, conversation_turn, agent1.name, message)
+    #conversation_turn += 1 #이거 안해야함 나중에 고치셈
+    save_message_to_db(database_path, conversation_turn, agent2.name, speech)
+    conversation_turn += 1
+
+    # 11) thought_process 저장
+    save_thought_process_to_db(database_path, agent2.name, thought_process)
+
+    # 12) 채팅 세션에 이번 대화 추가 (session 방식에서 다음 턴의 공통 접두부가 됨)
+    if conversation_prompt_layout == "session":
+        session = get_chat_session(database_path, agent2.name, agent1.name)
+        with session.lock:
+            session.add_exchange(message, format_reply(speech, thought_process))
+
+    return speech, conversation_turn
 
 def agent_conversation(database_path, agent1, agent2, message, conversation_turn, context=None):
     """
@@ -42,95 +436,76 @@ def agent_conversation(database_path, agent1, agent2, message, conversation_turn
     debug_log(f"{agent1.name} is talking to {agent2.name} with message: {message}. Conversation turn: {conversation_turn}")
 
     try:
-        # 1) Context가 없으면 생성 (이미 대화 기록이 포함됨)
-        if context is None:
-            context = g_enerate_context(database_path, agent2, max_stm=5, max_ltm=5, history_limit=10)
-
-        # 2) 상대방(Agent1)의 말에 대한 감정 분석 (agent2가 이를 듣고 기분이 변함)
-        sentiment_score = analyze_sentiment(message)
-        if sentiment_score > 0:
-            event_type = 'positive_interaction'
-        elif sentiment_score < 0:
-            event_type = 'negative_interaction'
-        else:
-            event_type = 'neutral_interaction'
-
-        # 감정 업데이트
-        update_emotion(database_path, agent2.name, event_type, sentiment_score)
-        measure_and_update_emotions(database_path, agent2)
-        # 필요하다면 감정 조정
-        #adjust_emotions(database_path, agent2.name)
-
-        # 3) agent2의 현재 감정 상태 조회
-        current_emotions = retrieve_current_emotions(database_path, agent2.name)
-        # 감정 상태를 문자열로 변환
-        emotion_text = f"Emotional State of {agent2.name}: " + ", ".join(
-            f"{k}={v:.2f}" for k, v in current_emotions.items()
-        )
-
-        # 4) 메모리 컨텍스트와 리플렉션 가져오기 (이미 generate_context에서 포함됨)
-        memory_context = context  # generate_context에서 이미 대화 기록 포함
-        reflections = retrieve_reflections_from_db(database_path, agent2.name)
-
-        # 5) 대화 프롬프트에 감정 상태 및 대화 기록 추가
-        prompt = c_onversation_prompt(
-            agent1.name,
-            agent1.persona,
-            agent2.name,
-            message,
-            memory_context,
-            reflections,
-            emotion_text=emotion_text  # 추가된 파라미터로 감정 상태 전달
-            # history_text는 generate_context에서 이미 포함되어 있음
-        )
+        with use_deadline(_new_turn_deadline(database_path, agent2, conversation_turn)):
+            context, prompt = _prepare_turn(database_path, agent1, agent2, message, context)
 
-        # 6) LLM에 프롬프트 전송
-        llm_response = query_llm(prompt)
+            # 6) LLM에 프롬프트 전송
+            prompt, response_format = _speech_request(prompt, agent2.name)
+            if isinstance(prompt, list):
+                llm_response = query_llm_dict(prompt, hedge=True, purpose="speech", response_format=response_format)
+            else:
+                llm_response = query_llm(prompt, hedge=True, purpose="speech")
 
-        if not isinstance(llm_response, dict) or "choices" not in llm_response:
-            raise ValueError("Invalid LLM response format.")
+            if not isinstance(llm_response, dict) or "choices" not in llm_response:
+                raise ValueError("Invalid LLM response format.")
 
-        # 7) LLM 응답 파싱
-        content = llm_response["choices"][0]["message"]["content"]
-        speech, thought_process = parse_llm_response(content)
+            content = llm_response["choices"][0]["message"]["content"]
+            return _finish_turn(database_path, agent1, agent2, message, conversation_turn, context, content)
 
-        debug_log(f"{agent2.name} answered : {speech}")
+    except Exception as e:
+        print(f"Error in agent_conversation: {e}")
+        save_message_to_db(database_path, conversation_turn, "Error", str(e))
+        #conversation_turn += 1
+        raise
 
-        # 8) 에이전트(Agent2)의 응답에 대한 감정 분석 (자신의 발화가 자기 감정에도 영향 줄 수 있음)
-        response_sentiment_score = analyze_sentiment(speech)
-        if response_sentiment_score > 0:
-            resp_event = 'positive_interaction'
-        elif response_sentiment_score < 0:
-            resp_event = 'negative_interaction'
-        else:
-            resp_event = 'neutral_interaction'
+def agent_conversation_stream(database_path, agent1, agent2, message, conversation_turn, context=None):
+    """
+    Streaming version of agent_conversation. Yields agent2's speech while it is being generated,
+    then runs the same memory/emotion/DB steps once the completion is finished.
 
-        # 응답에 대한 감정 업데이트 및 조정
-        update_emotion(database_path, agent2.name, resp_event, response_sentiment_score)
-        measure_and_update_emotions(database_path, agent2)
-        #adjust_emotions(database_path, agent2.name)
+    Args:
+        database_path (str): Path to the SQLite database.
+        agent1 (Agent): The agent initiating the conversation.
+        agent2 (Agent): The agent responding to the conversation.
+        message (str): The message from agent1 to agent2.
+        conversation_turn (int): The current turn in the conversation.
+        context (str, optional): Context string containing memories and conversation history. Defaults to None.
 
-        # 9) agent2가 말한 내용을 STM에 추가
-        add_to_short_term_memory(
-            database_path,
-            {"content": speech, "agent_name": agent2.name},
-            context
-        )
-        promote_to_long_term_memory(database_path, agent2.name)
+    Yields:
+        dict: {"type": "speech", "delta": str} for each new piece of speech, then
+              {"type": "done", "speech": str, "conversation_turn": int, "degraded": list} with the
+              final parsed speech and the steps the turn budget skipped.
+    """
+    debug_log(f"{agent1.name} is talking to {agent2.name} with message: {message}. Conversation turn: {conversation_turn} (streaming)")
 
-        # 10) 대화 로그 DB 저장
-        save_message_to_db(database_path, conversation_turn, agent1.name, message)
-        #conversation_turn += 1 #이거 안해야함 나중에 고치셈
-        save_message_to_db(database_path, conversation_turn, agent2.name, speech)
-        conversation_turn += 1
+    try:
+        # 마감은 yield 사이에 소비자 쪽으로 새지 않도록 각 구간에서만 활성화
+        deadline = _new_turn_deadline(database_path, agent2, conversation_turn)
+        with use_deadline(deadline):
+            context, prompt = _prepare_turn(database_path, agent1, agent2, message, context)
 
-        # 11) thought_process 저장
-        save_thought_process_to_db(database_path, agent2.name, thought_process)
+            # 6) LLM 응답을 토큰 단위로 받으면서 Speech 부분만 바로 내보냄
+            prompt, response_format = _speech_request(prompt, agent2.name)
+            parser = JSONStringFieldStreamer("speech") if response_format else SpeechStreamParser()
+            chunks = []
+            if isinstance(prompt, list):
+                stream = stream_llm_dict(prompt, purpose="speech", response_format=response_format)
+            else:
+                stream = stream_llm(prompt, purpose="speech")
+        for chunk in stream:
+            chunks.append(chunk)
+            delta = parser.feed(chunk)
+            if delta:
+                yield {"type": "speech", "delta": delta}
 
-        return speech, conversation_turn
+        with use_deadline(deadline):
+            speech, conversation_turn = _finish_turn(
+                database_path, agent1, agent2, message, conversation_turn, context, "".join(chunks)
+            )
+        degraded = deadline.degradations if deadline is not None else []
+        yield {"type": "done", "speech": speech, "conversation_turn": conversation_turn, "degraded": degraded}
 
     except Exception as e:
-        print(f"Error in agent_conversation: {e}")
+        print(f"Error in agent_conversation_stream: {e}")
         save_message_to_db(database_path, conversation_turn, "Error", str(e))
-        #conversation_turn += 1
-        raise
\ No newline at end of file
+        raise
@@ -3,6 +3,7 @@ from .llm_connector import query_llm
 from .prompt_templates import *
 from .context_methods import *
 from .importance_scoring import *
+from .deadline import DeadlineExceeded, db_timeout, degrade
 from contextlib import contextmanager 
 
 @contextmanager
@@ -16,7 +17,8 @@ def db_connection(database_path):
     Yields:
         sqlite3.Connection: SQLite connection object.
     """
-    conn = sqlite3.connect(database_path, check_same_thread=False)
+    # 선택 단계(감정 측정, 요약) 안에서는 잠금 대기도 그 단계의 남은 시간 안에서만
+    conn = sqlite3.connect(database_path, timeout=db_timeout(), check_same_thread=False)
     try:
         yield conn
     finally:
@@ -110,16 +112,19 @@ def summarize_memory(content, context):
         prompt = get_summarize_memory_prompt(content, context)
         
         # Query the LLM
-        response = query_llm(prompt)
+        response = query_llm(prompt, purpose="summary")
         
         # Extract the summarized content from the response
         summarized_content = response.get("choices", [{}])[0].get("message", {}).get("content", content).strip()
         return summarized_content
 
+    except DeadlineExceeded:
+        degrade("summary", "stored raw speech")
+        return content
     except Exception as e:
         print(f"Error summarizing memory: {e}")
         return content  # Fallback to original content if summarization fails
-def add_to_short_term_memory(database_path, event, context):
+def add_to_short_term_memory(database_path, event, context, summarize=True, summary=None):
     """
     Add a new memory to short-term memory with summarization, and calculate its importance.
     
@@ -127,12 +132,23 @@ def add_to_short_term_memory(database_path, event, context):
         database_path (str): Path to the SQLite database.
         event (dict): Memory content and metadata (e.g., {"content": "memory content", "agent_name"="Maria"}).
         context (str): Current conversation context.
+        summarize (bool): Summarize the content with the LLM; False stores it as is
+            (used when the turn budget has run out).
+        summary (str, optional): Summary that is already known (from a fused turn reply);
+            stored instead of calling the LLM.
+
+    Returns:
+        str: The stored content (the raw content if summarization was skipped or failed).
     """
+    # 요약 단계 안에서 불려도 기억 저장은 필수이므로 잠금 대기를 줄이지 않음
     conn = sqlite3.connect(database_path, check_same_thread=False)
     cursor = conn.cursor()
 
     # Summarize memory content
-    summarized_content = summarize_memory(event['content'], context)
+    if summary is not None:
+        summarized_content = summary
+    else:
+        summarized_content = summarize_memory(event['content'], context) if summarize else event['content']
     
     # Extract recency and frequency from database
     cursor.execute('SELECT COUNT(*) FROM short_term_memory WHERE content = ?', (summarized_content,))
@@ -165,6 +181,7 @@ def add_to_short_term_memory(database_path, event, context):
         conn.commit()
 
     conn.close()
+    return summarized_content
     
 def retrieve_from_short_term_memory(database_path, agent_name):
     conn = sqlite3.connect(database_path, check_same_thread=False)
@@ -350,7 +367,7 @@ def generate_reflection(database_path, agent_name, reflection_type="general"):
     )
     # Call the LLM with the generated prompt
     try:
-        reflection = query_llm(prompt)
+        reflection = query_llm(prompt, purpose=f"reflection:{reflection_type}")
         debug_log(f" Reflection generated: {reflection}")
         return reflection["choices"][0]["message"]["content"]
     except RuntimeError as e:
@@ -66,6 +66,82 @@ def c_onversation_prompt(agent1_name, agent1_persona, agent2_name, message, memo
 
 
 
+def c_onversation_messages(agent1_name, agent1_persona, agent2_name, message, memory_context, reflections, emotion_text, history):
+    """
+    Generate the conversation request as chat messages ordered from most to least stable,
+    so consecutive turns of the same agent share a long identical prefix:
+    system prompt -> who is talking -> reflections -> chat history -> this turn.
+
+    Memories and emotions change every turn (STM grows, emotions are re-measured), so they
+    go into the final message together with the new line from agent1.
+
+    Args:
+        agent1_name (str): Name of the initiating agent.
+        agent1_persona (str): Persona of the initiating agent.
+        agent2_name (str): Name of the responding agent.
+        message (str): Message from agent1 to agent2.
+        memory_context (str): Memory context retrieved for agent2 (without conversation history).
+        reflections (dict): All reflection types for agent2.
+        emotion_text (str): Emotion state text for agent2.
+        history (list[dict]): Earlier exchanges of this agent's chat session.
+
+    Returns:
+        list[dict]: OpenAI-style messages.
+    """
+    return [
+        {"role": "system", "content": system_prompt()},
+        {"role": "system", "content": (
+            f"You are {agent2_name}. You are talking with {agent1_name} (Persona: {agent1_persona})."
+        )},
+        {"role": "system", "content": (
+            f"Reflections:\n"
+            f"- Summary:\n{reflections.get('summary', 'No summary available.')}\n"
+            f"- Strategy:\n{reflections.get('strategy', 'No strategy available.')}\n"
+            f"- Lesson:\n{reflections.get('lesson', 'No lesson available.')}\n"
+            f"- Prediction:\n{reflections.get('prediction', 'No prediction available.')}"
+        )},
+        *history,
+        {"role": "user", "content": (
+            f"Memory Context:\n{memory_context}\n\n"
+            f"Emotion State:\n"
+            f"The current emotional state of {agent2_name} is represented by 8 emotions:\n"
+            f"Joy, Trust, Fear, Surprise, Sadness, Disgust, Anger, Anticipation.\n"
+            f"Each emotion's intensity is expressed as a number between 0 and 1.\n"
+            f"{emotion_text}\n\n"
+            f"{agent1_name} says to {agent2_name}: '{message}'\n\n"
+            f"**Important instruction**:\n"
+            f"- Do not include bracketed notes like (Note: ... ) or meta-commentary describing your emotional process.\n"
+            f"- Do not include stage directions or editorial comments.\n"
+            f"- Write only the direct reasoning (if required) and the final speech in a natural dialogue form.\n\n"
+            f"Based on the provided emotional state, memory context, and reflections, "
+            f"please respond to {agent1_name}'s message in the following format:\n"
+            f"Thought process:\n[Provide your reasoning here, including any considerations from memory, reflections, and emotions.]\n\n"
+            f"Speech:\n[Provide the exact words {agent2_name} will say in the conversation.]"
+        )},
+    ]
+
+def fused_turn_instruction(agent2_name):
+    """
+    Instruction appended to the conversation request in the fused turn mode, asking for the
+    speech, the speaker's emotion ratings and a memory summary in one JSON reply.
+
+    Args:
+        agent2_name (str): Name of the responding agent.
+
+    Returns:
+        str: Instruction text (the JSON schema itself is appended by the caller).
+    """
+    return (
+        f"Instead of the format above, answer with one JSON object containing:\n"
+        f"- thought_process: your reasoning.\n"
+        f"- speech: the exact words {agent2_name} will say in the conversation.\n"
+        f"- emotions: how strongly {agent2_name} feels each of the 8 emotions right after saying this, "
+        f"on a scale of 1 to 5 (1 = very slightly or not at all, 2 = a little, 3 = moderately, "
+        f"4 = quite a bit, 5 = extremely).\n"
+        f"- memory_summary: a concise one or two sentence summary of what {agent2_name} said, "
+        f"to be stored as a memory."
+    )
+
 def reflection_prompt(agent_name, short_term_memories, long_term_memories, reflection_type):
     """
     Generate a reflection prompt for a specific reflection type.
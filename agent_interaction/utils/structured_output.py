@@ -0,0 +1,403 @@
+# structured_output.py
+import json
+import re
+import threading
+
+###################################
+# Settings
+###################################
+
+# True면 발화/감정 측정 요청에 JSON 스키마(response_format)를 붙여 구조화된 응답을 받음
+structured_output_enabled = False
+
+def set_structured_output(enabled):
+    """
+    Turn schema-constrained JSON responses on or off for speech and emotion calls.
+    Backends without json_schema support still get the JSON instruction in the prompt,
+    and the tolerant parser plus repair call cover replies that are not valid JSON.
+    """
+    global structured_output_enabled
+    structured_output_enabled = bool(enabled)
+
+class StructuredOutputError(ValueError):
+    """
+    Raised when a reply cannot be turned into the expected structure.
+    """
+
+###################################
+# Schemas
+###################################
+
+SPEECH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought_process": {"type": "string"},
+        "speech": {"type": "string"},
+    },
+    "required": ["thought_process", "speech"],
+    "additionalProperties": False,
+}
+
+def emotion_schema(emotion_names):
+    """
+    Schema for the emotion questionnaire: one integer from 1 to 5 per emotion, keyed by name,
+    in the order the questions were asked.
+    """
+    return {
+        "type": "object",
+        "properties": {name: {"type": "integer", "minimum": 1, "maximum": 5} for name in emotion_names},
+        "required": list(emotion_names),
+        "additionalProperties": False,
+    }
+
+def turn_schema(emotion_names):
+    """
+    Schema of a fused turn reply: the speech plus everything the turn used to ask for in
+    separate calls (self-rated emotions after speaking and a memory summary). The speech
+    comes before the ratings so it can be streamed, and the ratings describe the state
+    after speaking, like the second measurement of a standard turn.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "thought_process": {"type": "string"},
+            "speech": {"type": "string"},
+            "emotions": emotion_schema(emotion_names),
+            "memory_summary": {"type": "string"},
+        },
+        "required": ["thought_process", "speech", "emotions", "memory_summary"],
+        "additionalProperties": False,
+    }
+
+def response_format_for(schema, name):
+    """
+    OpenAI-style response_format for a JSON schema (supported by Ollama, llama.cpp and vLLM).
+    """
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+def schema_instruction(schema):
+    """
+    Prompt text asking for JSON that matches `schema`, for backends that ignore response_format.
+    """
+    return (
+        "Reply with a single JSON object only, no other text, matching this JSON schema:\n"
+        + json.dumps(schema, ensure_ascii=False)
+    )
+
+def validate(value, schema):
+    """
+    Check a parsed value against the subset of JSON schema used here
+    (object, string, integer, required, minimum/maximum).
+
+    Raises:
+        StructuredOutputError: With the first problem found.
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise StructuredOutputError("expected a JSON object")
+        missing = [key for key in schema.get("required", []) if key not in value]
+        if missing:
+            raise StructuredOutputError(f"missing keys: {', '.join(missing)}")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                try:
+                    validate(value[key], subschema)
+                except StructuredOutputError as e:
+                    raise StructuredOutputError(f"{key}: {e}")
+    elif kind == "string":
+        if not isinstance(value, str):
+            raise StructuredOutputError("expected a string")
+    elif kind == "integer":
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise StructuredOutputError("expected an integer")
+        if value < schema.get("minimum", value) or value > schema.get("maximum", value):
+            raise StructuredOutputError(f"{value} out of range")
+    return value
+
+###################################
+# Tolerant JSON Parsing
+###################################
+
+def _close_json(text):
+    # 잘린 JSON: 열린 문자열/괄호를 닫고 끝의 쉼표/콜론을 정리
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r"[,:]\s*$", "", text.rstrip())
+    return text + "".join(reversed(stack))
+
+def parse_json_lenient(text):
+    """
+    Parse the first JSON object in an LLM reply, tolerating code fences, text around the
+    object, trailing commas and a reply cut off before the closing braces.
+
+    Raises:
+        StructuredOutputError: If no object can be recovered.
+    """
+    start = text.find("{")
+    if start < 0:
+        raise StructuredOutputError("no JSON object in reply")
+    candidate = text[start:]
+    end = candidate.rfind("}")
+    attempts = [candidate[: end + 1]] if end >= 0 else []
+    attempts.append(_close_json(candidate))
+    for attempt in attempts:
+        for fixed in (attempt, re.sub(r",\s*([}\]])", r"\1", attempt)):
+            try:
+                value = json.loads(fixed)
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value
+    raise StructuredOutputError("invalid JSON in reply")
+
+class JSONStringFieldStreamer:
+    """
+    Incrementally extract one top-level string field from a streamed JSON object, so a
+    structured speech reply can be shown while it is generated. Escapes are decoded.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.depth = 0
+        self.in_string = False
+        self.escape = None  # 진행 중인 이스케이프 시퀀스
+        self.current = ""  # 현재 읽는 문자열
+        self.last_key = None
+        self.expect_value = False
+        self.in_target = False
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Args:
+            chunk (str): Next piece of the reply.
+
+        Returns:
+            str: Newly decoded characters of the field value (possibly empty).
+        """
+        out = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self.in_string:
+                decoded = self._string_char(ch)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    self._end_string()
+                elif self.in_target:
+                    out.append(decoded)
+                else:
+                    self.current += decoded
+            elif ch == '"':
+                self.in_string = True
+                self.current = ""
+                self.in_target = self.depth == 1 and self.expect_value and self.last_key == self.field
+            elif ch in "{[":
+                self.depth += 1
+                self.expect_value = False
+            elif ch in "}]":
+                self.depth -= 1
+            elif ch == ":":
+                self.expect_value = True
+            elif ch == ",":
+                self.expect_value = False
+        return "".join(out)
+
+    def _string_char(self, ch):
+        if self.escape is not None:
+            self.escape += ch
+            if self.escape[0] == "u":
+                if len(self.escape) < 5:
+                    return None
+                code, self.escape = self.escape[1:], None
+                try:
+                    return chr(int(code, 16))
+                except ValueError:
+                    return ""
+            code, self.escape = self.escape, None
+            return {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}.get(code, code)
+        if ch == "\\":
+            self.escape = ""
+            return None
+        if ch == '"':
+            return _END
+        return ch
+
+    def _end_string(self):
+        self.in_string = False
+        if self.in_target:
+            self.done = True
+        elif self.depth == 1 and not self.expect_value:
+            self.last_key = self.current
+        self.expect_value = False
+
+_END = object()
+
+###################################
+# Speech / Emotion Parsing
+###################################
+
+def parse_structured_speech(content):
+    """
+    Returns:
+        tuple: (speech, thought_process) from a JSON speech reply.
+
+    Raises:
+        StructuredOutputError: If the reply does not contain a non-empty speech.
+    """
+    value = validate(parse_json_lenient(content), SPEECH_SCHEMA)
+    if not value["speech"].strip():
+        raise StructuredOutputError("empty speech")
+    return value["speech"].strip(), value["thought_process"].strip()
+
+def parse_structured_emotions(content, emotion_names):
+    """
+    Returns:
+        dict: {emotion name: score 1-5} from a JSON questionnaire reply.
+
+    Raises:
+        StructuredOutputError: If a score is missing or out of range.
+    """
+    value = parse_json_lenient(content)
+    # 대소문자 차이는 허용
+    by_lower = {str(key).lower(): score for key, score in value.items()}
+    scores = {name: by_lower.get(name.lower()) for name in emotion_names}
+    return validate(scores, emotion_schema(emotion_names))
+
+def parse_fused_turn(content, emotion_names):
+    """
+    Parse a fused turn reply. Only the speech is required; the emotion ratings and the
+    summary are returned as None when missing or invalid, so the caller can get just
+    those with the separate calls.
+
+    Returns:
+        dict: speech, thought_process, emotions ({name: score 1-5} or None), memory_summary (str or None).
+
+    Raises:
+        StructuredOutputError: If the reply does not contain a non-empty speech.
+    """
+    value = parse_json_lenient(content)
+    speech = value.get("speech")
+    if not isinstance(speech, str) or not speech.strip():
+        raise StructuredOutputError("empty speech")
+    thought_process = value.get("thought_process")
+
+    emotions = value.get("emotions")
+    try:
+        if not isinstance(emotions, dict):
+            raise StructuredOutputError("expected a JSON object")
+        by_lower = {str(key).lower(): score for key, score in emotions.items()}
+        emotions = validate({name: by_lower.get(name.lower()) for name in emotion_names},
+                            emotion_schema(emotion_names))
+    except StructuredOutputError:
+        emotions = None
+
+    summary = value.get("memory_summary")
+    return {
+        "speech": speech.strip(),
+        "thought_process": thought_process.strip() if isinstance(thought_process, str) else "",
+        "emotions": emotions,
+        "memory_summary": summary.strip() if isinstance(summary, str) and summary.strip() else None,
+    }
+
+###################################
+# Repair Prompts
+###################################
+
+def speech_repair_messages(content, structured):
+    """
+    Messages for a cheap follow-up call that only reformats a malformed speech reply.
+    """
+    if structured:
+        target = schema_instruction(SPEECH_SCHEMA)
+    else:
+        target = "Rewrite it in exactly this format:\nThought process:\n<reasoning>\n\nSpeech:\n<the words spoken>"
+    return [
+        {"role": "system", "content": "You fix the formatting of replies without changing their meaning."},
+        {"role": "user", "content": f"This reply is not in the required format:\n\n{content}\n\n{target}"},
+    ]
+
+def emotion_repair_messages(content, emotion_names, missing, structured):
+    """
+    Messages for a cheap follow-up call that asks only for the emotions that could not be read.
+    """
+    if structured:
+        target = schema_instruction(emotion_schema(missing))
+    else:
+        target = (
+            "Reply with one number from 1 to 5 per emotion, one per line, in this order:\n"
+            + "\n".join(f"{i + 1}. {name}" for i, name in enumerate(missing))
+        )
+    return [
+        {"role": "system", "content": "You are a helpful assistant who can only reply numbers from 1 to 5."},
+        {"role": "user", "content": (
+            f"Your earlier ratings of the emotions {', '.join(emotion_names)} were:\n\n{content}\n\n"
+            f"The ratings for {', '.join(missing)} could not be read. {target}"
+        )},
+    ]
+
+###################################
+# Parse Statistics
+###################################
+
+class ParseStats:
+    """
+    Per-kind counters of replies that failed to parse on the first pass, were fixed by a
+    repair call, or were lost. Each first-pass failure costs a full completion.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, kind, outcome):
+        """
+        Args:
+            kind (str): "speech" or "emotion".
+            outcome (str): "ok", "repaired" or "failed".
+        """
+        with self._lock:
+            counts = self._counts.setdefault(kind, {"calls": 0, "ok": 0, "repaired": 0, "failed": 0})
+            counts["calls"] += 1
+            counts[outcome] += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per kind: counts, first-pass failure rate and failure rate after repair.
+        """
+        with self._lock:
+            result = {}
+            for kind, counts in self._counts.items():
+                calls = counts["calls"]
+                result[kind] = dict(
+                    counts,
+                    first_pass_failure_rate=(counts["repaired"] + counts["failed"]) / calls if calls else 0.0,
+                    failure_rate=counts["failed"] / calls if calls else 0.0,
+                )
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+parse_stats = ParseStats()
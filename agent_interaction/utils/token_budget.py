@@ -0,0 +1,209 @@
+# token_budget.py
+import functools
+import statistics
+import threading
+
+from .llm_concurrency import percentile
+
+###################################
+# Token Counting
+###################################
+
+# tiktoken 인코딩 이름. None이면 약 4글자 = 1토큰으로 추정 (기본값, 네트워크 불필요)
+token_encoding = None
+
+def set_token_encoding(name):
+    """
+    Count tokens with a tiktoken encoding instead of the 4-characters-per-token estimate.
+
+    tiktoken downloads the encoding file the first time it is loaded and keeps it in its
+    local cache (TIKTOKEN_CACHE_DIR), so an offline host needs that cache filled in advance.
+    If the encoding cannot be loaded, the estimate is used.
+
+    Args:
+        name (str or None): Encoding name, e.g. "cl100k_base"; None goes back to the estimate.
+    """
+    global token_encoding
+    token_encoding = name
+    _load_encoding.cache_clear()
+    count_tokens.cache_clear()
+
+@functools.lru_cache(maxsize=1)
+def _load_encoding():
+    # tiktoken은 선택 사항: 없거나 인코딩을 못 받으면 추정치로 대체
+    if token_encoding is None:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(token_encoding)
+    except Exception:
+        return None
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text):
+    """
+    Count the tokens of `text`: about 4 characters per token, or exactly with the tiktoken
+    encoding chosen with set_token_encoding. Results are cached, since the same memories
+    and reflections are counted again on every turn.
+
+    Returns:
+        int: Token count.
+    """
+    if not text:
+        return 0
+    encoding = _load_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+def truncate_to_tokens(text, limit):
+    """
+    Cut `text` to at most `limit` tokens, at a word boundary when no tokenizer is available.
+
+    Returns:
+        str: The text, shortened and ending in "..." if it was over the limit.
+    """
+    if count_tokens(text) <= limit:
+        return text
+    if limit <= 0:
+        return ""
+    encoding = _load_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[: max(1, limit - 1)]).rstrip() + "..."
+    cut = text[: max(1, limit - 1) * 4]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "..."
+
+###################################
+# Budgets
+###################################
+
+class TokenBudget:
+    """
+    Token limits per prompt section. Items inside a section are passed most valuable first
+    (newest STM, most important LTM, newest conversation line); whatever does not fit is
+    dropped from the end, and the first item that does not fit is truncated when enough
+    room is left for it to be useful.
+    """
+
+    def __init__(self, short_term=300, long_term=300, history=600, reflection=150, min_item=16):
+        """
+        Args:
+            short_term (int): Tokens for short-term memories.
+            long_term (int): Tokens for long-term memories.
+            history (int): Tokens for the conversation history.
+            reflection (int): Tokens for each reflection (summary, strategy, ...).
+            min_item (int): Smallest remainder worth filling with a truncated item.
+        """
+        self.short_term = short_term
+        self.long_term = long_term
+        self.history = history
+        self.reflection = reflection
+        self.min_item = min_item
+
+    def fit(self, items, limit):
+        """
+        Args:
+            items (list[str]): Section items, most valuable first.
+            limit (int): Token limit of the section.
+
+        Returns:
+            list[str]: The items that fit (possibly the last one truncated), in the same order.
+        """
+        kept = []
+        used = 0
+        for item in items:
+            tokens = count_tokens(item)
+            if used + tokens <= limit:
+                kept.append(item)
+                used += tokens
+                continue
+            if limit - used >= self.min_item:
+                kept.append(truncate_to_tokens(item, limit - used))
+            break
+        return kept
+
+    def fit_reflections(self, reflections):
+        """
+        Returns:
+            dict: The reflections with each text cut to the per-reflection limit.
+        """
+        return {kind: truncate_to_tokens(text, self.reflection) if isinstance(text, str) else text
+                for kind, text in reflections.items()}
+
+# 컨텍스트 토큰 예산. 기본은 None(제한 없음)이라 기존 프롬프트가 그대로 유지됨
+context_token_budget = None
+
+def set_token_budget(budget):
+    """
+    Set the context token budget used by g_enerate_context and the conversation prompt
+    (off by default).
+
+    Args:
+        budget (TokenBudget or None): New budget, or None to turn budgeting off.
+    """
+    global context_token_budget
+    context_token_budget = budget
+
+###################################
+# Prompt Size Statistics
+###################################
+
+def prompt_tokens(prompt):
+    """
+    Returns:
+        int: Tokens of a prompt string or of the contents of a message list.
+    """
+    if isinstance(prompt, str):
+        return count_tokens(prompt)
+    return sum(count_tokens(m.get("content") or "") for m in prompt)
+
+class PromptTokenStats:
+    """
+    Prompt size of each conversation turn, split by section, to check that the prompt
+    stays bounded however long the conversation runs.
+    """
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._turns = []
+
+    def record(self, agent_name, sections):
+        """
+        Args:
+            agent_name (str): Agent whose prompt was built.
+            sections (dict): {section name: tokens}, including "total".
+        """
+        with self._lock:
+            self._turns.append(dict(sections, agent=agent_name))
+            del self._turns[: -self._window]
+
+    def last(self):
+        with self._lock:
+            return dict(self._turns[-1]) if self._turns else None
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per section: mean, p95 and max tokens over the recorded turns.
+        """
+        with self._lock:
+            turns = list(self._turns)
+        result = {"turns": len(turns)}
+        fields = sorted({key for turn in turns for key in turn if key != "agent"})
+        for field in fields:
+            values = [turn[field] for turn in turns if field in turn]
+            result[field] = {
+                "mean": statistics.mean(values),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._turns = []
+
+prompt_token_stats = PromptTokenStats()
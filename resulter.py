@@ -3,7 +3,11 @@ from agent_interaction.utils.memo import agent_conversation
 from agent_interaction.utils.memory_management import manage_memories, debug_log
 from agent_interaction.utils.emotion_methods import retrieve_current_emotions
 from agent_interaction.agents.agent import Agent
+from agent_interaction.utils.llm_connector import set_llm_cassette, get_llm_cassette_stats
+from agent_interaction.utils.llm_cassette import cassette_path_for
 
+import argparse
+import random
 import threading
 import os
 import sqlite3
@@ -246,7 +250,7 @@ def manage_agent_memories():
 #threading.Thread(target=manage_agent_memories, daemon=True).start()
 #이거 각 시나리오 바뀔때마다 어떻게 처리할지 생각해보기
 
-def generator():
+def generator(cassette_mode=None, cassette_dir=None, on_miss="error"):
     """
     GET: 시나리오 선택 폼만 표시 (아직 대화 없음)
     POST: 
@@ -255,6 +259,9 @@ def generator():
       3) 없으면 => setup_database + populate_scenario + 5턴 자동대화 => conversations 테이블 생성
       4) 있으면 => 이미 대화가 생성되었다고 가정 => conversations 테이블 로드
       5) chat 형식으로 로그 보여주기
+
+    cassette_mode: "record"면 시나리오별 LLM 요청/응답을 DB 옆 scenario_{id}.llm.jsonl에 기록,
+                   "replay"면 cassette_dir(기본: SCENARIO_FOLDER)의 기록으로 모델 없이 재실행
     """
     for scenario_id in scenarios:
             scenario_data = scenarios.get(scenario_id)
@@ -269,6 +276,9 @@ def generator():
                 # DB가 없으면 초기화 및 대화 생성
             setup_database(db_path)  # 테이블 생성 함수 호출
             populate_scenario(db_path, scenario_id, agent1.name, agent2.name)
+            if cassette_mode:
+                source = os.path.join(cassette_dir or SCENARIO_FOLDER, f"scenario_{scenario_id}.db")
+                set_llm_cassette(cassette_path_for(source), cassette_mode, on_miss=on_miss)
             
             conversation_turn = 3
             message = f"Let's talk together.{scenario_data['description']}"
@@ -294,14 +304,30 @@ def generator():
                 print("-"*50)
                 message = response
 
+            if cassette_mode:
+                debug_log(f"LLM cassette: {get_llm_cassette_stats()}")
+    set_llm_cassette(None)
+
 
 #################################
 # 앱 실행: DB는 처음엔 안 건드림
 #################################
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the scenario conversations")
+    parser.add_argument("--cassette", choices=["record", "replay"], default=None,
+                        help="Record the LLM traffic next to the scenario DBs, or replay a recorded run")
+    parser.add_argument("--cassette-dir", default=None,
+                        help="Folder of the recorded run to replay (e.g. runs_2024-12-26_124005)")
+    parser.add_argument("--on-miss", choices=["error", "live", "record"], default="error")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed the shuffled emotion questionnaire so requests repeat exactly")
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
     # 폴더 생성
     if not os.path.exists(SCENARIO_FOLDER):
         os.makedirs(SCENARIO_FOLDER)    
-    generator()
+    generator(args.cassette, args.cassette_dir, args.on_miss)
     debug_log("생성 완료.")
     exit()